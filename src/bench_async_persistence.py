@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+import bench_support
+import service
+import unit_of_work
+
+
+# Concurrent PostsService.read throughput on the sync fallback path vs the async path.
+# The loop lag column is the worst delay seen by a 1 ms heartbeat task while requests run:
+# it shows how long the event loop was blocked and unable to serve anything else.
+async def run_reads(make_uow, ids: list[str], requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: list[float] = []
+    max_lag = 0.0
+    running = True
+
+    async def heartbeat():
+        nonlocal max_lag
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, time.perf_counter() - started - 0.001)
+
+    async def one_read(post_id: str):
+        async with semaphore:
+            started = time.perf_counter()
+            await service.PostsService(make_uow()).read(post_id)
+            samples.append(time.perf_counter() - started)
+
+    heartbeat_task = asyncio.create_task(heartbeat())
+    with bench_support.Stopwatch() as stopwatch:
+        await asyncio.gather(*(one_read(random.choice(ids)) for _ in range(requests)))
+    running = False
+    await heartbeat_task
+
+    summary = bench_support.latency_summary(samples, stopwatch.elapsed)
+    summary["max_loop_lag_ms"] = round(max_lag * 1000, 3)
+    return summary
+
+async def main(rows: int, requests: int, concurrency: int) -> None:
+    database = bench_support.BenchDatabase(rows)
+    try:
+        results = {
+            "sync_fallback": await run_reads(lambda: unit_of_work.SyncUnitOfWorkAdapter(unit_of_work.SqlAlchemyUnitOfWork(database.session_factory)), database.ids, requests, concurrency),
+            "async": await run_reads(lambda: unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory), database.ids, requests, concurrency),
+        }
+        print(json.dumps({"rows": rows, "requests": requests, "concurrency": concurrency, "results": results}, indent=2))
+    finally:
+        await database.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.requests, args.concurrency))
@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import json
+import bench_support
+import dtos
+import service
+import unit_of_work
+
+
+# Rows/sec for PostsService.create called once per post vs create_many in fixed-size batches.
+# Both paths run against the same kind of fresh SQLite file through the async unit of work.
+async def single_creates(database: bench_support.BenchDatabase, rows: int) -> float:
+    with bench_support.Stopwatch() as stopwatch:
+        for index in range(rows):
+            posts_service = service.PostsService(unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory))
+            await posts_service.create(dtos.CreatePostRequestDto(title=f"Title {index}", description="desc"), "user")
+    return rows / stopwatch.elapsed
+
+async def batch_creates(database: bench_support.BenchDatabase, rows: int, batch_size: int) -> float:
+    with bench_support.Stopwatch() as stopwatch:
+        for offset in range(0, rows, batch_size):
+            batch = dtos.CreatePostsRequestDto(posts=[dtos.CreatePostRequestDto(title=f"Title {index}", description="desc") for index in range(offset, min(rows, offset + batch_size))])
+            posts_service = service.PostsService(unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory))
+            await posts_service.create_many(batch, "user")
+    return rows / stopwatch.elapsed
+
+async def main(rows: int, batch_size: int) -> None:
+    results = {}
+    for name in ("single", "batch"):
+        database = bench_support.BenchDatabase(0)
+        try:
+            if name == "single":
+                results[name] = round(await single_creates(database, rows), 1)
+            else:
+                results[name] = round(await batch_creates(database, rows, batch_size), 1)
+        finally:
+            await database.dispose()
+    print(json.dumps({"rows": rows, "batch_size": batch_size, "rows_per_second": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=service.MAX_CREATE_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch_size))
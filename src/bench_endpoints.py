@@ -0,0 +1,178 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+# Endpoint load test that runs fully offline: main.py is started against a throwaway SQLite file
+# and verifies tokens signed with a locally generated RSA key, served by a stub JWKS. Everything
+# main.py reads at import time has to be set before it is imported.
+BENCH_DIRECTORY = tempfile.TemporaryDirectory()
+os.environ["SQLALCHEMY_DATABASE_URL"] = f"sqlite:///{os.path.join(BENCH_DIRECTORY.name, 'bench.db')}"
+os.environ["AUTH0_DOMAIN"] = "https://auth.bench.invalid"
+os.environ["ALGORITHM"] = "RS256"
+os.environ["API_AUDIENCE"] = "posts-bench"
+os.environ.setdefault("TOP_POSTS_REBUILD_INTERVAL_SECONDS", "0")
+
+import httpx
+import rsa
+from jose import jwt
+import bench_support
+import infrastructure
+import main
+import security
+
+KEY_ID = "bench-key"
+PERMISSIONS = ["create-post", "read-post", "vote-post"]
+# Report fields compared against a baseline: higher is better for throughput, lower for latency
+COMPARED_METRICS = {"throughput_rps": 1, "p50_ms": -1, "p95_ms": -1, "p99_ms": -1}
+
+
+def base64url_uint(value: int) -> str:
+    return base64.urlsafe_b64encode(value.to_bytes((value.bit_length() + 7) // 8, "big")).rstrip(b"=").decode()
+
+class StubIdentityProvider:
+    def __init__(self, users: int) -> None:
+        public_key, private_key = rsa.newkeys(2048)
+        self.private_pem = private_key.save_pkcs1().decode()
+        self.jwks = {"keys": [{"kty": "RSA", "kid": KEY_ID, "use": "sig", "n": base64url_uint(public_key.n), "e": base64url_uint(public_key.e)}]}
+        self.tokens = [self.issue(f"bench-user-{index}") for index in range(users)]
+
+    def issue(self, subject: str) -> str:
+        claims = {"sub": subject, "aud": os.environ["API_AUDIENCE"], "exp": int(time.time()) + 3600, "permissions": PERMISSIONS}
+        return jwt.encode(claims, self.private_pem, algorithm="RS256", headers={"kid": KEY_ID})
+
+    def install(self) -> None:
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json=self.jwks))
+        security.jwks_store = security.JwksKeyStore(f'{os.environ["AUTH0_DOMAIN"]}/.well-known/jwks.json', http_client=httpx.AsyncClient(transport=transport))
+
+    def headers(self) -> dict:
+        return {"Authorization": f"Bearer {random.choice(self.tokens)}"}
+
+
+def create_post(client: httpx.AsyncClient, identity: StubIdentityProvider, ids: list[str], page_size: int):
+    return client.post("/posts/", json={"title": "Benchmark post", "description": "Created by bench_endpoints.py " * 4}, headers=identity.headers())
+
+def list_posts(client: httpx.AsyncClient, identity: StubIdentityProvider, ids: list[str], page_size: int):
+    return client.get("/posts/", params={"limit": page_size}, headers=identity.headers())
+
+def read_post(client: httpx.AsyncClient, identity: StubIdentityProvider, ids: list[str], page_size: int):
+    return client.get(f"/posts/{random.choice(ids)}", headers=identity.headers())
+
+# Every request asks for the same post, as when one goes viral
+def read_hot_post(client: httpx.AsyncClient, identity: StubIdentityProvider, ids: list[str], page_size: int):
+    return client.get(f"/posts/{ids[0]}", headers=identity.headers())
+
+SCENARIOS = {"create_post": create_post, "list_posts": list_posts, "read_post": read_post, "read_hot_post": read_hot_post}
+
+
+async def run_scenario(scenario, client: httpx.AsyncClient, identity: StubIdentityProvider, ids: list[str], requests: int, concurrency: int, page_size: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: list[float] = []
+    errors = 0
+
+    async def one_request():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await scenario(client, identity, ids, page_size)
+            samples.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    with bench_support.Stopwatch() as stopwatch:
+        await asyncio.gather(*(one_request() for _ in range(requests)))
+
+    summary = bench_support.latency_summary(samples, stopwatch.elapsed)
+    summary["errors"] = errors
+    return summary
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    identity = StubIdentityProvider(args.users)
+    identity.install()
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    # The lifespan migrates the database, so seeding happens inside it
+    async with main.lifespan(main.app), httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        with bench_support.Stopwatch() as seeding:
+            ids = bench_support.seed_posts(infrastructure.get_database().engine, args.rows)
+        for name in args.scenarios:
+            scenario = SCENARIOS[name]
+            await run_scenario(scenario, client, identity, ids, args.warmup, args.concurrency, args.page_size)
+            results[name] = await run_scenario(scenario, client, identity, ids, args.requests, args.concurrency, args.page_size)
+
+    return {
+        "config": {
+            "rows": args.rows,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "page_size": args.page_size,
+            "users": args.users,
+            "seed": args.seed,
+            "python": platform.python_version(),
+        },
+        "seed_seconds": round(seeding.elapsed, 2),
+        "scenarios": results,
+    }
+
+
+# Relative change per metric; a change worse than threshold in the metric's direction is a regression
+def compare(report: dict, baseline: dict, threshold: float) -> dict:
+    comparison = {}
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        metrics_comparison = {}
+        regressed = []
+        for metric, direction in COMPARED_METRICS.items():
+            change = (current[metric] - previous[metric]) / previous[metric] if previous[metric] else 0.0
+            metrics_comparison[metric] = {"baseline": previous[metric], "current": current[metric], "change": round(change, 4)}
+            if change * direction < -threshold:
+                regressed.append(metric)
+        if current["errors"] > previous.get("errors", 0):
+            regressed.append("errors")
+        comparison[name] = {"metrics": metrics_comparison, "regressed": regressed}
+    return comparison
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="Offline throughput and latency benchmark of the posts endpoints")
+    parser.add_argument("--rows", type=int, default=10000, help="posts seeded before the run")
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--users", type=int, default=100, help="distinct signed tokens to rotate through")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the report to this file, e.g. to use it as a baseline")
+    parser.add_argument("--compare", help="baseline report to compare against; exits 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    args = parser.parse_args()
+
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        BENCH_DIRECTORY.cleanup()
+
+    regressions = False
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            report["comparison"] = compare(report, json.load(baseline_file), args.threshold)
+        regressions = any(entry["regressed"] for entry in report["comparison"].values())
+    if args.save:
+        with open(args.save, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    print(json.dumps(report, indent=2))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import bench_support
+import service
+import unit_of_work
+
+
+# Peak Python heap and time to first byte of PostsService.export vs building the full
+# read_all-style DTO list. Streaming peak memory should stay flat as the row count grows.
+async def measure_export(database: bench_support.BenchDatabase, batch_size: int) -> dict:
+    posts_service = service.PostsService(unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory))
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte = None
+    total_bytes = 0
+    async for chunk in posts_service.export(batch_size):
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        total_bytes += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ttfb_ms": round(first_byte * 1000, 2), "total_ms": round(elapsed * 1000, 2), "bytes": total_bytes, "peak_mib": round(peak / 2**20, 2)}
+
+async def measure_buffered(database: bench_support.BenchDatabase) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    async with unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory) as uow:
+        domain_posts = await uow.posts.read_all()
+    body = b"\n".join(service.to_post_dto(entry).model_dump_json().encode() for entry in domain_posts)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ttfb_ms": round(elapsed * 1000, 2), "total_ms": round(elapsed * 1000, 2), "bytes": len(body), "peak_mib": round(peak / 2**20, 2)}
+
+async def main(row_counts: list[int], batch_size: int) -> None:
+    results = {}
+    for rows in row_counts:
+        database = bench_support.BenchDatabase(rows)
+        try:
+            results[rows] = {
+                "streaming": await measure_export(database, batch_size),
+                "buffered": await measure_buffered(database),
+            }
+        finally:
+            await database.dispose()
+    print(json.dumps({"batch_size": batch_size, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--batch-size", type=int, default=service.EXPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch_size))
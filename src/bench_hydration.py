@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import dataclasses
+import gc
+import json
+import tracemalloc
+from datetime import datetime
+from sqlalchemy import select
+import bench_support
+import infrastructure
+import unit_of_work
+
+
+# tracemalloc of read_all on a large table: the previous hydration (ORM entities through the
+# identity map, copied into a __dict__-backed dataclass) against column tuples -> slotted Post.
+@dataclasses.dataclass
+class LegacyPost:
+    id: str
+    author: str
+    title: str
+    description: str
+    votes: int
+    created_at: datetime
+    created_by: str
+    updated_at: datetime
+    updated_by: str
+
+async def legacy_read_all(database: bench_support.BenchDatabase) -> list:
+    async with database.async_session_factory() as session:
+        db_posts = await session.scalars(select(infrastructure.PersistedPost))
+        return [
+            LegacyPost(
+                id=entry.id,
+                author=entry.author,
+                title=entry.title,
+                description=entry.description,
+                votes=entry.votes,
+                created_at=entry.created_at,
+                created_by=entry.created_by,
+                updated_at=entry.updated_at,
+                updated_by=entry.updated_by
+            )
+            for entry in db_posts
+        ]
+
+async def current_read_all(database: bench_support.BenchDatabase) -> list:
+    async with unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory) as uow:
+        return await uow.posts.read_all()
+
+async def measure(read_all, database: bench_support.BenchDatabase) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    with bench_support.Stopwatch() as stopwatch:
+        posts = await read_all(database)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(posts) == len(database.ids)
+    return {
+        "seconds": round(stopwatch.elapsed, 3),
+        "peak_mib": round(peak / 2**20, 1),
+        "retained_mib": round(retained / 2**20, 1),
+    }
+
+async def main(rows: int) -> None:
+    database = bench_support.BenchDatabase(rows)
+    try:
+        # Warm up the connection pool and statement caches outside the traced section
+        await current_read_all(database)
+        await legacy_read_all(database)
+        results = {
+            "orm_entities": await measure(legacy_read_all, database),
+            "row_tuples": await measure(current_read_all, database),
+        }
+    finally:
+        await database.dispose()
+    print(json.dumps({"rows": rows, "read_all": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
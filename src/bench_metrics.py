@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+import json
+import time
+import metrics
+
+
+# Cost of the instrumentation itself: one timed() block, and a full pass through
+# MetricsMiddleware around a no-op ASGI app, with and without a profiled request.
+def timed_overhead(iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with metrics.timed("bench"):
+            pass
+    return (time.perf_counter() - started) / iterations
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+async def discard(message):
+    pass
+
+async def middleware_overhead(iterations: int, headers: list) -> float:
+    scope = {"type": "http", "method": "GET", "headers": headers}
+    app = metrics.MetricsMiddleware(noop_app)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), None, discard)
+    elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await noop_app(dict(scope), None, discard)
+    baseline = time.perf_counter() - started
+    return (elapsed - baseline) / iterations
+
+async def main(iterations: int) -> None:
+    results = {
+        "timed_us": round(timed_overhead(iterations) * 1e6, 3),
+        "middleware_us": round(await middleware_overhead(iterations, []) * 1e6, 3),
+        "middleware_profiled_us": round(await middleware_overhead(iterations, [(b"x-profile", b"1")]) * 1e6, 3),
+    }
+    print(json.dumps({"iterations": iterations, "overhead_per_call": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
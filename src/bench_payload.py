@@ -0,0 +1,64 @@
+import argparse
+import asyncio
+import json
+import time
+import httpx
+import bench_support
+import main
+import security
+import service
+import unit_of_work
+
+
+# Bytes on the wire and latency of GET /posts/ pages, full vs fields= projection, each sent
+# with and without gzip. Requests go through the real ASGI app in-process, so the numbers
+# include routing, the query, encoding and the compression middleware but no network.
+MODES = {
+    "full": {},
+    "full+gzip": {"gzip": True},
+    "projected": {"fields": "title,votes"},
+    "projected+gzip": {"fields": "title,votes", "gzip": True},
+}
+
+async def run_mode(client: httpx.AsyncClient, limit: int, requests: int, fields: str | None = None, gzip: bool = False) -> dict:
+    params = {"limit": limit}
+    if fields is not None:
+        params["fields"] = fields
+    headers = {"Accept-Encoding": "gzip" if gzip else "identity"}
+
+    samples = []
+    wire_bytes = 0
+    with bench_support.Stopwatch() as stopwatch:
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = await client.get("/posts/", params=params, headers=headers)
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == 200
+            wire_bytes += response.num_bytes_downloaded
+    summary = bench_support.latency_summary(samples, stopwatch.elapsed)
+    summary["bytes_per_response"] = wire_bytes // requests
+    return summary
+
+async def main_async(rows: int, limit: int, requests: int) -> None:
+    database = bench_support.BenchDatabase(rows)
+    main.app.dependency_overrides[main.get_post_service] = lambda: service.PostsService(unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory))
+    main.app.dependency_overrides[security.verify_jwt] = lambda: "bench"
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            for name, options in MODES.items():
+                await run_mode(client, limit, 5, **options)
+                results[name] = await run_mode(client, limit, requests, **options)
+    finally:
+        main.app.dependency_overrides.clear()
+        await database.dispose()
+    print(json.dumps({"rows": rows, "limit": limit, "modes": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--limit", type=int, default=service.MAX_PAGE_SIZE)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main_async(args.rows, args.limit, args.requests))
@@ -0,0 +1,62 @@
+import argparse
+import asyncio
+import json
+import random
+from sqlalchemy import or_
+import bench_support
+import infrastructure
+import unit_of_work
+
+
+# Search latency on a large table: the FTS5 index against the LIKE '%...%' scan it replaces, for
+# a rare word, a word every post contains and a prefix. Seeded posts only differ by their number.
+QUERIES = {
+    "rare_word": lambda rows: str(random.randrange(rows)),
+    "common_word": lambda rows: "description",
+    "prefix": lambda rows: f"titl {random.randrange(rows)}",
+}
+
+def like_statement(text: str, limit: int):
+    conditions = [or_(infrastructure.PersistedPost.title.like(f"%{word}%"), infrastructure.PersistedPost.description.like(f"%{word}%")) for word in text.split()]
+    return infrastructure.select_posts().where(*conditions).order_by(infrastructure.PersistedPost.created_at.desc()).limit(limit)
+
+async def fts_search(database: bench_support.BenchDatabase, text: str, limit: int) -> list:
+    async with unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory) as uow:
+        return await uow.posts.search(infrastructure.to_match_query(text), limit)
+
+async def like_search(database: bench_support.BenchDatabase, text: str, limit: int) -> list:
+    async with database.async_session_factory() as session:
+        return (await session.execute(like_statement(text, limit))).all()
+
+async def measure(search, database: bench_support.BenchDatabase, make_query, rows: int, requests: int, limit: int) -> dict:
+    samples = []
+    with bench_support.Stopwatch() as total:
+        for _ in range(requests):
+            with bench_support.Stopwatch() as stopwatch:
+                await search(database, make_query(rows), limit)
+            samples.append(stopwatch.elapsed)
+    return bench_support.latency_summary(samples, total.elapsed)
+
+async def main(rows: int, requests: int, limit: int) -> None:
+    with bench_support.Stopwatch() as seeding:
+        database = bench_support.BenchDatabase(rows)
+    results = {}
+    try:
+        for name, make_query in QUERIES.items():
+            # The LIKE scan reads the whole table per request, so it gets fewer of them
+            results[name] = {
+                "fts5": await measure(fts_search, database, make_query, rows, requests, limit),
+                "like_scan": await measure(like_search, database, make_query, rows, max(1, requests // 20), limit),
+            }
+    finally:
+        await database.dispose()
+    print(json.dumps({"rows": rows, "limit": limit, "seed_seconds": round(seeding.elapsed, 1), "search": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.requests, args.limit))
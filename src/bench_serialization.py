@@ -0,0 +1,54 @@
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import bench_support
+import domain
+import dtos
+import serialization
+import service
+
+
+# Per-response cost of encoding a page of posts: the old domain -> DTO -> jsonable_encoder ->
+# JSONResponse path against orjson straight from the domain posts. Both produce identical bytes.
+def make_posts(count: int) -> list[domain.Post]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [domain.Post(**bench_support.post_row(index, start)) for index in range(count)]
+
+def dto_path(posts: list[domain.Post]) -> bytes:
+    dto = dtos.GetPostsResponseDto(posts=[service.to_post_dto(post) for post in posts], next_cursor="cursor")
+    return JSONResponse(content=jsonable_encoder(dto)).body
+
+def orjson_path(posts: list[domain.Post]) -> bytes:
+    return serialization.encode_posts_page(posts, "cursor")
+
+def measure(encode, posts: list[domain.Post], repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(posts)
+        samples.append(time.perf_counter() - started)
+    return {
+        "p50_ms": round(bench_support.percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(bench_support.percentile(samples, 0.99) * 1000, 3),
+    }
+
+def main(sizes: list[int], repeat: int) -> None:
+    results = {}
+    for size in sizes:
+        posts = make_posts(size)
+        assert dto_path(posts) == orjson_path(posts)
+        dto = measure(dto_path, posts, repeat)
+        fast = measure(orjson_path, posts, repeat)
+        results[size] = {"dto": dto, "orjson": fast, "speedup_p50": round(dto["p50_ms"] / fast["p50_ms"], 1)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.sizes, args.repeat)
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import json
+import time
+import bench_support
+import dtos
+import engines
+import service
+import unit_of_work
+
+
+# Concurrent read/write load against one SQLite file: writers create posts and flush votes,
+# readers page through posts. Runs once with the bare engine this service used to create and
+# once with engines.py settings (WAL, synchronous=NORMAL, busy_timeout, sized pool).
+async def writer(database: bench_support.BenchDatabase, deadline: float, samples: list, errors: list) -> None:
+    index = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            async with unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory) as uow:
+                if index % 2:
+                    await uow.posts.apply_vote_deltas({database.ids[index % len(database.ids)]: 1})
+                else:
+                    await uow.posts.create(service.new_post(dtos.CreatePostRequestDto(title=f"Title {index}", description="desc"), "bench"))
+                await uow.commit()
+            samples.append(time.perf_counter() - started)
+        except Exception as error:
+            errors.append(type(error).__name__)
+        index += 1
+
+async def reader(database: bench_support.BenchDatabase, deadline: float, samples: list, errors: list) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            async with unit_of_work.SqlAlchemyAsyncUnitOfWork(database.async_session_factory) as uow:
+                await uow.posts.read_page(50)
+            samples.append(time.perf_counter() - started)
+        except Exception as error:
+            errors.append(type(error).__name__)
+
+async def run(settings: engines.EngineSettings | None, rows: int, writers: int, readers: int, seconds: float) -> dict:
+    database = bench_support.BenchDatabase(rows, settings=settings)
+    write_samples, read_samples, errors = [], [], []
+    try:
+        deadline = time.perf_counter() + seconds
+        with bench_support.Stopwatch() as stopwatch:
+            await asyncio.gather(
+                *(writer(database, deadline, write_samples, errors) for _ in range(writers)),
+                *(reader(database, deadline, read_samples, errors) for _ in range(readers)),
+            )
+        pool = engines.pool_stats(database.async_engine.sync_engine)
+    finally:
+        await database.dispose()
+    return {
+        "writes": bench_support.latency_summary(write_samples, stopwatch.elapsed),
+        "reads": bench_support.latency_summary(read_samples, stopwatch.elapsed),
+        "errors": {name: errors.count(name) for name in set(errors)},
+        "pool": pool,
+    }
+
+async def main(rows: int, writers: int, readers: int, seconds: float, busy_timeout_ms: int) -> None:
+    tuned = engines.EngineSettings(sqlite_busy_timeout_ms=busy_timeout_ms)
+    results = {
+        "default": await run(None, rows, writers, readers, seconds),
+        "tuned": await run(tuned, rows, writers, readers, seconds),
+    }
+    print(json.dumps({"rows": rows, "writers": writers, "readers": readers, "seconds": seconds, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--busy-timeout-ms", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.writers, args.readers, args.seconds, args.busy_timeout_ms))
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Worker cold start, each run in a fresh interpreter: importing main, entering its lifespan (which
+# migrates the database) and answering a first request. "fresh" runs start from an empty SQLite
+# file, "migrated" ones from a file an earlier run already migrated. Also checks that main can be
+# imported with no database configured at all.
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+import httpx
+
+async def start():
+    async with main.lifespan(main.app):
+        lifespan_started = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            response = await client.get("/metrics")
+        answered = time.perf_counter()
+        assert response.status_code == 200
+    return lifespan_started, answered
+
+lifespan_started, answered = asyncio.run(start())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "lifespan_ms": (lifespan_started - imported) * 1000,
+    "first_request_ms": (answered - lifespan_started) * 1000,
+    "total_ms": (answered - started) * 1000,
+}))
+"""
+
+IMPORT_ONLY = "import main"
+
+
+def child_environment(database_url: str | None) -> dict:
+    environment = {name: value for name, value in os.environ.items() if not name.startswith("SQLALCHEMY_")}
+    if database_url is not None:
+        environment["SQLALCHEMY_DATABASE_URL"] = database_url
+    environment["TOP_POSTS_REBUILD_INTERVAL_SECONDS"] = "0"
+    return environment
+
+def run_child(code: str, database_url: str | None) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), env=child_environment(database_url), capture_output=True, text=True)
+
+def measure(runs: int, fresh: bool, directory: str) -> dict:
+    samples: dict[str, list[float]] = {}
+    for run in range(runs):
+        path = os.path.join(directory, f"fresh-{run}.db" if fresh else "migrated.db")
+        completed = run_child(CHILD, f"sqlite:///{path}")
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr)
+        for name, value in json.loads(completed.stdout.strip().splitlines()[-1]).items():
+            samples.setdefault(name, []).append(value)
+    return {name: {"p50": round(statistics.median(values), 1), "max": round(max(values), 1)} for name, values in samples.items()}
+
+def main(runs: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        # Leaves a migrated file behind for the "migrated" runs
+        run_child(CHILD, f"sqlite:///{os.path.join(directory, 'migrated.db')}")
+        report = {
+            "runs": runs,
+            "python": sys.version.split()[0],
+            "fresh": measure(runs, True, directory),
+            "migrated": measure(runs, False, directory),
+            "imports_without_database": run_child(IMPORT_ONLY, None).returncode == 0,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    main(args.runs)
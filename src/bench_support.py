@@ -0,0 +1,87 @@
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+import engines
+import infrastructure
+import migrations
+
+
+# Shared helpers for the bench_*.py scripts: a throwaway SQLite file seeded with posts. Without
+# settings the engines match a bare create_engine call; with them they go through engines.py.
+class BenchDatabase:
+    def __init__(self, rows: int = 1000, path: str | None = None, settings: engines.EngineSettings | None = None) -> None:
+        self.directory = None
+        if path is None:
+            self.directory = tempfile.TemporaryDirectory()
+            path = os.path.join(self.directory.name, "bench.db")
+        self.path = path
+        self.url = f"sqlite:///{path}"
+        if settings is None:
+            self.engine = create_engine(self.url, connect_args={"check_same_thread": False})
+            self.async_engine = create_async_engine(engines.to_async_database_url(self.url), connect_args={"check_same_thread": False})
+        else:
+            self.engine = engines.create_configured_engine(self.url, settings, name="bench-sync")
+            self.async_engine = engines.create_configured_async_engine(engines.to_async_database_url(self.url), settings, name="bench-async")
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_session_factory = async_sessionmaker(bind=self.async_engine, autoflush=False, expire_on_commit=False)
+        migrations.upgrade(self.engine)
+        self.ids = seed_posts(self.engine, rows)
+
+    async def dispose(self) -> None:
+        await self.async_engine.dispose()
+        self.engine.dispose()
+        if self.directory is not None:
+            self.directory.cleanup()
+
+
+def post_row(index: int, start: datetime) -> dict:
+    created_at = start + timedelta(seconds=index)
+    return {
+        "id": f"post-{index:08d}",
+        "author": f"user-{index % 100}",
+        "title": f"Title {index}",
+        "description": f"Description for post {index} " * 4,
+        "votes": index % 50,
+        "created_at": created_at,
+        "created_by": f"user-{index % 100}",
+        "updated_at": created_at,
+        "updated_by": f"user-{index % 100}",
+    }
+
+def seed_posts(engine, rows: int, batch_size: int = 5000) -> list[str]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    ids = []
+    with engine.begin() as connection:
+        for offset in range(0, rows, batch_size):
+            batch = [post_row(index, start) for index in range(offset, min(rows, offset + batch_size))]
+            connection.execute(insert(infrastructure.PersistedPost), batch)
+            ids.extend(row["id"] for row in batch)
+    return ids
+
+def percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def latency_summary(samples: list[float], elapsed: float) -> dict:
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+class Stopwatch:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.perf_counter() - self.started
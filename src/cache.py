@@ -0,0 +1,235 @@
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
+
+
+# Bounded LRU map with optional per-entry expiry. Entries past their expiry are dropped lazily on
+# access; the least recently used entry is evicted once max_entries is exceeded.
+class LruCache:
+    def __init__(self, max_entries: int, ttl_seconds: float | None = None, clock=time.monotonic) -> None:
+        assert max_entries > 0
+
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at is not None and self.clock() >= expires_at:
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, expires_at: float | None = None) -> None:
+        if expires_at is None and self.ttl_seconds is not None:
+            expires_at = self.clock() + self.ttl_seconds
+
+        self.entries[key] = (value, expires_at)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        entry = self.entries.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Shared cache tier (e.g. Redis) behind the in-process LRU. Implementations own serialization
+# of the stored values and must treat ttl_seconds as an upper bound on how long a key lives.
+class ICacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str):
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value, ttl_seconds: float) -> None:
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        pass
+
+
+# Process-local stand-in for a shared backend, used in tests and single-node setups
+class InMemoryCacheBackend(ICacheBackend):
+    def __init__(self, clock=time.monotonic) -> None:
+        self.clock = clock
+        self.entries: dict = {}
+
+    async def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if self.clock() >= expires_at:
+            del self.entries[key]
+            return None
+        return value
+
+    async def set(self, key: str, value, ttl_seconds: float) -> None:
+        self.entries[key] = (value, self.clock() + ttl_seconds)
+
+    async def delete(self, key: str) -> None:
+        self.entries.pop(key, None)
+
+
+# Marks a post id known to be absent, so repeated lookups of missing ids skip the database.
+# A plain string so shared backends can serialize it; compare with ==.
+MISSING = "__missing__"
+
+
+# Read-through cache for single posts: an in-process LRU with TTL, optionally backed by a shared
+# ICacheBackend. Missing ids are cached for negative_ttl_seconds.
+class PostCache:
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30, negative_ttl_seconds: float = 5, backend: ICacheBackend | None = None, clock=time.monotonic) -> None:
+        self.local = LruCache(max_entries, ttl_seconds=ttl_seconds, clock=clock)
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.backend = backend
+        self.clock = clock
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+        self.invalidations = 0
+
+    # Returns the cached post, MISSING for a cached absence, or None when the id is not cached
+    async def get(self, id: str):
+        value = self.local.get(id)
+        if value is None and self.backend is not None:
+            value = await self.backend.get(self.backend_key(id))
+            if value is not None:
+                self.backend_hits += 1
+                self.local.set(id, value, expires_at=self.expires_at(value))
+
+        if value is None:
+            self.misses += 1
+        elif value == MISSING:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, id: str, post) -> None:
+        await self.store(id, post)
+
+    async def set_missing(self, id: str) -> None:
+        await self.store(id, MISSING)
+
+    async def invalidate(self, id: str) -> None:
+        self.invalidations += 1
+        self.local.pop(id)
+        if self.backend is not None:
+            await self.backend.delete(self.backend_key(id))
+
+    async def store(self, id: str, value) -> None:
+        self.local.set(id, value, expires_at=self.expires_at(value))
+        if self.backend is not None:
+            ttl_seconds = self.negative_ttl_seconds if value == MISSING else self.ttl_seconds
+            await self.backend.set(self.backend_key(id), value, ttl_seconds)
+
+    def expires_at(self, value) -> float:
+        return self.clock() + (self.negative_ttl_seconds if value == MISSING else self.ttl_seconds)
+
+    def backend_key(self, id: str) -> str:
+        return f"post:{id}"
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": len(self.local),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "backend_hits": self.backend_hits,
+            "evictions": self.local.evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
+
+
+# First feed page per author. Pages are stored with the number of rows that were asked for, so
+# a cached page answers any smaller limit. An invalidation bumps the epoch; a page read before
+# it is dropped on store instead of re-caching what the write just replaced.
+class AuthorFeedCache:
+    def __init__(self, max_authors: int = 10000, ttl_seconds: float = 30, clock=time.monotonic) -> None:
+        self.local = LruCache(max_authors, ttl_seconds=ttl_seconds, clock=clock)
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_stores = 0
+
+    # Returns up to limit + 1 posts, the extra one signalling a next page, or None on a miss
+    def get(self, author: str, limit: int) -> list | None:
+        entry = self.local.get(author)
+        if entry is not None:
+            fetched, posts = entry
+            # A short page is complete and answers every limit
+            if fetched > limit or len(posts) < fetched:
+                self.hits += 1
+                return posts[:limit + 1]
+        self.misses += 1
+        return None
+
+    def set(self, author: str, fetched: int, posts: list, epoch: int) -> None:
+        if epoch != self.epoch:
+            self.stale_stores += 1
+            return
+        self.local.set(author, (fetched, posts))
+
+    def invalidate(self, author: str) -> None:
+        self.epoch += 1
+        self.invalidations += 1
+        self.local.pop(author)
+
+    # Vote buffer listener: flushed votes change the counts on those authors' cached pages
+    def apply_rows(self, rows) -> None:
+        for author in {row.author for row in rows}:
+            self.invalidate(author)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.local),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.local.evictions,
+            "invalidations": self.invalidations,
+            "stale_stores": self.stale_stores,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
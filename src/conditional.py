@@ -0,0 +1,64 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+import serialization
+
+
+# Validators for conditional GETs. ETags are weak because the same version can be sent with
+# different content encodings; Last-Modified is None when it cannot represent the version.
+@dataclass(frozen=True, slots=True)
+class Version:
+    etag: str
+    last_modified: datetime | None = None
+
+    def headers(self) -> dict[str, str]:
+        headers = {"ETag": self.etag}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+
+# Votes stamp voted_at and edits updated_at; a post's representation changes with either
+def last_change(updated_at: datetime, voted_at: datetime | None) -> datetime:
+    if voted_at is None:
+        return updated_at
+    return max(serialization.to_utc(updated_at), serialization.to_utc(voted_at))
+
+# Hashes (id, last change, votes) of every post in the representation plus any extra parts,
+# such as the next page cursor, that change the response body without changing a post
+def make_version(entries, *parts, exact_last_modified: bool = True) -> Version:
+    digest = hashlib.blake2b(digest_size=12)
+    last_modified = None
+    for id, updated_at, votes in entries:
+        updated_at = serialization.to_utc(updated_at)
+        digest.update(f"{id}\x1f{updated_at.isoformat()}\x1f{votes}\x1e".encode())
+        if last_modified is None or updated_at > last_modified:
+            last_modified = updated_at
+    for part in parts:
+        digest.update(f"{part}\x1e".encode())
+
+    # HTTP dates have second resolution
+    if last_modified is not None and exact_last_modified:
+        last_modified = last_modified.replace(microsecond=0)
+    else:
+        last_modified = None
+    return Version(etag=f'W/"{digest.hexdigest()}"', last_modified=last_modified)
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+# If-None-Match wins over If-Modified-Since when both are sent (RFC 9110, section 13.2.2)
+def is_not_modified(version: Version, if_none_match: str | None = None, if_modified_since: str | None = None) -> bool:
+    if if_none_match is not None:
+        return etag_matches(if_none_match, version.etag)
+    if if_modified_since is None or version.last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return version.last_modified <= serialization.to_utc(since)
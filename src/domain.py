@@ -1,7 +1,8 @@
 from dataclasses import dataclass
 import datetime
 
-@dataclass
+# Immutable and slotted: large reads hold many of these, and copies go through dataclasses.replace
+@dataclass(frozen=True, slots=True)
 class Post:
     id: str
     author: str
@@ -12,4 +13,15 @@ class Post:
     created_by: str
     updated_at: datetime
     updated_by: str
-    
\ No newline at end of file
+    # When a vote flush last changed votes; edits alone move updated_at/updated_by
+    voted_at: datetime.datetime | None = None
+    
+# A change to a post, written to the outbox in the same transaction as the change itself.
+# The sequence is assigned by the database and orders the change feed.
+@dataclass(frozen=True, slots=True)
+class PostEvent:
+    type: str
+    post_id: str
+    payload: dict
+    created_at: datetime
+    sequence: int | None = None
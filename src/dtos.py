@@ -1,5 +1,4 @@
-import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class CreatePostRequestDto(BaseModel):
     title: str
@@ -8,6 +7,12 @@ class CreatePostRequestDto(BaseModel):
 class CreatePostResponseDto(BaseModel):
     id: str
 
+class CreatePostsRequestDto(BaseModel):
+    posts: list[CreatePostRequestDto] = Field(min_length=1)
+
+class CreatePostsResponseDto(BaseModel):
+    ids: list[str]
+
 class GetPostResponseDto(BaseModel):
     id: str
     author: str
@@ -20,4 +25,28 @@ class GetPostResponseDto(BaseModel):
     updated_by: str
 
 class GetPostsResponseDto(BaseModel):
-    posts: list[GetPostResponseDto]
\ No newline at end of file
+    posts: list[GetPostResponseDto]
+    next_cursor: str | None = None
+
+class GetPostsByIdsResponseDto(BaseModel):
+    posts: list[GetPostResponseDto]
+    missing_ids: list[str]
+
+class SearchPostsResponseDto(BaseModel):
+    posts: list[GetPostResponseDto]
+    next_offset: int | None = None
+    took_ms: float
+
+class PostEventDto(BaseModel):
+    sequence: int
+    type: str
+    post_id: str
+    created_at: str
+    payload: dict
+
+class GetPostChangesResponseDto(BaseModel):
+    events: list[PostEventDto]
+    next_since: int
+
+class VoteResponseDto(BaseModel):
+    id: str
@@ -0,0 +1,81 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+import metrics
+# Lives with the other settings in settings.py; re-exported for callers of engines.EngineSettings
+from settings import EngineSettings
+
+pool_events_total = metrics.registry.register(metrics.Counter("posts_db_pool_events_total", "Pool connects, checkouts and invalidations per engine", ("engine", "event")))
+
+
+def to_async_database_url(url: str) -> str:
+    drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+    scheme, separator, rest = url.partition("://")
+    return f"{drivers.get(scheme, scheme)}{separator}{rest}"
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def is_sqlite_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or database.startswith("file::memory:")
+
+def engine_options(url: str, settings: EngineSettings) -> dict:
+    options = {"echo": settings.echo, "pool_pre_ping": settings.pool_pre_ping, "pool_recycle": settings.pool_recycle}
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+        # In-memory databases live and die with a single connection, so SQLAlchemy keeps its
+        # own pool for them and the sizing options do not apply
+        if is_sqlite_memory(url):
+            return options
+    options.update(pool_size=settings.pool_size, max_overflow=settings.max_overflow, pool_timeout=settings.pool_timeout)
+    return options
+
+def sqlite_pragmas(settings: EngineSettings) -> list[str]:
+    return [
+        f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+        f"PRAGMA cache_size={settings.sqlite_cache_size}",
+        f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+    ]
+
+def install_sqlite_pragmas(engine: Engine, settings: EngineSettings) -> None:
+    pragmas = sqlite_pragmas(settings)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+def instrument_pool(engine: Engine, name: str) -> None:
+    for pool_event in ("connect", "checkout", "invalidate"):
+        event.listen(engine, pool_event, lambda *args, pool_event=pool_event: pool_events_total.inc(name, pool_event))
+
+def configure(engine: Engine, url: str, settings: EngineSettings, name: str) -> None:
+    if is_sqlite(url):
+        install_sqlite_pragmas(engine, settings)
+    instrument_pool(engine, name)
+
+def create_configured_engine(url: str, settings: EngineSettings, name: str = "sync") -> Engine:
+    engine = create_engine(url, **engine_options(url, settings))
+    configure(engine, url, settings, name)
+    return engine
+
+def create_configured_async_engine(url: str, settings: EngineSettings, name: str = "async") -> AsyncEngine:
+    engine = create_async_engine(url, **engine_options(url, settings))
+    configure(engine.sync_engine, url, settings, name)
+    return engine
+
+# Connection counts by state for pools that track them (QueuePool and friends). QueuePool's
+# overflow() counts down from -pool_size while the pool is not full, so it is clamped at 0.
+def pool_stats(engine: Engine) -> dict:
+    pool = engine.pool
+    stats = {state: getattr(pool, state)() for state in ("size", "checkedin", "checkedout", "overflow") if hasattr(pool, state)}
+    if "overflow" in stats:
+        stats["overflow"] = max(0, stats["overflow"])
+    return stats
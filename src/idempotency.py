@@ -0,0 +1,86 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+import orjson
+import cache
+
+
+# The key was first used with a different request body
+class IdempotencyKeyReusedError(ValueError):
+    pass
+
+
+# What a retry gets back: the response body of the first request, plus a fingerprint of its
+# request so the same key cannot be replayed for a different one
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    fingerprint: str
+    response: dict
+
+
+def fingerprint(request: dict) -> str:
+    return hashlib.sha256(orjson.dumps(request, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+# Replays responses by (owner, key). Recent responses are held in an LRU with TTL; concurrent
+# requests with the same key share one in-flight operation, which is expected to consult and
+# write the durable store (see PostsService.create_once).
+class IdempotencyStore:
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 24 * 3600, clock=time.monotonic) -> None:
+        assert ttl_seconds > 0
+
+        self.ttl_seconds = ttl_seconds
+        self.local = cache.LruCache(max_entries, ttl_seconds=ttl_seconds, clock=clock)
+        self.in_flight: dict[tuple, asyncio.Future] = {}
+        self.replays = 0
+        self.coalesced = 0
+
+    async def run(self, key: tuple, request_fingerprint: str, operation: Callable[[], Awaitable[StoredResponse]]) -> StoredResponse:
+        while True:
+            stored = self.local.get(key)
+            if stored is not None:
+                self.replays += 1
+                return check(stored, request_fingerprint)
+
+            future = self.in_flight.get(key)
+            if future is None:
+                return await self.lead(key, request_fingerprint, operation)
+
+            self.coalesced += 1
+            try:
+                return check(await asyncio.shield(future), request_fingerprint)
+            except asyncio.CancelledError:
+                # The leader was cancelled, not this request: try again, possibly as the leader
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    continue
+                raise
+
+    async def lead(self, key: tuple, request_fingerprint: str, operation: Callable[[], Awaitable[StoredResponse]]) -> StoredResponse:
+        future = asyncio.get_running_loop().create_future()
+        # Followers may all have gone; an unobserved failure is not worth a warning
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self.in_flight[key] = future
+        try:
+            stored = await operation()
+            self.local.set(key, stored)
+            future.set_result(stored)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            del self.in_flight[key]
+        return check(stored, request_fingerprint)
+
+    def stats(self) -> dict:
+        return {"entries": len(self.local), "replays": self.replays, "coalesced": self.coalesced, "in_flight": len(self.in_flight)}
+
+
+def check(stored: StoredResponse, request_fingerprint: str) -> StoredResponse:
+    if stored.fingerprint != request_fingerprint:
+        raise IdempotencyKeyReusedError("Idempotency-Key was already used for a different request")
+    return stored
@@ -1,19 +1,96 @@
-from sqlalchemy import create_engine, String, Integer, DateTime, Column
+from sqlalchemy import select, insert, update, delete, and_, or_, String, Integer, DateTime, Column, Index, column, literal_column, table
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship, Session
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.sql import func
-import os
+import orjson
+import re
+from datetime import datetime, timezone
+from functools import cached_property
+from itertools import starmap
 from abc import ABC, abstractmethod
-from dotenv import load_dotenv
 import domain
+import engines
+from engines import to_async_database_url
+import cache
+import idempotency
+import metrics
+import settings
 
-load_dotenv()
+# Upper bound on ids per IN (...) clause, well under SQLite's bound parameter limit
+READ_MANY_CHUNK_SIZE = settings.get_settings().read_many_chunk_size
 
-# The SQL Alchemy engine (required for initialization)
-engine = create_engine(os.getenv("SQLALCHEMY_DATABASE_URL"), connect_args={"check_same_thread": False})
 
-# Builds the SQL Alchemy session class (used to create sessions)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engines and session factories, each created on first use. Importing this module neither
+# connects to the database nor needs its URL; creating an engine does not connect either.
+class Database:
+    def __init__(self, app_settings: settings.Settings) -> None:
+        self.settings = app_settings
+        # Pool sizing and SQLite pragmas, shared by every engine (see engines.py)
+        self.engine_settings = app_settings.engine
+
+    # The sync engine (migrations and the sync fallback path)
+    @cached_property
+    def engine(self) -> Engine:
+        assert self.settings.database_url, "SQLALCHEMY_DATABASE_URL is not set"
+        return engines.create_configured_engine(self.settings.database_url, self.engine_settings)
+
+    @cached_property
+    def session_factory(self) -> sessionmaker:
+        return sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+    # The async engine (used by the non-blocking persistence path)
+    @cached_property
+    def async_engine(self) -> AsyncEngine:
+        assert self.settings.async_database_url or self.settings.database_url, "SQLALCHEMY_DATABASE_URL is not set"
+        return engines.create_configured_async_engine(self.settings.async_database_url or to_async_database_url(self.settings.database_url), self.engine_settings)
+
+    # Rows stay readable after commit so repositories can map them
+    @cached_property
+    def async_session_factory(self) -> async_sessionmaker:
+        return async_sessionmaker(bind=self.async_engine, autoflush=False, expire_on_commit=False)
+
+    @cached_property
+    def reader_async_engines(self) -> list[AsyncEngine]:
+        return [
+            engines.create_configured_async_engine(to_async_database_url(url), self.engine_settings, name=f"reader-{index}")
+            for index, url in enumerate(self.settings.reader_database_urls)
+        ]
+
+    @cached_property
+    def reader_session_factories(self) -> list[async_sessionmaker]:
+        return [async_sessionmaker(bind=reader, autoflush=False, expire_on_commit=False) for reader in self.reader_async_engines]
+
+    # Engines created so far by name, so scrapes and shutdown never create one
+    def created_engines(self) -> dict[str, Engine]:
+        created = {}
+        if "engine" in self.__dict__:
+            created["sync"] = self.engine
+        if "async_engine" in self.__dict__:
+            created["async"] = self.async_engine.sync_engine
+        for index, reader in enumerate(self.__dict__.get("reader_async_engines", [])):
+            created[f"reader-{index}"] = reader.sync_engine
+        return created
+
+    # Closes pooled connections; the engines reconnect if used again
+    async def dispose(self) -> None:
+        if "async_engine" in self.__dict__:
+            await self.async_engine.dispose()
+        for reader in self.__dict__.get("reader_async_engines", []):
+            await reader.dispose()
+        if "engine" in self.__dict__:
+            self.engine.dispose()
+
+
+database: Database | None = None
+
+def get_database() -> Database:
+    global database
+    if database is None:
+        database = Database(settings.get_settings())
+    return database
 
 # Base class for SQL Alchemy models
 Base = declarative_base()
@@ -22,7 +99,13 @@ Base = declarative_base()
 # ORM Models
 class PersistedPost(Base):
     __tablename__ = "Posts"
-    
+    # Created by migrations.py; declared here so the model matches the migrated schema
+    __table_args__ = (
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_author_created_at", "author", "created_at", "id"),
+        Index("ix_posts_votes_created_at", "votes", "created_at", "id"),
+    )
+
     id = Column(String, primary_key=True)
     author = Column(String)
     title = Column(String)
@@ -32,92 +115,747 @@ class PersistedPost(Base):
     created_by = Column(String)
     updated_at = Column(DateTime)
     updated_by = Column(String)
+    voted_at = Column(DateTime)
+
+
+class PersistedPostEvent(Base):
+    __tablename__ = "PostEvents"
+    __table_args__ = (
+        Index("ix_post_events_dispatched_at_sequence", "dispatched_at", "sequence"),
+        {"sqlite_autoincrement": True},
+    )
+
+    sequence = Column(Integer, primary_key=True)
+    type = Column(String, nullable=False)
+    post_id = Column(String, nullable=False)
+    payload = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    dispatched_at = Column(DateTime)
+
+
+class PersistedIdempotencyKey(Base):
+    __tablename__ = "IdempotencyKeys"
+    __table_args__ = (
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+
+    owner = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    response = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+def to_persisted_post(model: domain.Post) -> PersistedPost:
+    return PersistedPost(
+        id=model.id,
+        author=model.author,
+        title=model.title,
+        description=model.description,
+        votes=model.votes,
+        created_at=model.created_at,
+        updated_at=model.updated_at,
+        created_by=model.created_by,
+        updated_by=model.updated_by,
+        voted_at=model.voted_at,
+    )
+
+def insert_posts(models: list[domain.Post]):
+    # One multi-row INSERT ... VALUES statement for the whole batch
+    return insert(PersistedPost).values([
+        {
+            "id": model.id,
+            "author": model.author,
+            "title": model.title,
+            "description": model.description,
+            "votes": model.votes,
+            "created_at": model.created_at,
+            "created_by": model.created_by,
+            "updated_at": model.updated_at,
+            "updated_by": model.updated_by,
+            "voted_at": model.voted_at,
+        }
+        for model in models
+    ])
+
+# Read paths select these columns as plain row tuples instead of ORM entities, so large reads skip
+# the identity map and per-row instance state. The order matches domain.Post's fields.
+POST_COLUMNS = (
+    PersistedPost.id,
+    PersistedPost.author,
+    PersistedPost.title,
+    PersistedPost.description,
+    PersistedPost.votes,
+    PersistedPost.created_at,
+    PersistedPost.created_by,
+    PersistedPost.updated_at,
+    PersistedPost.updated_by,
+    PersistedPost.voted_at,
+)
+
+def to_domain_post(row) -> domain.Post:
+    return domain.Post(*row)
+
+def to_domain_posts(rows) -> list[domain.Post]:
+    return list(starmap(domain.Post, rows))
+
+# Just enough of each post to build a conditional GET validator
+VERSION_COLUMNS = (PersistedPost.id, PersistedPost.created_at, PersistedPost.updated_at, PersistedPost.votes, PersistedPost.voted_at)
+
+# Columns for a fields= projection. The version columns are always selected because they drive
+# the page cursor and the ETag; the order stays that of POST_COLUMNS.
+def field_columns(fields) -> tuple:
+    names = set(fields).union(column.key for column in VERSION_COLUMNS)
+    return tuple(column for column in POST_COLUMNS if column.key in names)
+
+def select_posts(columns: tuple = POST_COLUMNS):
+    return select(*columns)
+
+def select_post_by_id(id: str, columns: tuple = POST_COLUMNS):
+    return select_posts(columns).where(PersistedPost.id == id)
+
+# Newest first, optionally for one author; both orders are served by an index from migration 2
+def select_posts_page(limit: int, after: tuple | None = None, columns: tuple = POST_COLUMNS, author: str | None = None):
+    statement = select_posts(columns)
+    if author is not None:
+        statement = statement.where(PersistedPost.author == author)
+    if after is not None:
+        created_at, id = after
+        statement = statement.where(or_(
+            PersistedPost.created_at < created_at,
+            and_(PersistedPost.created_at == created_at, PersistedPost.id < id)
+        ))
+    return statement.order_by(PersistedPost.created_at.desc(), PersistedPost.id.desc()).limit(limit)
+
+def select_posts_by_ids(ids: list[str]):
+    return select_posts().where(PersistedPost.id.in_(ids))
+
+def increment_votes(id: str, delta: int):
+    # Atomic in the database, so concurrent flushes from several workers never lose votes.
+    # voted_at moves too, so Last-Modified validators notice vote changes; updated_at and
+    # updated_by stay those of the last edit.
+    return (
+        update(PersistedPost)
+        .where(PersistedPost.id == id)
+        .values(votes=PersistedPost.votes + delta, voted_at=datetime.now(timezone.utc))
+        .returning(PersistedPost.id, PersistedPost.author, PersistedPost.votes, PersistedPost.created_at)
+    )
+
+def select_top_voted(limit: int):
+    return (
+        select(PersistedPost.id, PersistedPost.votes, PersistedPost.created_at)
+        .order_by(PersistedPost.votes.desc(), PersistedPost.created_at.desc(), PersistedPost.id.desc())
+        .limit(limit)
+    )
+
+def chunked(items: list, size: int):
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+def select_posts_export(batch_size: int):
+    # yield_per streams rows in fixed-size batches through a server-side cursor where supported
+    return select_posts().order_by(PersistedPost.created_at.desc(), PersistedPost.id.desc()).execution_options(yield_per=batch_size)
+
+# FTS5 index over title and description with the post id, created by migration 6 and kept in
+# sync by triggers
+posts_search = table("PostsSearch", column("rowid"), column("id"))
+
+# The search index only exists on SQLite; migrations 3 and 6 skip it on other databases
+class SearchUnavailableError(RuntimeError):
+    pass
+
+def check_search_supported(session: Session | AsyncSession) -> None:
+    dialect = session.get_bind().dialect.name
+    if dialect != "sqlite":
+        raise SearchUnavailableError(f"Full-text search is not available on {dialect}")
+
+# bm25() weights per indexed column (title, description); lower scores rank first
+SEARCH_WEIGHTS = (settings.get_settings().search_title_weight, settings.get_settings().search_description_weight)
+
+# Turns free text into an FTS5 query: every word becomes a quoted phrase, so user input can never
+# be parsed as query syntax, and the last one matches as a prefix for search-as-you-type.
+# Returns None when the text has no searchable words.
+def to_match_query(text: str) -> str | None:
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    phrases = [f'"{word}"' for word in words]
+    phrases[-1] += "*"
+    return " ".join(phrases)
+
+# bm25() has to score every match before it can sort, so a word most posts contain would cost a
+# pass over the whole index. Only the newest matches (highest rowids, which FTS5 walks without
+# sorting) are ranked; below this many matches the ranking is exact.
+SEARCH_MAX_CANDIDATES = settings.get_settings().search_max_candidates
+
+# Ranks inside the FTS5 table, then joins just the page back to Posts by id
+def select_posts_search(match: str, limit: int, offset: int = 0):
+    rank = literal_column("rank")
+    candidates = (
+        select(posts_search.c.rowid, posts_search.c.id, rank)
+        .where(literal_column("PostsSearch").op("MATCH")(match))
+        .where(rank.op("MATCH")(f"bm25({SEARCH_WEIGHTS[0]}, {SEARCH_WEIGHTS[1]})"))
+        .order_by(posts_search.c.rowid.desc())
+        .limit(SEARCH_MAX_CANDIDATES)
+        .subquery("candidates")
+    )
+    ranked = select(candidates).order_by(candidates.c.rank, candidates.c.rowid.desc()).limit(limit).offset(offset).subquery("ranked")
+    return (
+        select_posts()
+        .join(ranked, ranked.c.id == PersistedPost.id)
+        .order_by(ranked.c.rank, ranked.c.rowid.desc())
+    )
+
+# Outbox rows, oldest first; payloads are stored as JSON text
+POST_EVENT_COLUMNS = (PersistedPostEvent.type, PersistedPostEvent.post_id, PersistedPostEvent.payload, PersistedPostEvent.created_at, PersistedPostEvent.sequence)
+
+def to_domain_events(rows) -> list[domain.PostEvent]:
+    return [domain.PostEvent(type, post_id, orjson.loads(payload), created_at, sequence) for type, post_id, payload, created_at, sequence in rows]
+
+def insert_post_events(events: list[domain.PostEvent]):
+    return insert(PersistedPostEvent).values([
+        {"type": event.type, "post_id": event.post_id, "payload": orjson.dumps(event.payload).decode(), "created_at": event.created_at}
+        for event in events
+    ])
+
+def select_events_after(after: int, limit: int):
+    return select(*POST_EVENT_COLUMNS).where(PersistedPostEvent.sequence > after).order_by(PersistedPostEvent.sequence).limit(limit)
+
+def select_pending_events(limit: int):
+    return select(*POST_EVENT_COLUMNS).where(PersistedPostEvent.dispatched_at.is_(None)).order_by(PersistedPostEvent.sequence).limit(limit)
+
+def mark_events_dispatched(sequences: list[int], dispatched_at: datetime):
+    return update(PersistedPostEvent).where(PersistedPostEvent.sequence.in_(sequences)).values(dispatched_at=dispatched_at)
+
+def select_oldest_event_sequence():
+    return select(func.min(PersistedPostEvent.sequence))
+
+def delete_dispatched_events(before: datetime):
+    # The newest event always stays, so the oldest retained sequence tells readers what was pruned
+    newest = select(func.max(PersistedPostEvent.sequence)).scalar_subquery()
+    return delete(PersistedPostEvent).where(PersistedPostEvent.dispatched_at < before, PersistedPostEvent.sequence < newest)
+
+def select_idempotency_key(owner: str, key: str, not_before: datetime):
+    return (
+        select(PersistedIdempotencyKey.fingerprint, PersistedIdempotencyKey.response)
+        .where(PersistedIdempotencyKey.owner == owner, PersistedIdempotencyKey.key == key, PersistedIdempotencyKey.created_at >= not_before)
+    )
+
+def insert_idempotency_key(owner: str, key: str, stored: idempotency.StoredResponse):
+    return insert(PersistedIdempotencyKey).values(
+        owner=owner,
+        key=key,
+        fingerprint=stored.fingerprint,
+        response=orjson.dumps(stored.response).decode(),
+        created_at=datetime.now(timezone.utc),
+    )
+
+def delete_idempotency_keys(before: datetime, owner: str | None = None, key: str | None = None):
+    statement = delete(PersistedIdempotencyKey).where(PersistedIdempotencyKey.created_at < before)
+    if owner is not None:
+        statement = statement.where(PersistedIdempotencyKey.owner == owner, PersistedIdempotencyKey.key == key)
+    return statement
+
+def to_stored_response(row) -> idempotency.StoredResponse | None:
+    return idempotency.StoredResponse(row.fingerprint, orjson.loads(row.response)) if row is not None else None
 
 # Repos
 class ICrudRepository(ABC):
     @abstractmethod
     async def create(self, model):
         pass
-    
+
+    @abstractmethod
+    async def create_many(self, models):
+        pass
+
     @abstractmethod
     async def read_all(self):
         pass
-    
+
+    @abstractmethod
+    async def read_page(self, limit, after=None, author=None):
+        pass
+
+    @abstractmethod
+    def stream_all(self, batch_size):
+        pass
+
+    @abstractmethod
+    async def read_many(self, ids):
+        pass
+
+    @abstractmethod
+    async def apply_vote_deltas(self, deltas):
+        pass
+
+    @abstractmethod
+    async def read_top_voted(self, limit):
+        pass
+
+    @abstractmethod
+    async def read_page_versions(self, limit, after=None, author=None):
+        pass
+
+    @abstractmethod
+    async def read_page_fields(self, limit, fields, after=None, author=None):
+        pass
+
+    @abstractmethod
+    async def search(self, match, limit, offset=0):
+        pass
+
     @abstractmethod
     async def read(self, id):
         pass
-    
+
+    @abstractmethod
+    async def read_version(self, id):
+        pass
+
     @abstractmethod
     async def update(self, model):
         pass
-    
+
     @abstractmethod
     async def delete(self, id):
         pass
 
 
+# Blocking repository over a sync Session, kept as the fallback persistence path
 class PostsRepository(ICrudRepository):
     def __init__(self, session: Session) -> None:
         super().__init__()
         self.session = session
-        
+
+    # The first statement of a session checks a connection out of the pool
+    def execute(self, statement):
+        if not self.session.in_transaction():
+            with metrics.timed("session_acquire"):
+                self.session.connection()
+        with metrics.timed("query"):
+            return self.session.execute(statement)
+
     async def create(self, model) -> None:
         assert model is not None
-        
-        db_post = PersistedPost(
-            id=model.id,
-            author=model.author,
-            title=model.title,
-            description=model.description,
-            votes=model.votes,
-            created_at=model.created_at,
-            updated_at=model.updated_at,
-            created_by=model.created_by,
-            updated_by=model.updated_by,
-        )
-        
-        self.session.add(db_post)
-        
+
+        self.session.add(to_persisted_post(model))
+
+    async def create_many(self, models: list[domain.Post]) -> None:
+        assert models
+
+        self.execute(insert_posts(models))
+
     async def read_all(self) -> list[domain.Post]:
-        db_posts = self.session.query(PersistedPost)
+        return to_domain_posts(self.execute(select_posts()))
+
+    async def read_page(self, limit: int, after: tuple | None = None, author: str | None = None) -> list[domain.Post]:
+        assert limit > 0
+
+        return to_domain_posts(self.execute(select_posts_page(limit, after, author=author)))
+
+    async def read_page_versions(self, limit: int, after: tuple | None = None, author: str | None = None) -> list:
+        assert limit > 0
+
+        return self.execute(select_posts_page(limit, after, VERSION_COLUMNS, author)).all()
+
+    async def read_page_fields(self, limit: int, fields: tuple, after: tuple | None = None, author: str | None = None) -> list:
+        assert limit > 0 and fields
+
+        return self.execute(select_posts_page(limit, after, field_columns(fields), author)).all()
+
+    async def stream_all(self, batch_size: int):
+        assert batch_size > 0
+
+        for partition in self.execute(select_posts_export(batch_size)).partitions():
+            yield to_domain_posts(partition)
+
+    async def read_many(self, ids: list[str]) -> list[domain.Post]:
         domain_posts: list[domain.Post] = []
-        
-        for entry in db_posts:
-            domain_posts.append(domain.Post(
-            id=entry.id,
-            author=entry.author,
-            title=entry.title,
-            description=entry.description,
-            votes=entry.votes,
-            created_at=entry.created_at,
-            created_by=entry.created_by,
-            updated_at=entry.updated_at,
-            updated_by=entry.updated_by
-        ))
-        
+        for chunk in chunked(ids, READ_MANY_CHUNK_SIZE):
+            domain_posts.extend(to_domain_posts(self.execute(select_posts_by_ids(chunk))))
         return domain_posts
-    
-    async def read(self, id: str) -> domain.Post:
+
+    async def apply_vote_deltas(self, deltas: dict[str, int]) -> list:
+        rows = []
+        for id, delta in deltas.items():
+            rows.extend(self.execute(increment_votes(id, delta)).all())
+        return rows
+
+    async def read_top_voted(self, limit: int) -> list:
+        assert limit > 0
+
+        return self.execute(select_top_voted(limit)).all()
+
+    async def search(self, match: str, limit: int, offset: int = 0) -> list[domain.Post]:
+        assert match and limit > 0 and offset >= 0
+
+        check_search_supported(self.session)
+        return to_domain_posts(self.execute(select_posts_search(match, limit, offset)))
+
+    async def read(self, id: str) -> domain.Post | None:
+        assert id is not None and not id.isspace()
+
+        row = self.execute(select_post_by_id(id)).first()
+        return to_domain_post(row) if row is not None else None
+
+    async def read_version(self, id: str):
         assert id is not None and not id.isspace()
-        
-        db_post = self.session.query(PersistedPost).filter(PersistedPost.id == id).first()
-        
-        domain_post = domain.Post(
-            id=db_post.id,
-            author=db_post.author,
-            title=db_post.title,
-            description=db_post.description,
-            votes=db_post.votes,
-            created_at=db_post.created_at,
-            created_by=db_post.created_by,
-            updated_at=db_post.updated_at,
-            updated_by=db_post.updated_by
-        )
-        
-        return domain_post
-    
+
+        return self.execute(select_post_by_id(id, VERSION_COLUMNS)).first()
+
     async def update(self, model):
         pass
-    
+
     async def delete(self, id):
-        pass
\ No newline at end of file
+        pass
+
+
+class AsyncPostsRepository(ICrudRepository):
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__()
+        self.session = session
+
+    # The first statement of a session checks a connection out of the pool
+    async def acquire(self) -> None:
+        if not self.session.in_transaction():
+            with metrics.timed("session_acquire"):
+                await self.session.connection()
+
+    async def execute(self, statement):
+        await self.acquire()
+        with metrics.timed("query"):
+            return await self.session.execute(statement)
+
+    async def create(self, model) -> None:
+        assert model is not None
+
+        self.session.add(to_persisted_post(model))
+
+    async def create_many(self, models: list[domain.Post]) -> None:
+        assert models
+
+        await self.execute(insert_posts(models))
+
+    async def read_all(self) -> list[domain.Post]:
+        return to_domain_posts(await self.execute(select_posts()))
+
+    async def read_page(self, limit: int, after: tuple | None = None, author: str | None = None) -> list[domain.Post]:
+        assert limit > 0
+
+        return to_domain_posts(await self.execute(select_posts_page(limit, after, author=author)))
+
+    async def read_page_versions(self, limit: int, after: tuple | None = None, author: str | None = None) -> list:
+        assert limit > 0
+
+        return (await self.execute(select_posts_page(limit, after, VERSION_COLUMNS, author))).all()
+
+    async def read_page_fields(self, limit: int, fields: tuple, after: tuple | None = None, author: str | None = None) -> list:
+        assert limit > 0 and fields
+
+        return (await self.execute(select_posts_page(limit, after, field_columns(fields), author))).all()
+
+    async def stream_all(self, batch_size: int):
+        assert batch_size > 0
+
+        await self.acquire()
+        with metrics.timed("query"):
+            db_posts = await self.session.stream(select_posts_export(batch_size))
+        async for partition in db_posts.partitions():
+            yield to_domain_posts(partition)
+
+    async def read_many(self, ids: list[str]) -> list[domain.Post]:
+        domain_posts: list[domain.Post] = []
+        for chunk in chunked(ids, READ_MANY_CHUNK_SIZE):
+            domain_posts.extend(to_domain_posts(await self.execute(select_posts_by_ids(chunk))))
+        return domain_posts
+
+    async def apply_vote_deltas(self, deltas: dict[str, int]) -> list:
+        rows = []
+        for id, delta in deltas.items():
+            rows.extend((await self.execute(increment_votes(id, delta))).all())
+        return rows
+
+    async def read_top_voted(self, limit: int) -> list:
+        assert limit > 0
+
+        return (await self.execute(select_top_voted(limit))).all()
+
+    async def search(self, match: str, limit: int, offset: int = 0) -> list[domain.Post]:
+        assert match and limit > 0 and offset >= 0
+
+        check_search_supported(self.session)
+        return to_domain_posts(await self.execute(select_posts_search(match, limit, offset)))
+
+    async def read(self, id: str) -> domain.Post | None:
+        assert id is not None and not id.isspace()
+
+        row = (await self.execute(select_post_by_id(id))).first()
+        return to_domain_post(row) if row is not None else None
+
+    async def read_version(self, id: str):
+        assert id is not None and not id.isspace()
+
+        return (await self.execute(select_post_by_id(id, VERSION_COLUMNS))).first()
+
+    async def update(self, model):
+        pass
+
+    async def delete(self, id):
+        pass
+
+
+class IPostEventsRepository(ABC):
+    @abstractmethod
+    async def append(self, events):
+        pass
+
+    @abstractmethod
+    async def read_after(self, after, limit):
+        pass
+
+    @abstractmethod
+    async def read_pending(self, limit):
+        pass
+
+    @abstractmethod
+    async def mark_dispatched(self, sequences):
+        pass
+
+    @abstractmethod
+    async def oldest_sequence(self):
+        pass
+
+    @abstractmethod
+    async def prune(self, before):
+        pass
+
+
+# Outbox on the same session as the posts repository, so events commit with the change
+class PostEventsRepository(IPostEventsRepository):
+    def __init__(self, posts: PostsRepository) -> None:
+        super().__init__()
+        self.posts = posts
+
+    async def append(self, events: list[domain.PostEvent]) -> None:
+        if events:
+            self.posts.execute(insert_post_events(events))
+
+    async def read_after(self, after: int, limit: int) -> list[domain.PostEvent]:
+        assert after >= 0 and limit > 0
+
+        return to_domain_events(self.posts.execute(select_events_after(after, limit)))
+
+    async def read_pending(self, limit: int) -> list[domain.PostEvent]:
+        assert limit > 0
+
+        return to_domain_events(self.posts.execute(select_pending_events(limit)))
+
+    async def mark_dispatched(self, sequences: list[int]) -> None:
+        for chunk in chunked(sequences, READ_MANY_CHUNK_SIZE):
+            self.posts.execute(mark_events_dispatched(chunk, datetime.now(timezone.utc)))
+
+    async def oldest_sequence(self) -> int | None:
+        return self.posts.execute(select_oldest_event_sequence()).scalar()
+
+    async def prune(self, before: datetime) -> int:
+        return self.posts.execute(delete_dispatched_events(before)).rowcount
+
+
+class AsyncPostEventsRepository(IPostEventsRepository):
+    def __init__(self, posts: AsyncPostsRepository) -> None:
+        super().__init__()
+        self.posts = posts
+
+    async def append(self, events: list[domain.PostEvent]) -> None:
+        if events:
+            await self.posts.execute(insert_post_events(events))
+
+    async def read_after(self, after: int, limit: int) -> list[domain.PostEvent]:
+        assert after >= 0 and limit > 0
+
+        return to_domain_events(await self.posts.execute(select_events_after(after, limit)))
+
+    async def read_pending(self, limit: int) -> list[domain.PostEvent]:
+        assert limit > 0
+
+        return to_domain_events(await self.posts.execute(select_pending_events(limit)))
+
+    async def mark_dispatched(self, sequences: list[int]) -> None:
+        for chunk in chunked(sequences, READ_MANY_CHUNK_SIZE):
+            await self.posts.execute(mark_events_dispatched(chunk, datetime.now(timezone.utc)))
+
+    async def oldest_sequence(self) -> int | None:
+        return (await self.posts.execute(select_oldest_event_sequence())).scalar()
+
+    async def prune(self, before: datetime) -> int:
+        return (await self.posts.execute(delete_dispatched_events(before))).rowcount
+
+
+# Responses of idempotent requests, written in the transaction that produced them
+class IIdempotencyKeysRepository(ABC):
+    @abstractmethod
+    async def read(self, owner, key, not_before):
+        pass
+
+    @abstractmethod
+    async def add(self, owner, key, stored, not_before):
+        pass
+
+    @abstractmethod
+    async def prune(self, before):
+        pass
+
+
+class IdempotencyKeysRepository(IIdempotencyKeysRepository):
+    def __init__(self, posts: PostsRepository) -> None:
+        super().__init__()
+        self.posts = posts
+
+    async def read(self, owner: str, key: str, not_before: datetime) -> idempotency.StoredResponse | None:
+        return to_stored_response(self.posts.execute(select_idempotency_key(owner, key, not_before)).first())
+
+    # False when another transaction committed the key first
+    async def add(self, owner: str, key: str, stored: idempotency.StoredResponse, not_before: datetime) -> bool:
+        self.posts.execute(delete_idempotency_keys(not_before, owner, key))
+        try:
+            with self.posts.session.begin_nested():
+                self.posts.execute(insert_idempotency_key(owner, key, stored))
+        except IntegrityError:
+            return False
+        return True
+
+    async def prune(self, before: datetime) -> int:
+        return self.posts.execute(delete_idempotency_keys(before)).rowcount
+
+
+class AsyncIdempotencyKeysRepository(IIdempotencyKeysRepository):
+    def __init__(self, posts: AsyncPostsRepository) -> None:
+        super().__init__()
+        self.posts = posts
+
+    async def read(self, owner: str, key: str, not_before: datetime) -> idempotency.StoredResponse | None:
+        return to_stored_response((await self.posts.execute(select_idempotency_key(owner, key, not_before))).first())
+
+    # False when another transaction committed the key first
+    async def add(self, owner: str, key: str, stored: idempotency.StoredResponse, not_before: datetime) -> bool:
+        await self.posts.execute(delete_idempotency_keys(not_before, owner, key))
+        try:
+            async with self.posts.session.begin_nested():
+                await self.posts.execute(insert_idempotency_key(owner, key, stored))
+        except IntegrityError:
+            return False
+        return True
+
+    async def prune(self, before: datetime) -> int:
+        return (await self.posts.execute(delete_idempotency_keys(before))).rowcount
+
+
+# Read-through cache in front of another posts repository. Writes invalidate the written ids
+# immediately and again once the unit of work commits (see invalidate_pending).
+class CachedPostsRepository(ICrudRepository):
+    def __init__(self, inner: ICrudRepository, post_cache: cache.PostCache) -> None:
+        super().__init__()
+        self.inner = inner
+        self.post_cache = post_cache
+        self.pending_invalidations: set[str] = set()
+
+    async def create(self, model) -> None:
+        await self.inner.create(model)
+        await self.invalidate(model.id)
+
+    async def create_many(self, models: list[domain.Post]) -> None:
+        await self.inner.create_many(models)
+        for model in models:
+            await self.invalidate(model.id)
+
+    async def read_all(self) -> list[domain.Post]:
+        return await self.inner.read_all()
+
+    async def read_page(self, limit: int, after: tuple | None = None, author: str | None = None) -> list[domain.Post]:
+        return await self.inner.read_page(limit, after, author)
+
+    async def read_page_versions(self, limit: int, after: tuple | None = None, author: str | None = None) -> list:
+        return await self.inner.read_page_versions(limit, after, author)
+
+    async def read_page_fields(self, limit: int, fields: tuple, after: tuple | None = None, author: str | None = None) -> list:
+        return await self.inner.read_page_fields(limit, fields, after, author)
+
+    def stream_all(self, batch_size: int):
+        return self.inner.stream_all(batch_size)
+
+    async def read_many(self, ids: list[str]) -> list[domain.Post]:
+        domain_posts: list[domain.Post] = []
+        uncached_ids: list[str] = []
+        for id in ids:
+            cached = await self.post_cache.get(id)
+            if cached is None:
+                uncached_ids.append(id)
+            elif cached != cache.MISSING:
+                domain_posts.append(cached)
+
+        if uncached_ids:
+            found = await self.inner.read_many(uncached_ids)
+            for post in found:
+                await self.post_cache.set(post.id, post)
+            for id in set(uncached_ids).difference(post.id for post in found):
+                await self.post_cache.set_missing(id)
+            domain_posts.extend(found)
+
+        return domain_posts
+
+    async def apply_vote_deltas(self, deltas: dict[str, int]) -> list:
+        rows = await self.inner.apply_vote_deltas(deltas)
+        for id in deltas:
+            await self.invalidate(id)
+        return rows
+
+    async def read_top_voted(self, limit: int) -> list:
+        return await self.inner.read_top_voted(limit)
+
+    async def search(self, match: str, limit: int, offset: int = 0) -> list[domain.Post]:
+        return await self.inner.search(match, limit, offset)
+
+    async def read(self, id: str) -> domain.Post | None:
+        assert id is not None and not id.isspace()
+
+        cached = await self.post_cache.get(id)
+        if cached == cache.MISSING:
+            return None
+        if cached is not None:
+            return cached
+
+        post = await self.inner.read(id)
+        if post is None:
+            await self.post_cache.set_missing(id)
+        else:
+            await self.post_cache.set(id, post)
+        return post
+
+    # A cached post carries its own version; misses fall through without filling the cache
+    async def read_version(self, id: str):
+        assert id is not None and not id.isspace()
+
+        cached = await self.post_cache.get(id)
+        if cached == cache.MISSING:
+            return None
+        if cached is not None:
+            return cached
+        return await self.inner.read_version(id)
+
+    async def update(self, model):
+        await self.inner.update(model)
+        await self.invalidate(model.id)
+
+    async def delete(self, id):
+        await self.inner.delete(id)
+        await self.invalidate(id)
+
+    async def invalidate(self, id: str) -> None:
+        self.pending_invalidations.add(id)
+        await self.post_cache.invalidate(id)
+
+    async def invalidate_pending(self) -> None:
+        for id in self.pending_invalidations:
+            await self.post_cache.invalidate(id)
+        self.pending_invalidations.clear()
@@ -1,18 +1,182 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from typing import Annotated
-from fastapi import FastAPI, Security, Depends
+from fastapi import FastAPI, Header, HTTPException, Query, Security, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from infrastructure import Base, engine
-from dotenv import load_dotenv
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from engines import pool_stats
+import cache
+import conditional
 import dtos
+import idempotency
+import infrastructure
+import metrics
+import migrations
+import outbox
+import ranking
+import routing
 import service
 import security
+import serialization
+import settings
+import singleflight
 import unit_of_work
+import votes
 
-load_dotenv()
+# The in-process components below hold no connections, so they are built from the settings at
+# import; the routes, the middleware stack and the components are all fixed once the app exists.
+# The database is only touched from the lifespan.
+app_settings = settings.get_settings()
 
-Base.metadata.create_all(bind=engine)
+post_cache = cache.PostCache(
+    max_entries=app_settings.post_cache_max_entries,
+    ttl_seconds=app_settings.post_cache_ttl_seconds,
+    negative_ttl_seconds=app_settings.post_cache_negative_ttl_seconds,
+) if app_settings.post_cache_enabled else None
 
-app = FastAPI()
+replica_router: routing.ReplicaRouter | None = None
+
+# Built with the first unit of work, which is also when the engines are created
+def get_replica_router() -> routing.ReplicaRouter:
+    global replica_router
+    if replica_router is None:
+        database = infrastructure.get_database()
+        replica_router = routing.ReplicaRouter(
+            database.async_session_factory,
+            database.reader_session_factories,
+            stickiness_seconds=app_settings.read_your_writes_seconds,
+        )
+    return replica_router
+
+def make_unit_of_work() -> unit_of_work.AsyncUnitOfWork:
+    if app_settings.use_sync_session:
+        return unit_of_work.SyncUnitOfWorkAdapter(unit_of_work.SqlAlchemyUnitOfWork(), post_cache=post_cache)
+    return unit_of_work.SqlAlchemyAsyncUnitOfWork(post_cache=post_cache, router=get_replica_router())
+
+vote_buffer = votes.VoteBuffer(
+    make_unit_of_work,
+    flush_interval_seconds=app_settings.votes_flush_interval_seconds,
+    max_buffered_deltas=app_settings.votes_max_buffered_deltas,
+)
+
+top_posts = ranking.TopPostsIndex(capacity=app_settings.top_posts_capacity)
+vote_buffer.add_listener(top_posts.apply_rows)
+
+outbox_dispatcher = outbox.OutboxDispatcher(
+    make_unit_of_work,
+    batch_size=app_settings.outbox_batch_size,
+    poll_interval_seconds=app_settings.outbox_poll_interval_seconds,
+    retention_seconds=app_settings.outbox_retention_seconds,
+)
+change_feed = outbox.ChangeFeed()
+
+idempotency_store = idempotency.IdempotencyStore(
+    max_entries=app_settings.idempotency_cache_max_entries,
+    ttl_seconds=app_settings.idempotency_key_ttl_seconds,
+)
+outbox_dispatcher.add_listener(change_feed.publish)
+# Vote flushes write post.voted events
+vote_buffer.add_listener(lambda rows: outbox_dispatcher.notify())
+
+# Other workers' new posts show up in a cached first page once its TTL has passed
+author_feeds = cache.AuthorFeedCache(
+    max_authors=app_settings.author_feed_cache_max_authors,
+    ttl_seconds=app_settings.author_feed_cache_ttl_seconds,
+) if app_settings.author_feed_cache_enabled else None
+if author_feeds is not None:
+    vote_buffer.add_listener(author_feeds.apply_rows)
+
+# Concurrent identical reads share one query; a commit here makes later reads start a fresh one
+read_flights = singleflight.SingleFlight() if app_settings.read_coalescing_enabled else None
+if read_flights is not None:
+    vote_buffer.add_listener(lambda rows: read_flights.invalidate())
+
+# Engines are created lazily; a scrape reports the ones that exist and never creates one
+def created_pool_stats(name: str) -> dict:
+    engine = infrastructure.get_database().created_engines().get(name)
+    return pool_stats(engine) if engine is not None else {}
+
+# Scrape-time views of state owned elsewhere; request and layer timings live in metrics.py
+metrics.registry.register(metrics.CallbackMetric("posts_db_pool_connections", "Async engine pool connections by state", lambda: created_pool_stats("async"), label_name="state"))
+metrics.registry.register(metrics.CallbackMetric("posts_db_sync_pool_connections", "Sync engine pool connections by state", lambda: created_pool_stats("sync"), label_name="state"))
+metrics.registry.register(metrics.CallbackMetric("posts_db_routed_reads_total", "Reads routed to the writer (no replicas configured, or read-your-writes) or to a replica", lambda: {"writer": replica_router.writer_reads, "replica": replica_router.replica_reads} if replica_router is not None else {}, type="counter", label_name="target"))
+metrics.registry.register(metrics.CallbackMetric("posts_token_cache_events_total", "Verified token cache lookups by outcome", lambda: metrics.cache_events(security.token_cache.stats()), type="counter", label_name="event"))
+metrics.registry.register(metrics.CallbackMetric("posts_jwks_fetches_total", "JWKS fetches by outcome", lambda: {"ok": security.jwks_store.fetch_count, "error": security.jwks_store.fetch_errors} if security.jwks_store is not None else {}, type="counter", label_name="result"))
+metrics.registry.register(metrics.CallbackMetric("posts_votes_buffered", "Votes accepted but not yet flushed", lambda: vote_buffer.buffered))
+metrics.registry.register(metrics.CallbackMetric("posts_votes_flushed_total", "Votes written to the database", lambda: vote_buffer.flushed_votes, type="counter"))
+metrics.registry.register(metrics.CallbackMetric("posts_vote_flush_errors_total", "Vote flushes that failed and were retried", lambda: vote_buffer.flush_errors, type="counter"))
+metrics.registry.register(metrics.CallbackMetric("posts_outbox_events_total", "Outbox events dispatched or pruned, and failed dispatch batches", lambda: {"dispatched": outbox_dispatcher.dispatched_events, "pruned": outbox_dispatcher.pruned_events, "dispatch_errors": outbox_dispatcher.dispatch_errors}, type="counter", label_name="outcome"))
+if post_cache is not None:
+    metrics.registry.register(metrics.CallbackMetric("posts_cache_entries", "Posts held in the in-process cache", lambda: post_cache.stats()["entries"]))
+    metrics.registry.register(metrics.CallbackMetric("posts_cache_events_total", "Post cache lookups and evictions by event", lambda: metrics.cache_events(post_cache.stats()), type="counter", label_name="event"))
+metrics.registry.register(metrics.CallbackMetric("posts_idempotent_replays_total", "Creates answered from a stored response or by joining an in-flight request", lambda: {"replayed": idempotency_store.replays, "coalesced": idempotency_store.coalesced}, type="counter", label_name="outcome"))
+if read_flights is not None:
+    metrics.registry.register(metrics.CallbackMetric("posts_read_flights_in_flight", "Reads currently running on behalf of coalesced callers", lambda: read_flights.stats()["in_flight"]))
+    metrics.registry.register(metrics.CallbackMetric("posts_read_calls_total", "Reads that ran a query, joined one in flight, or were abandoned by every caller", lambda: {"executed": read_flights.executed, "coalesced": read_flights.coalesced, "abandoned": read_flights.abandoned}, type="counter", label_name="outcome"))
+if author_feeds is not None:
+    metrics.registry.register(metrics.CallbackMetric("posts_author_feed_cache_entries", "Authors whose first feed page is cached", lambda: author_feeds.stats()["entries"]))
+    metrics.registry.register(metrics.CallbackMetric("posts_author_feed_cache_events_total", "Author feed cache lookups, evictions and invalidations by event", lambda: metrics.cache_events(author_feeds.stats()), type="counter", label_name="event"))
+
+# Other workers' votes only reach this worker's ranking through a rebuild
+async def rebuild_top_posts_periodically(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await get_post_service().rebuild_top_posts()
+        except Exception:
+            logging.exception("Failed to rebuild the top posts index")
+
+# Keys past their TTL are already ignored; this only reclaims the rows
+async def prune_idempotency_keys_periodically(interval_seconds: float):
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with make_unit_of_work() as uow:
+                await uow.idempotency_keys.prune(datetime.now(timezone.utc) - timedelta(seconds=idempotency_store.ttl_seconds))
+                await uow.commit()
+        except Exception:
+            logging.exception("Failed to prune idempotency keys")
+
+# Runs before the first request rather than at import, so importing this module never touches
+# the database. The sync fallback path migrates through its own engine, which for in-memory
+# SQLite is a different database.
+async def prepare_schema(app_settings: settings.Settings) -> None:
+    database = infrastructure.get_database()
+    if app_settings.schema_startup_mode == "migrate":
+        if app_settings.use_sync_session:
+            migrations.upgrade(database.engine)
+        else:
+            await migrations.upgrade_async(database.async_engine)
+    elif app_settings.schema_startup_mode == "check":
+        if app_settings.use_sync_session:
+            migrations.check(database.engine)
+        else:
+            await migrations.check_async(database.async_engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await prepare_schema(app_settings)
+    await get_post_service().rebuild_top_posts()
+    rebuild_interval_seconds = app_settings.top_posts_rebuild_interval_seconds
+    rebuild_task = asyncio.create_task(rebuild_top_posts_periodically(rebuild_interval_seconds)) if rebuild_interval_seconds > 0 else None
+    prune_task = asyncio.create_task(prune_idempotency_keys_periodically(app_settings.idempotency_prune_interval_seconds))
+    vote_buffer.start()
+    outbox_dispatcher.start()
+    yield
+    if rebuild_task is not None:
+        rebuild_task.cancel()
+    prune_task.cancel()
+    # Pending votes are written out before the worker exits
+    await vote_buffer.stop()
+    # After the votes, whose flush writes events of its own
+    await outbox_dispatcher.stop()
+    await infrastructure.get_database().dispose()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -20,19 +184,139 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-    
+# Responses under the threshold are sent as-is; compressing them costs more than it saves
+if app_settings.gzip_enabled:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=app_settings.gzip_minimum_size,
+        compresslevel=app_settings.gzip_compress_level,
+    )
+
+# Added last so it wraps everything else, compression included
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Read endpoints return pre-encoded bytes; response_model only documents the schema
+def json_response(content: bytes, version: conditional.Version | None = None) -> Response:
+    return Response(content=content, media_type="application/json", headers=version.headers() if version is not None else None)
+
+def not_modified_response(version: conditional.Version) -> Response:
+    return Response(status_code=304, headers=version.headers())
+
 def get_post_service() -> service.IPostsService:
-    return service.PostsService(unit_of_work.SqlAlchemyUnitOfWork())
+    return service.PostsService(make_unit_of_work(), vote_buffer=vote_buffer, top_posts=top_posts, author_feeds=author_feeds, outbox_dispatcher=outbox_dispatcher, change_feed=change_feed, idempotency_store=idempotency_store, read_flights=read_flights)
 
 @app.post("/posts/", response_model=dtos.CreatePostResponseDto)
-async def create_post(create_post: dtos.CreatePostRequestDto, posts_service: Annotated[service.IPostsService, Depends(get_post_service)], current_user: str = Security(security.verify_jwt, scopes=["create-post"])):
-    posts_service = service.PostsService()
-    return await posts_service.create(create_post, current_user)
+async def create_post(create_post: dtos.CreatePostRequestDto, posts_service: Annotated[service.IPostsService, Depends(get_post_service)], idempotency_key: Annotated[str | None, Header(min_length=1, max_length=255)] = None, current_user: str = Security(security.verify_jwt, scopes=["create-post"])):
+    if idempotency_key is not None and idempotency_key.isspace():
+        raise HTTPException(status_code=422, detail="Idempotency-Key must not be blank!")
+    try:
+        return await posts_service.create(create_post, current_user, idempotency_key)
+    except idempotency.IdempotencyKeyReusedError as error:
+        raise HTTPException(status_code=422, detail=str(error))
+
+@app.post("/posts/batch", response_model=dtos.CreatePostsResponseDto)
+async def create_posts(create_posts: dtos.CreatePostsRequestDto, posts_service: Annotated[service.IPostsService, Depends(get_post_service)], current_user: str = Security(security.verify_jwt, scopes=["create-post"])):
+    if len(create_posts.posts) > service.MAX_CREATE_BATCH_SIZE:
+        raise HTTPException(status_code=422, detail=f"At most {service.MAX_CREATE_BATCH_SIZE} posts per batch!")
+    return await posts_service.create_many(create_posts, current_user)
+
+@app.get("/posts/", response_model=dtos.GetPostsResponseDto | dtos.GetPostsByIdsResponseDto)
+async def get_posts(posts_service: Annotated[service.IPostsService, Depends(get_post_service)], limit: Annotated[int, Query(ge=1, le=service.MAX_PAGE_SIZE)] = service.DEFAULT_PAGE_SIZE, cursor: str | None = None, ids: Annotated[str | None, Query(description="Comma-separated post ids to fetch in one request")] = None, fields: Annotated[str | None, Query(description="Comma-separated post fields to return; the id is always included")] = None, author: Annotated[str | None, Query(min_length=1, description="Only posts by this author, newest first")] = None, if_none_match: Annotated[str | None, Header()] = None, if_modified_since: Annotated[str | None, Header()] = None, current_user: str = Security(security.verify_jwt, scopes=["read-post"])):
+    if ids is not None:
+        if author is not None:
+            raise HTTPException(status_code=422, detail="ids cannot be combined with author!")
+        requested_ids = [id.strip() for id in ids.split(",") if id.strip()]
+        if not requested_ids or len(requested_ids) > service.MAX_READ_MANY_IDS:
+            raise HTTPException(status_code=422, detail=f"Between 1 and {service.MAX_READ_MANY_IDS} ids are required!")
+        domain_posts, missing_ids = await posts_service.read_many_posts(requested_ids, current_user)
+        return json_response(serialization.encode_posts_by_ids(domain_posts, missing_ids))
+    
+    return await read_posts_page(posts_service, limit, cursor, fields, author, if_none_match, if_modified_since, current_user)
+
+# An author's feed; same pages as GET /posts/?author=
+@app.get("/users/{user_id}/posts", response_model=dtos.GetPostsResponseDto)
+async def get_user_posts(user_id: str, posts_service: Annotated[service.IPostsService, Depends(get_post_service)], limit: Annotated[int, Query(ge=1, le=service.MAX_PAGE_SIZE)] = service.DEFAULT_PAGE_SIZE, cursor: str | None = None, fields: Annotated[str | None, Query(description="Comma-separated post fields to return; the id is always included")] = None, if_none_match: Annotated[str | None, Header()] = None, if_modified_since: Annotated[str | None, Header()] = None, current_user: str = Security(security.verify_jwt, scopes=["read-post"])):
+    return await read_posts_page(posts_service, limit, cursor, fields, user_id, if_none_match, if_modified_since, current_user)
+
+async def read_posts_page(posts_service: service.IPostsService, limit: int, cursor: str | None, fields: str | None, author: str | None, if_none_match: str | None, if_modified_since: str | None, current_user: str) -> Response:
+    projected_fields = None
+    if fields is not None:
+        try:
+            projected_fields = serialization.project_fields([field.strip() for field in fields.split(",") if field.strip()])
+        except ValueError as error:
+            raise HTTPException(status_code=422, detail=str(error))
+    
+    try:
+        # Revalidation only reads versions, so an unchanged page is never loaded or encoded
+        if if_none_match is not None or if_modified_since is not None:
+            version = await posts_service.read_page_version(limit, cursor, projected_fields, current_user, author)
+            if conditional.is_not_modified(version, if_none_match, if_modified_since):
+                return not_modified_response(version)
+        if projected_fields is not None:
+            entries, next_cursor = await posts_service.read_page_fields(limit, projected_fields, cursor, current_user, author)
+            return json_response(serialization.encode_posts_page_fields(entries, projected_fields, next_cursor), posts_service.version_of_entries(entries, projected_fields, next_cursor))
+        domain_posts, next_cursor = await posts_service.read_page(limit, cursor, current_user, author)
+    except service.InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor!")
+    return json_response(serialization.encode_posts_page(domain_posts, next_cursor), posts_service.version_of_posts(domain_posts, next_cursor))
+
+@app.get("/posts/export")
+async def export_posts(posts_service: Annotated[service.IPostsService, Depends(get_post_service)], current_user: str = Security(security.verify_jwt, scopes=["read-post"])):
+    return StreamingResponse(posts_service.export(current_user=current_user), media_type="application/x-ndjson")
+
+@app.get("/posts/top", response_model=dtos.GetPostsResponseDto)
+async def get_top_posts(posts_service: Annotated[service.IPostsService, Depends(get_post_service)], limit: Annotated[int, Query(ge=1, le=top_posts.capacity)] = 10, current_user: str = Security(security.verify_jwt, scopes=["read-post"])):
+    return json_response(serialization.encode_posts_page(await posts_service.read_top_posts(limit, current_user)))
+
+@app.get("/posts/search", response_model=dtos.SearchPostsResponseDto)
+async def search_posts(q: Annotated[str, Query(min_length=1, max_length=service.MAX_SEARCH_QUERY_LENGTH)], posts_service: Annotated[service.IPostsService, Depends(get_post_service)], limit: Annotated[int, Query(ge=1, le=service.MAX_PAGE_SIZE)] = service.DEFAULT_PAGE_SIZE, offset: Annotated[int, Query(ge=0, le=service.MAX_SEARCH_OFFSET)] = 0, current_user: str = Security(security.verify_jwt, scopes=["read-post"])):
+    started = time.perf_counter()
+    try:
+        domain_posts, next_offset = await posts_service.search_posts(q, limit, offset, current_user)
+    except infrastructure.SearchUnavailableError as error:
+        raise HTTPException(status_code=501, detail=str(error))
+    took_ms = round((time.perf_counter() - started) * 1000, 3)
+    return json_response(serialization.encode_search_results(domain_posts, next_offset, took_ms))
+
+# Change feed from a sequence cursor: a long poll returning JSON, or server-sent events when the
+# client accepts text/event-stream (EventSource resumes with Last-Event-ID)
+@app.get("/posts/changes", response_model=dtos.GetPostChangesResponseDto)
+async def get_post_changes(posts_service: Annotated[service.IPostsService, Depends(get_post_service)], since: Annotated[int, Query(ge=0)] = 0, limit: Annotated[int, Query(ge=1, le=service.MAX_PAGE_SIZE)] = service.DEFAULT_PAGE_SIZE, timeout: Annotated[float, Query(ge=0, le=service.MAX_CHANGES_WAIT_SECONDS, description="Seconds to wait for events when there are none yet")] = 0, accept: Annotated[str | None, Header()] = None, last_event_id: Annotated[int | None, Header(ge=0)] = None, current_user: str = Security(security.verify_jwt, scopes=["read-post"])):
+    if accept is not None and "text/event-stream" in accept:
+        since = last_event_id if last_event_id is not None else since
+        return StreamingResponse(posts_service.stream_changes(since, current_user), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    try:
+        events, next_since = await posts_service.wait_for_changes(since, limit, timeout, current_user)
+    except service.ChangesExpiredError as error:
+        raise HTTPException(status_code=410, detail=str(error))
+    return json_response(serialization.encode_changes(events, next_since))
+
+@app.post("/posts/top/rebuild", status_code=204)
+async def rebuild_top_posts(posts_service: Annotated[service.IPostsService, Depends(get_post_service)], current_user: str = Security(security.verify_jwt, scopes=["manage-posts"])):
+    await posts_service.rebuild_top_posts()
+
+@app.get("/posts/{post_id}", response_model=dtos.GetPostResponseDto)
+async def get_post(post_id, posts_service: Annotated[service.IPostsService, Depends(get_post_service)], if_none_match: Annotated[str | None, Header()] = None, if_modified_since: Annotated[str | None, Header()] = None, current_user: str = Security(security.verify_jwt, scopes=["read-post"])):
+    if if_none_match is not None or if_modified_since is not None:
+        version = await posts_service.read_post_version(post_id, current_user)
+        if version is None:
+            raise HTTPException(status_code=404, detail="Post not found!")
+        if conditional.is_not_modified(version, if_none_match, if_modified_since):
+            return not_modified_response(version)
+    
+    post = await posts_service.read_post(post_id, current_user)
+    if post is None:
+        raise HTTPException(status_code=404, detail="Post not found!")
+    return json_response(serialization.encode_post(post), posts_service.version_of_posts([post]))
+
+@app.post("/posts/{post_id}/upvote", status_code=202, response_model=dtos.VoteResponseDto)
+async def upvote_post(post_id: str, posts_service: Annotated[service.IPostsService, Depends(get_post_service)], current_user: str = Security(security.verify_jwt, scopes=["vote-post"])):
+    return await posts_service.vote(post_id, 1)
 
-@app.get("/posts/")
-async def get_post(posts_service: Annotated[service.IPostsService, Depends(get_post_service)], current_user: str = Security(security.verify_jwt, scopes=["read-post"])):
-    return await posts_service.read_all()
+@app.post("/posts/{post_id}/downvote", status_code=202, response_model=dtos.VoteResponseDto)
+async def downvote_post(post_id: str, posts_service: Annotated[service.IPostsService, Depends(get_post_service)], current_user: str = Security(security.verify_jwt, scopes=["vote-post"])):
+    return await posts_service.vote(post_id, -1)
 
-@app.get("/posts/{post_id}")
-async def get_post(post_id, posts_service: Annotated[service.IPostsService, Depends(get_post_service)], current_user: str = Security(security.verify_jwt, scopes=["read-post"])):
-    return await posts_service.read(post_id)
\ No newline at end of file
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,187 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+import settings
+
+# Clients opt in per request by sending this header; the breakdown comes back as Server-Timing
+PROFILE_HEADER = settings.get_settings().metrics_profile_header
+PROFILING_ENABLED = settings.get_settings().metrics_profiling_enabled
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(label_names: tuple, label_values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(str(value))}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Monotonic counter with an optional fixed set of labels
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, label_names: tuple = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self.values.get(label_values, 0)
+
+    def samples(self) -> list[str]:
+        return [f"{self.name}{format_labels(self.label_names, labels)} {value}" for labels, value in self.values.items()]
+
+
+# Cumulative histogram; observe() is a bisect and three additions, cheap enough for every request
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self.series.get(label_values)
+        if series is None:
+            # Per-bucket counts (the last one is +Inf), then sum and count
+            series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, *label_values) -> int:
+        series = self.series.get(label_values)
+        return series[2] if series is not None else 0
+
+    def samples(self) -> list[str]:
+        lines = []
+        for labels, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+# Values read at scrape time, e.g. cache or pool statistics owned by another object. The
+# callback returns either a number or a dict of label value -> number.
+class CallbackMetric:
+    def __init__(self, name: str, help: str, callback: Callable, type: str = "gauge", label_name: str | None = None) -> None:
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.type = type
+        self.label_name = label_name
+
+    def samples(self) -> list[str]:
+        value = self.callback()
+        if self.label_name is None:
+            return [f"{self.name} {value}"]
+        return [f"{self.name}{format_labels((self.label_name,), (label,))} {entry}" for label, entry in value.items()]
+
+
+# Counter-like entries of a cache stats() dict; sizes and ratios are exported separately or derived
+def cache_events(stats: dict) -> dict:
+    return {event: value for event, value in stats.items() if event not in ("entries", "hit_ratio")}
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, object] = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+layer_seconds = registry.register(Histogram("posts_layer_seconds", "Time spent per layer (auth, jwks_fetch, session_acquire, query, search, commit, serialization)", ("layer",)))
+request_seconds = registry.register(Histogram("posts_http_request_seconds", "HTTP request latency", ("method", "route")))
+requests_total = registry.register(Counter("posts_http_requests_total", "HTTP requests by status code", ("method", "route", "status")))
+errors_total = registry.register(Counter("posts_http_errors_total", "HTTP requests that failed with a 5xx or an unhandled exception", ("method", "route")))
+
+# Layer durations of the current request, present only while it is being profiled
+current_profile: ContextVar[dict | None] = ContextVar("current_profile", default=None)
+
+
+@contextmanager
+def timed(layer: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        layer_seconds.observe(elapsed, layer)
+        profile = current_profile.get()
+        if profile is not None:
+            profile[layer] = profile.get(layer, 0.0) + elapsed
+
+def server_timing(profile: dict, total: float) -> str:
+    entries = [f"{layer};dur={elapsed * 1000:.3f}" for layer, elapsed in profile.items()]
+    entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+# Pure ASGI middleware: counts and times every HTTP request by route template and, for requests
+# carrying PROFILE_HEADER, adds a Server-Timing header with the per-layer breakdown
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = None
+        if PROFILING_ENABLED and any(name == PROFILE_HEADER.encode() for name, _ in scope["headers"]):
+            profile = {}
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile is not None:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(profile, time.perf_counter() - started).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            current_profile.reset(token)
+            route = scope.get("route")
+            route_path = route.path if route is not None else "unmatched"
+            request_seconds.observe(time.perf_counter() - started, scope["method"], route_path)
+            requests_total.inc(scope["method"], route_path, status)
+            if status >= 500:
+                errors_total.inc(scope["method"], route_path)
@@ -0,0 +1,272 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+# The database is behind the migrations of this build and it is not allowed to apply them
+class SchemaOutdatedError(RuntimeError):
+    pass
+
+# Applied versions are recorded here; a database without it is at version 0
+schema_version = Table(
+    "SchemaVersion",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+# Migrations describe tables as they were at that version, independent of the current ORM models
+def posts_table_v1(metadata: MetaData) -> Table:
+    return Table(
+        "Posts",
+        metadata,
+        Column("id", String, primary_key=True),
+        Column("author", String),
+        Column("title", String),
+        Column("description", String),
+        Column("votes", Integer),
+        Column("created_at", DateTime),
+        Column("created_by", String),
+        Column("updated_at", DateTime),
+        Column("updated_by", String),
+    )
+
+def create_posts_table(connection: Connection) -> None:
+    # checkfirst adopts databases created by the old Base.metadata.create_all startup
+    posts_table_v1(MetaData()).create(connection, checkfirst=True)
+
+def create_posts_access_path_indexes(connection: Connection) -> None:
+    posts = posts_table_v1(MetaData())
+    indexes = [
+        # Recency listing and keyset pagination
+        Index("ix_posts_created_at_id", posts.c.created_at, posts.c.id),
+        # Posts by author, newest first
+        Index("ix_posts_author_created_at", posts.c.author, posts.c.created_at, posts.c.id),
+        # Vote ranking with recency as the tie-breaker
+        Index("ix_posts_votes_created_at", posts.c.votes, posts.c.created_at, posts.c.id),
+    ]
+    for index in indexes:
+        index.create(connection, checkfirst=True)
+
+# External-content FTS5 index over Posts.title/description, joined back on the Posts rowid and
+# kept in sync by triggers, so every insert path (ORM, bulk insert, raw SQL) is indexed.
+# Replaced by migration 6: rowids of a table without an INTEGER PRIMARY KEY can change on VACUUM.
+POSTS_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS PostsSearch USING fts5(
+        title, description, content='Posts', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_search_after_insert AFTER INSERT ON Posts BEGIN
+        INSERT INTO PostsSearch(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_search_after_delete AFTER DELETE ON Posts BEGIN
+        INSERT INTO PostsSearch(PostsSearch, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+    END
+    """,
+    # Vote flushes only touch votes/updated_at and do not fire this
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_search_after_update AFTER UPDATE OF title, description ON Posts BEGIN
+        INSERT INTO PostsSearch(PostsSearch, rowid, title, description) VALUES ('delete', old.rowid, old.title, old.description);
+        INSERT INTO PostsSearch(rowid, title, description) VALUES (new.rowid, new.title, new.description);
+    END
+    """,
+    "INSERT INTO PostsSearch(PostsSearch) VALUES ('rebuild')",
+]
+
+def create_posts_search_index(connection: Connection) -> None:
+    if connection.dialect.name != "sqlite":
+        logger.warning("Full-text search index is SQLite FTS5 only; skipped for %s", connection.dialect.name)
+        return
+    for statement in POSTS_SEARCH_DDL:
+        connection.execute(text(statement))
+
+# The index of migration 3, rebuilt to hold its own copy of the text next to the post id, which
+# searches join back on. The id is UNINDEXED, so it is stored but never matched. The index's own
+# rowids follow insertion order and only serve to walk matches newest first. Posts are not
+# deleted by the API; when they are, the delete trigger scans the index for the id.
+POSTS_SEARCH_BY_ID_DDL = [
+    "DROP TRIGGER IF EXISTS posts_search_after_insert",
+    "DROP TRIGGER IF EXISTS posts_search_after_delete",
+    "DROP TRIGGER IF EXISTS posts_search_after_update",
+    "DROP TABLE IF EXISTS PostsSearch",
+    """
+    CREATE VIRTUAL TABLE PostsSearch USING fts5(
+        id UNINDEXED, title, description, tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER posts_search_after_insert AFTER INSERT ON Posts BEGIN
+        INSERT INTO PostsSearch(id, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER posts_search_after_delete AFTER DELETE ON Posts BEGIN
+        DELETE FROM PostsSearch WHERE id = old.id;
+    END
+    """,
+    # Vote flushes only touch votes/voted_at and do not fire this
+    """
+    CREATE TRIGGER posts_search_after_update AFTER UPDATE OF title, description ON Posts BEGIN
+        UPDATE PostsSearch SET title = new.title, description = new.description WHERE id = old.id;
+    END
+    """,
+    # Oldest first, so existing posts get rowids in the same order as new ones
+    "INSERT INTO PostsSearch(id, title, description) SELECT id, title, description FROM Posts ORDER BY created_at, id",
+]
+
+def key_posts_search_index_on_id(connection: Connection) -> None:
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in POSTS_SEARCH_BY_ID_DDL:
+        connection.execute(text(statement))
+
+# Vote flushes stamp voted_at instead of updated_at, which stays paired with updated_by
+def add_posts_voted_at(connection: Connection) -> None:
+    # Databases created by the old create_all startup may already have the column
+    if "voted_at" in {column["name"] for column in inspect(connection).get_columns("Posts")}:
+        return
+    connection.execute(text(f'ALTER TABLE "Posts" ADD COLUMN voted_at {DateTime().compile(dialect=connection.dialect)}'))
+
+def post_events_table_v4(metadata: MetaData) -> Table:
+    return Table(
+        "PostEvents",
+        metadata,
+        Column("sequence", Integer, primary_key=True),
+        Column("type", String, nullable=False),
+        Column("post_id", String, nullable=False),
+        Column("payload", String, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        Column("dispatched_at", DateTime),
+        # Undispatched events in sequence order, for the outbox dispatcher
+        Index("ix_post_events_dispatched_at_sequence", "dispatched_at", "sequence"),
+        # AUTOINCREMENT: sequences are change feed cursors and must not be reused after pruning
+        sqlite_autoincrement=True,
+    )
+
+def create_post_events_table(connection: Connection) -> None:
+    post_events_table_v4(MetaData()).create(connection, checkfirst=True)
+
+def idempotency_keys_table_v5(metadata: MetaData) -> Table:
+    return Table(
+        "IdempotencyKeys",
+        metadata,
+        Column("owner", String, primary_key=True),
+        Column("key", String, primary_key=True),
+        Column("fingerprint", String, nullable=False),
+        Column("response", String, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+        # Expired keys are pruned by age
+        Index("ix_idempotency_keys_created_at", "created_at"),
+    )
+
+def create_idempotency_keys_table(connection: Connection) -> None:
+    idempotency_keys_table_v5(MetaData()).create(connection, checkfirst=True)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "Create Posts table", create_posts_table),
+    Migration(2, "Index Posts for recency, author and vote ranking access paths", create_posts_access_path_indexes),
+    Migration(3, "Full-text search index over Posts title and description", create_posts_search_index),
+    Migration(4, "Create PostEvents outbox table", create_post_events_table),
+    Migration(5, "Create IdempotencyKeys table", create_idempotency_keys_table),
+    Migration(6, "Key the full-text search index on post ids", key_posts_search_index_on_id),
+    Migration(7, "Add Posts.voted_at for vote flushes", add_posts_voted_at),
+]
+
+
+def current_version(connection: Connection) -> int:
+    if not inspect(connection).has_table(schema_version.name):
+        return 0
+    return connection.scalar(select(schema_version.c.version).order_by(schema_version.c.version.desc()).limit(1)) or 0
+
+def apply_migrations(connection: Connection, migrations: list[Migration] = MIGRATIONS) -> list[int]:
+    schema_version.create(connection, checkfirst=True)
+    version = current_version(connection)
+    applied: list[int] = []
+
+    for migration in sorted(migrations, key=lambda migration: migration.version):
+        if migration.version <= version:
+            continue
+        logger.info("Applying schema migration %s: %s", migration.version, migration.description)
+        migration.upgrade(connection)
+        connection.execute(insert(schema_version).values(
+            version=migration.version,
+            description=migration.description,
+            applied_at=datetime.now(timezone.utc),
+        ))
+        applied.append(migration.version)
+
+    return applied
+
+# Key of the Postgres advisory lock that serializes migrators
+MIGRATION_LOCK_KEY = 727_000_001
+
+# Applies the pending migrations in one transaction, holding a lock that makes concurrent migrators
+# (every worker migrates in its lifespan) wait for each other; the version is read once the lock is
+# held, so the ones that waited find nothing left to apply. pysqlite only opens a transaction before
+# DML, leaving DDL autocommitted, so on SQLite the connection runs in autocommit mode and the
+# transaction is opened explicitly: BEGIN IMMEDIATE also takes the database write lock.
+def migrate(connection: Connection, migrations: list[Migration] = MIGRATIONS) -> list[int]:
+    if connection.dialect.name != "sqlite":
+        with connection.begin():
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            return apply_migrations(connection, migrations)
+
+    connection.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        applied = apply_migrations(connection, migrations)
+    except BaseException:
+        connection.exec_driver_sql("ROLLBACK")
+        raise
+    connection.exec_driver_sql("COMMIT")
+    return applied
+
+# Brings the database to the latest version, all or nothing; returns the versions applied
+def upgrade(engine: Engine, migrations: list[Migration] = MIGRATIONS) -> list[int]:
+    with engine.connect() as connection:
+        if connection.dialect.name == "sqlite":
+            connection.execution_options(isolation_level="AUTOCOMMIT")
+        return migrate(connection, migrations)
+
+async def upgrade_async(engine: AsyncEngine, migrations: list[Migration] = MIGRATIONS) -> list[int]:
+    async with engine.connect() as connection:
+        if connection.dialect.name == "sqlite":
+            await connection.execution_options(isolation_level="AUTOCOMMIT")
+        return await connection.run_sync(migrate, migrations)
+
+def latest_version(migrations: list[Migration] = MIGRATIONS) -> int:
+    return max(migration.version for migration in migrations)
+
+def check_version(connection: Connection) -> None:
+    version = current_version(connection)
+    if version < latest_version():
+        raise SchemaOutdatedError(f"Database schema is at version {version}, this build needs version {latest_version()}")
+
+# For deployments that migrate out of band: fails while migrations are pending, writes nothing
+def check(engine: Engine) -> None:
+    with engine.connect() as connection:
+        check_version(connection)
+
+async def check_async(engine: AsyncEngine) -> None:
+    async with engine.connect() as connection:
+        await connection.run_sync(check_version)
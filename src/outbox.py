@@ -0,0 +1,145 @@
+import asyncio
+import dataclasses
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+import domain
+import serialization
+
+logger = logging.getLogger(__name__)
+
+POST_CREATED = "post.created"
+POST_VOTED = "post.voted"
+
+
+# The payload carries the timestamps as stored (naive UTC), so it matches what reads of the post return
+def post_created(post: domain.Post) -> domain.PostEvent:
+    stored = dataclasses.replace(post, created_at=serialization.to_stored_utc(post.created_at), updated_at=serialization.to_stored_utc(post.updated_at))
+    return domain.PostEvent(POST_CREATED, post.id, serialization.post_to_dict(stored), datetime.now(timezone.utc))
+
+def post_voted(post_id: str, votes: int) -> domain.PostEvent:
+    return domain.PostEvent(POST_VOTED, post_id, {"votes": votes}, datetime.now(timezone.utc))
+
+
+# Wakes change feed readers of this worker when new events are dispatched. Readers always fetch
+# the events from the database; this only saves them from polling it while nothing happens.
+class ChangeFeed:
+    def __init__(self) -> None:
+        self.latest_sequence = 0
+        self.changed = asyncio.Event()
+
+    def publish(self, events: list[domain.PostEvent]) -> None:
+        self.latest_sequence = max(self.latest_sequence, max(event.sequence for event in events))
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    # True when events after since were published before the timeout
+    async def wait(self, since: int, timeout: float) -> bool:
+        if self.latest_sequence > since:
+            return True
+        changed = self.changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout=timeout)
+        except TimeoutError:
+            return False
+        return self.latest_sequence > since
+
+
+# Drains the PostEvents outbox in sequence order. Listeners get each batch before it is marked
+# dispatched, so a listener that raises leaves the batch to be retried: delivery is at least once.
+# Dispatched events are pruned after retention_seconds.
+class OutboxDispatcher:
+    def __init__(self, uow_factory: Callable, batch_size: int = 500, poll_interval_seconds: float = 1.0, retention_seconds: float = 7 * 24 * 3600) -> None:
+        assert batch_size > 0 and poll_interval_seconds > 0 and retention_seconds > 0
+
+        self.uow_factory = uow_factory
+        self.batch_size = batch_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.retention_seconds = retention_seconds
+        self.listeners: list[Callable] = []
+        self.dispatch_lock = asyncio.Lock()
+        self.dispatch_requested = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.dispatched_events = 0
+        self.dispatch_errors = 0
+        self.pruned_events = 0
+
+    # Listeners receive the list of PostEvents of every batch
+    def add_listener(self, listener: Callable) -> None:
+        self.listeners.append(listener)
+
+    # Called after a commit that wrote events, so they go out without waiting for the next poll
+    def notify(self) -> None:
+        self.dispatch_requested.set()
+
+    async def dispatch(self) -> int:
+        async with self.dispatch_lock:
+            try:
+                async with self.uow_factory() as uow:
+                    events = await uow.events.read_pending(self.batch_size)
+                    if not events:
+                        return 0
+                    for listener in self.listeners:
+                        listener(events)
+                    await uow.events.mark_dispatched([event.sequence for event in events])
+                    await uow.commit()
+            except BaseException:
+                self.dispatch_errors += 1
+                raise
+
+            self.dispatched_events += len(events)
+            return len(events)
+
+    # Dispatches batches until the outbox is empty
+    async def drain(self) -> int:
+        dispatched = 0
+        while True:
+            batch = await self.dispatch()
+            dispatched += batch
+            if batch < self.batch_size:
+                return dispatched
+
+    async def prune(self) -> int:
+        async with self.uow_factory() as uow:
+            pruned = await uow.events.prune(datetime.now(timezone.utc) - timedelta(seconds=self.retention_seconds))
+            await uow.commit()
+        self.pruned_events += pruned
+        return pruned
+
+    async def run(self) -> None:
+        prune_every = max(1, int(3600 / self.poll_interval_seconds))
+        polls = 0
+        while True:
+            try:
+                await asyncio.wait_for(self.dispatch_requested.wait(), timeout=self.poll_interval_seconds)
+            except TimeoutError:
+                pass
+            self.dispatch_requested.clear()
+
+            try:
+                await self.drain()
+                polls += 1
+                # Roughly hourly
+                if polls % prune_every == 0:
+                    await self.prune()
+            except Exception:
+                logger.exception("Failed to dispatch outbox events")
+
+    def start(self) -> None:
+        if self.task is None:
+            # An Event binds to the loop that first waits on it, and a later lifespan may run on another loop
+            requested, self.dispatch_requested = self.dispatch_requested.is_set(), asyncio.Event()
+            if requested:
+                self.dispatch_requested.set()
+            self.task = asyncio.create_task(self.run())
+
+    # Stops the background dispatcher and sends out whatever is still pending
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.drain()
@@ -0,0 +1,54 @@
+from bisect import bisect_left, insort
+from datetime import datetime
+import serialization
+
+
+def ranking_key(id: str, votes: int, created_at: datetime) -> tuple:
+    return (-(votes or 0), -serialization.to_utc(created_at).timestamp(), id)
+
+
+# The best `capacity` posts ordered by votes, newest first on ties, kept in a sorted list so
+# top-K reads are a slice. Posts outside the index are only admitted when they outrank its
+# last entry, so the tail can drift from the database until the next rebuild.
+class TopPostsIndex:
+    def __init__(self, capacity: int = 1000) -> None:
+        assert capacity > 0
+
+        self.capacity = capacity
+        self.keys: list[tuple] = []
+        self.keys_by_id: dict[str, tuple] = {}
+
+    def upsert(self, id: str, votes: int, created_at: datetime) -> None:
+        key = ranking_key(id, votes, created_at)
+        old_key = self.keys_by_id.get(id)
+        if old_key is not None:
+            del self.keys[bisect_left(self.keys, old_key)]
+        elif len(self.keys) >= self.capacity and key >= self.keys[-1]:
+            return
+
+        insort(self.keys, key)
+        self.keys_by_id[id] = key
+        if len(self.keys) > self.capacity:
+            evicted = self.keys.pop()
+            del self.keys_by_id[evicted[2]]
+
+    def remove(self, id: str) -> None:
+        key = self.keys_by_id.pop(id, None)
+        if key is not None:
+            del self.keys[bisect_left(self.keys, key)]
+
+    # Applies (id, votes, created_at)-bearing rows such as those returned by a vote flush
+    def apply_rows(self, rows) -> None:
+        for row in rows:
+            self.upsert(row.id, row.votes, row.created_at)
+
+    def rebuild(self, rows) -> None:
+        keys = sorted(ranking_key(row.id, row.votes, row.created_at) for row in rows)[:self.capacity]
+        self.keys = keys
+        self.keys_by_id = {key[2]: key for key in keys}
+
+    def top(self, limit: int) -> list[str]:
+        return [key[2] for key in self.keys[:limit]]
+
+    def __len__(self) -> int:
+        return len(self.keys)
@@ -0,0 +1,45 @@
+import time
+from itertools import cycle
+from typing import Callable
+import cache
+
+
+# Picks the session factory for a unit of work: writes go to the writer, reads rotate across the
+# readers. A user who wrote recently reads from the writer until stickiness_seconds have passed,
+# so replica lag never hides their own writes. Stickiness is per process. Without readers every
+# read goes to the writer, and is counted as such.
+class ReplicaRouter:
+    def __init__(self, writer: Callable, readers: list[Callable] | None = None, stickiness_seconds: float = 5.0, max_tracked_users: int = 100000, clock=time.monotonic) -> None:
+        assert stickiness_seconds >= 0
+
+        self.writer = writer
+        self.readers = list(readers or [])
+        self.has_replicas = bool(self.readers)
+        self.reader_cycle = cycle(self.readers)
+        self.stickiness_seconds = stickiness_seconds
+        self.recent_writers = cache.LruCache(max_tracked_users, ttl_seconds=stickiness_seconds, clock=clock)
+        self.writer_reads = 0
+        self.replica_reads = 0
+
+    def record_write(self, current_user: str | None) -> None:
+        if self.has_replicas and current_user is not None and self.stickiness_seconds > 0:
+            self.recent_writers.set(current_user, True)
+
+    def is_sticky(self, current_user: str | None) -> bool:
+        return current_user is not None and self.recent_writers.get(current_user) is not None
+
+    def next_reader(self) -> Callable:
+        return next(self.reader_cycle)
+
+    # Returns the session factory and whether it is the writer
+    def route(self, write: bool, current_user: str | None = None) -> tuple[Callable, bool]:
+        if write:
+            return self.writer, True
+        if not self.has_replicas or self.is_sticky(current_user):
+            self.writer_reads += 1
+            return self.writer, True
+        self.replica_reads += 1
+        return self.next_reader(), False
+
+    def stats(self) -> dict:
+        return {"writer_reads": self.writer_reads, "replica_reads": self.replica_reads, "sticky_users": len(self.recent_writers)}
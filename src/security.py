@@ -1,58 +1,171 @@
-import json
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
 from typing import Annotated
-from urllib.request import urlopen
-from fastapi import Depends, HTTPException, Security
+from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, SecurityScopes
 from jose import jwt
-from dotenv import load_dotenv
-import os
 import httpx
+import cache
+import metrics
+import settings
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+
+# In-process JWKS key store. Keys are indexed by kid and served from memory; once the TTL
+# elapses the current keys keep being served while a refresh runs in the background. Fetches,
+# whether for an expired TTL, an unknown kid or a retry, start at most once per cooldown window,
+# and fetch failures keep the last good keys.
+class JwksKeyStore:
+    def __init__(self, jwks_url: str, ttl_seconds: float = 600, unknown_kid_cooldown_seconds: float = 30, http_client: httpx.AsyncClient | None = None, clock=time.monotonic) -> None:
+        self.jwks_url = jwks_url
+        self.ttl_seconds = ttl_seconds
+        self.unknown_kid_cooldown_seconds = unknown_kid_cooldown_seconds
+        self.http_client = http_client
+        self.clock = clock
+        self.keys: dict[str, dict] = {}
+        self.fetched_at: float | None = None
+        self.fetch_started_at: float | None = None
+        self.refresh_task: asyncio.Task | None = None
+        self.fetch_count = 0
+        self.fetch_errors = 0
+
+    async def get_key(self, kid: str) -> dict | None:
+        if self.fetched_at is None:
+            # Until a fetch succeeds there is nothing to serve, but retries still wait out the cooldown
+            if not self.refreshing() and not self.can_force_refresh():
+                raise LookupError("JWKS unavailable")
+            await self.refresh()
+        elif self.clock() - self.fetched_at >= self.ttl_seconds and self.can_force_refresh():
+            self.schedule_refresh()
+
+        key = self.keys.get(kid)
+        if key is None and self.can_force_refresh():
+            await self.refresh()
+            key = self.keys.get(kid)
+
+        return key
+
+    def can_force_refresh(self) -> bool:
+        # At most one fetch per cooldown, so neither unknown kids nor a failing IdP trigger a fetch storm
+        return self.fetch_started_at is None or self.clock() - self.fetch_started_at >= self.unknown_kid_cooldown_seconds
+
+    def refreshing(self) -> bool:
+        return self.refresh_task is not None and not self.refresh_task.done()
+
+    def schedule_refresh(self) -> asyncio.Task:
+        # Concurrent callers share the same in-flight fetch
+        if self.refresh_task is None or self.refresh_task.done():
+            self.fetch_started_at = self.clock()
+            self.refresh_task = asyncio.create_task(self.fetch())
+        return self.refresh_task
+
+    async def refresh(self) -> None:
+        await asyncio.shield(self.schedule_refresh())
+        if not self.keys:
+            raise LookupError("JWKS unavailable")
+
+    async def fetch(self) -> None:
+        try:
+            with metrics.timed("jwks_fetch"):
+                if self.http_client is not None:
+                    response = await self.http_client.get(self.jwks_url)
+                else:
+                    async with httpx.AsyncClient() as client:
+                        response = await client.get(self.jwks_url)
+            response.raise_for_status()
+            jwks = response.json()
+            self.keys = {key["kid"]: index_rsa_key(key) for key in jwks["keys"] if "kid" in key}
+            self.fetched_at = self.clock()
+            self.fetch_count += 1
+        except Exception:
+            # Stale-while-error: keep serving the previous keys and retry on the next lookup
+            self.fetch_errors += 1
+            logger.exception("Failed to fetch JWKS from %s", self.jwks_url)
+
+
+@dataclass(frozen=True)
+class VerifiedToken:
+    claims: dict
+    permissions: frozenset[str]
+
+
+# Verified tokens keyed by a SHA-256 of the raw bearer token, so repeated tokens skip RSA
+# verification. Entries expire at the token's exp claim; tokens without one are never cached.
+class VerifiedTokenCache:
+    def __init__(self, max_entries: int = 10000, clock=time.time) -> None:
+        self.entries = cache.LruCache(max_entries, clock=clock)
+
+    def get(self, token: str) -> VerifiedToken | None:
+        return self.entries.get(hash_token(token))
+
+    def add(self, token: str, verified_token: VerifiedToken) -> None:
+        expires_at = verified_token.claims.get("exp")
+        if isinstance(expires_at, (int, float)):
+            self.entries.set(hash_token(token), verified_token, expires_at=expires_at)
+
+    def stats(self) -> dict:
+        return self.entries.stats()
+
+
+def hash_token(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+jwks_store: JwksKeyStore | None = None
+token_cache = VerifiedTokenCache(max_entries=settings.get_settings().token_cache_max_entries)
+
+def get_jwks_store() -> JwksKeyStore:
+    global jwks_store
+    if jwks_store is None:
+        app_settings = settings.get_settings()
+        jwks_store = JwksKeyStore(
+            f"{app_settings.auth0_domain}/.well-known/jwks.json",
+            ttl_seconds=app_settings.jwks_ttl_seconds,
+            unknown_kid_cooldown_seconds=app_settings.jwks_unknown_kid_cooldown_seconds,
+        )
+    return jwks_store
+
 async def verify_jwt(encoded: Annotated[HTTPAuthorizationCredentials, Depends(security)], scopes: SecurityScopes) -> str:
-    try:
-        jwks = get_jwks_json()
-        rsa_key = get_rsa_key(jwks, encoded)        
-        decoded_jwt = jwt.decode(encoded.credentials, rsa_key, algorithms=[os.getenv("ALGORITHM")], audience=os.getenv("API_AUDIENCE"))
-        scope_found = validate_permissions(decoded_jwt, scopes.scopes[0])
-        
-        if not scope_found:
-            raise HTTPException(status_code=403, detail="Unauthorized access to resource!")
-        
-        current_user = decoded_jwt["sub"]
-        return current_user
-    except HTTPException:
-        raise
-    except:
-        raise HTTPException(status_code=401, detail="Invalid token!")
-
-def get_jwks_json():
-    jwks_url = httpx.get(f'{os.getenv("AUTH0_DOMAIN")}/.well-known/jwks.json')
-    jwks = json.loads(jwks_url.read())
-    return jwks
-
-def get_rsa_key(jwks, encoded):
+    with metrics.timed("auth"):
+        try:
+            verified_token = token_cache.get(encoded.credentials)
+            if verified_token is None:
+                rsa_key = await get_rsa_key(encoded)
+                decoded_jwt = jwt.decode(encoded.credentials, rsa_key, algorithms=[settings.get_settings().algorithm], audience=settings.get_settings().api_audience)
+                verified_token = VerifiedToken(claims=decoded_jwt, permissions=frozenset(decoded_jwt["permissions"]))
+                token_cache.add(encoded.credentials, verified_token)
+
+            scope_found = validate_permissions(verified_token, scopes.scopes[0])
+
+            if not scope_found:
+                raise HTTPException(status_code=403, detail="Unauthorized access to resource!")
+
+            current_user = verified_token.claims["sub"]
+            return current_user
+        except HTTPException:
+            raise
+        except:
+            raise HTTPException(status_code=401, detail="Invalid token!")
+
+async def get_rsa_key(encoded):
     unverified_header = jwt.get_unverified_header(encoded.credentials)
-    rsa_key = {}
-    for key in jwks["keys"]:
-        if key["kid"] == unverified_header["kid"]:
-            rsa_key = {
-                "kty": key["kty"],
-                "kid": key["kid"],
-                "use": key["use"],
-                "n": key["n"],
-                "e": key["e"]
-            }
-    return rsa_key
-
-def validate_permissions(decoded_jwt, required_scope):
-    scope_found = False
-    permissions = decoded_jwt["permissions"]
-    for permission in permissions:
-        if permission == required_scope:
-            scope_found = True
-            break
-    return scope_found
\ No newline at end of file
+    rsa_key = await get_jwks_store().get_key(unverified_header["kid"])
+    return rsa_key or {}
+
+def index_rsa_key(key):
+    return {
+        "kty": key["kty"],
+        "kid": key["kid"],
+        "use": key["use"],
+        "n": key["n"],
+        "e": key["e"]
+    }
+
+def validate_permissions(verified_token: VerifiedToken, required_scope: str) -> bool:
+    return required_scope in verified_token.permissions
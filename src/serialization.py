@@ -0,0 +1,80 @@
+import orjson
+from datetime import datetime, timezone
+import domain
+import metrics
+
+
+# Database datetimes come back naive but are stored as UTC; aware values are converted
+def to_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+# The naive UTC form the DateTime columns store and reads return
+def to_stored_utc(value: datetime) -> datetime:
+    return to_utc(value).replace(tzinfo=None)
+
+
+# Fast response path: domain posts are encoded straight to JSON bytes with orjson, skipping the
+# GetPostResponseDto models and FastAPI's re-validation. The output is byte-for-byte what
+# JSONResponse produced for the DTOs: same field order, compact separators, UTF-8 without
+# ASCII escaping and datetimes formatted with str().
+POST_FIELDS = ("id", "author", "title", "description", "votes", "created_at", "created_by", "updated_at", "updated_by")
+
+def post_to_dict(post: domain.Post) -> dict:
+    return {
+        "id": post.id,
+        "author": post.author,
+        "title": post.title,
+        "description": post.description,
+        "votes": post.votes,
+        "created_at": str(post.created_at),
+        "created_by": post.created_by,
+        "updated_at": str(post.updated_at),
+        "updated_by": post.updated_by,
+    }
+
+@metrics.timed("serialization")
+def encode_post(post: domain.Post) -> bytes:
+    return orjson.dumps(post_to_dict(post))
+
+@metrics.timed("serialization")
+def encode_posts_page(posts: list[domain.Post], next_cursor: str | None = None) -> bytes:
+    return orjson.dumps({"posts": [post_to_dict(post) for post in posts], "next_cursor": next_cursor})
+
+@metrics.timed("serialization")
+def encode_posts_by_ids(posts: list[domain.Post], missing_ids: list[str]) -> bytes:
+    return orjson.dumps({"posts": [post_to_dict(post) for post in posts], "missing_ids": missing_ids})
+
+# Normalizes a fields= selection to POST_FIELDS order; the id is always part of a projection
+def project_fields(fields: list[str]) -> tuple:
+    unknown = set(fields).difference(POST_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in POST_FIELDS if field == "id" or field in fields)
+
+def projection_to_dict(entry: dict, fields: tuple) -> dict:
+    return {field: str(entry[field]) if isinstance(entry[field], datetime) else entry[field] for field in fields}
+
+@metrics.timed("serialization")
+def encode_posts_page_fields(entries: list[dict], fields: tuple, next_cursor: str | None = None) -> bytes:
+    return orjson.dumps({"posts": [projection_to_dict(entry, fields) for entry in entries], "next_cursor": next_cursor})
+
+@metrics.timed("serialization")
+def encode_search_results(posts: list[domain.Post], next_offset: int | None, took_ms: float) -> bytes:
+    return orjson.dumps({"posts": [post_to_dict(post) for post in posts], "next_offset": next_offset, "took_ms": took_ms})
+
+def event_to_dict(event: domain.PostEvent) -> dict:
+    return {"sequence": event.sequence, "type": event.type, "post_id": event.post_id, "created_at": str(event.created_at), "payload": event.payload}
+
+@metrics.timed("serialization")
+def encode_changes(events: list[domain.PostEvent], next_since: int) -> bytes:
+    return orjson.dumps({"events": [event_to_dict(event) for event in events], "next_since": next_since})
+
+# text/event-stream framing; the id lets EventSource resume with Last-Event-ID
+@metrics.timed("serialization")
+def encode_sse_events(events: list[domain.PostEvent]) -> bytes:
+    return b"".join(b"id: %d\nevent: %s\ndata: %s\n\n" % (event.sequence, event.type.encode(), orjson.dumps(event_to_dict(event))) for event in events)
+
+def encode_sse_expired(since: int) -> bytes:
+    return b"event: expired\ndata: %s\n\n" % orjson.dumps({"since": since})
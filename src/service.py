@@ -1,95 +1,539 @@
 from abc import ABC, abstractmethod
-from dotenv import load_dotenv
+import asyncio
+import base64
+import cache
+import conditional
+import dataclasses
+import json
 import domain
 import dtos
 from uuid import uuid4
-from datetime import datetime, timezone
-import logging
+from datetime import datetime, timedelta, timezone
+import idempotency
+import infrastructure
+import metrics
+import outbox
+import ranking
+import serialization
+import settings
+import singleflight
 import unit_of_work
+import votes
+
+# Limits are part of route signatures (main.py) and argument defaults, so they are fixed when
+# this module is imported
+DEFAULT_PAGE_SIZE = settings.get_settings().default_page_size
+MAX_PAGE_SIZE = settings.get_settings().max_page_size
+MAX_CREATE_BATCH_SIZE = settings.get_settings().max_create_batch_size
+MAX_READ_MANY_IDS = settings.get_settings().max_read_many_ids
+EXPORT_BATCH_SIZE = settings.get_settings().export_batch_size
+MAX_SEARCH_QUERY_LENGTH = settings.get_settings().max_search_query_length
+# Every ranked page re-scores the matches before it, so deep offsets are capped
+MAX_SEARCH_OFFSET = settings.get_settings().max_search_offset
+MAX_CHANGES_WAIT_SECONDS = settings.get_settings().max_changes_wait_seconds
+# Writes on other workers do not wake this one's change feed, so waiting readers re-check the
+# database this often
+CHANGES_POLL_SECONDS = settings.get_settings().changes_poll_seconds
+CHANGES_HEARTBEAT_SECONDS = settings.get_settings().changes_heartbeat_seconds
+
+class InvalidCursorError(ValueError):
+    pass
+
+# The events after a change feed cursor were pruned; the consumer has to resync
+class ChangesExpiredError(ValueError):
+    pass
 
-load_dotenv()
 
 class IPostsService(ABC):
     @abstractmethod
-    async def create(self, dto, current_user):
+    async def create(self, dto, current_user, idempotency_key=None):
+        pass
+    
+    @abstractmethod
+    async def create_many(self, dto, current_user):
+        pass
+    
+    @abstractmethod
+    async def read_all(self, limit, cursor=None, current_user=None):
+        pass
+    
+    @abstractmethod
+    def export(self, batch_size, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def read_many(self, ids, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def read_top(self, limit, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def rebuild_top_posts(self):
+        pass
+    
+    @abstractmethod
+    async def vote(self, id, delta):
         pass
     
     @abstractmethod
-    async def read_all(self):
+    async def read_page(self, limit, cursor=None, current_user=None, author=None):
         pass
     
     @abstractmethod
-    async def read(self, id):
+    async def read_page_fields(self, limit, fields, cursor=None, current_user=None, author=None):
+        pass
+    
+    @abstractmethod
+    async def read_page_version(self, limit, cursor=None, fields=None, current_user=None, author=None):
+        pass
+    
+    @abstractmethod
+    async def read_many_posts(self, ids, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def read_top_posts(self, limit, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def search_posts(self, query, limit, offset=0, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def read_changes(self, since, limit, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def wait_for_changes(self, since, limit, timeout=0, current_user=None):
+        pass
+    
+    @abstractmethod
+    def stream_changes(self, since, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def read(self, id, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def read_post(self, id, current_user=None):
+        pass
+    
+    @abstractmethod
+    async def read_post_version(self, id, current_user=None):
+        pass
+    
+    @abstractmethod
+    def version_of_posts(self, posts, next_cursor=None):
+        pass
+    
+    @abstractmethod
+    def version_of_entries(self, entries, fields, next_cursor=None):
         pass
 
 
 class PostsService(IPostsService):
-    def __init__(self, uow: unit_of_work.UnitOfWork) -> None:
+    def __init__(self, uow: unit_of_work.AsyncUnitOfWork, vote_buffer: votes.VoteBuffer | None = None, top_posts: ranking.TopPostsIndex | None = None, author_feeds: cache.AuthorFeedCache | None = None, outbox_dispatcher: outbox.OutboxDispatcher | None = None, change_feed: outbox.ChangeFeed | None = None, idempotency_store: idempotency.IdempotencyStore | None = None, read_flights: singleflight.SingleFlight | None = None) -> None:
         super().__init__()
         self.uow = uow
+        self.vote_buffer = vote_buffer
+        self.top_posts = top_posts
+        self.author_feeds = author_feeds
+        self.outbox_dispatcher = outbox_dispatcher
+        self.change_feed = change_feed
+        self.idempotency_store = idempotency_store
+        self.read_flights = read_flights
         
-    async def create(self, dto: dtos.CreatePostRequestDto, current_user: str) -> dtos.CreatePostResponseDto:
+    # With an idempotency key, retries get the first response back and concurrent duplicates
+    # wait for the one insert in flight
+    async def create(self, dto: dtos.CreatePostRequestDto, current_user: str, idempotency_key: str | None = None) -> dtos.CreatePostResponseDto:
         assert dto is not None
         assert current_user is not None and not current_user.isspace()
         
-        new_post_id = str(uuid4())
-        
-        domain_post = domain.Post(
-            id=new_post_id,
-            author=current_user,
-            title=dto.title,
-            description=dto.description,
-            votes=0,
-            created_at=datetime.now(timezone.utc),
-            created_by=current_user,
-            updated_at=datetime.now(timezone.utc),
-            updated_by=current_user
-        )
+        if idempotency_key is not None:
+            assert self.idempotency_store is not None and idempotency_key and not idempotency_key.isspace()
+            request_fingerprint = idempotency.fingerprint(dto.model_dump())
+            stored = await self.idempotency_store.run((current_user, idempotency_key), request_fingerprint, lambda: self.create_once(dto, current_user, idempotency_key, request_fingerprint))
+            return dtos.CreatePostResponseDto(**stored.response)
+        
+        domain_post = new_post(dto, current_user)
 
-        with self.uow:    
+        async with self.uow.writing(current_user):
             await self.uow.posts.create(domain_post)
-            self.uow.commit()
+            await self.record_events([outbox.post_created(domain_post)])
+            await self.uow.commit()
+        self.after_create([domain_post], current_user)
 
-        return dtos.CreatePostResponseDto(id=new_post_id)
-    
-    async def read_all(self) -> dtos.GetPostsResponseDto:
-        with self.uow:
-            domain_posts = await self.uow.posts.read_all()
-            
-        return_dtos: list[dtos.GetPostResponseDto] = []
-        
-        for entry in domain_posts:
-            return_dtos.append(dtos.GetPostResponseDto(
-            id=entry.id,
-            author=entry.author,
-            title=entry.title,
-            description=entry.description,
-            votes=entry.votes,
-            created_at=str(entry.created_at),
-            created_by=entry.created_by,
-            updated_at=str(entry.updated_at),
-            updated_by=entry.updated_by
-        ))
+        return dtos.CreatePostResponseDto(id=domain_post.id)
+    
+    # Creates the post and records the key in the same transaction, unless the key is already
+    # stored; a key committed by another worker in the meantime wins and its response is returned
+    async def create_once(self, dto: dtos.CreatePostRequestDto, current_user: str, idempotency_key: str, request_fingerprint: str) -> idempotency.StoredResponse:
+        not_before = datetime.now(timezone.utc) - timedelta(seconds=self.idempotency_store.ttl_seconds)
+        domain_post = new_post(dto, current_user)
+        stored = idempotency.StoredResponse(request_fingerprint, dtos.CreatePostResponseDto(id=domain_post.id).model_dump())
+        
+        async with self.uow.writing(current_user):
+            existing = await self.uow.idempotency_keys.read(current_user, idempotency_key, not_before)
+            if existing is not None:
+                return existing
+            if not await self.uow.idempotency_keys.add(current_user, idempotency_key, stored, not_before):
+                return await self.uow.idempotency_keys.read(current_user, idempotency_key, not_before)
+            await self.uow.posts.create(domain_post)
+            await self.record_events([outbox.post_created(domain_post)])
+            await self.uow.commit()
+        self.after_create([domain_post], current_user)
+        
+        return stored
+    
+    async def create_many(self, dto: dtos.CreatePostsRequestDto, current_user: str) -> dtos.CreatePostsResponseDto:
+        assert dto is not None and 0 < len(dto.posts) <= MAX_CREATE_BATCH_SIZE
+        assert current_user is not None and not current_user.isspace()
+        
+        domain_posts = [new_post(entry, current_user) for entry in dto.posts]
+        
+        async with self.uow.writing(current_user):
+            await self.uow.posts.create_many(domain_posts)
+            await self.record_events([outbox.post_created(post) for post in domain_posts])
+            await self.uow.commit()
+        self.after_create(domain_posts, current_user)
+        
+        return dtos.CreatePostsResponseDto(ids=[post.id for post in domain_posts])
+    
+    async def read_all(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None, current_user: str | None = None) -> dtos.GetPostsResponseDto:
+        domain_posts, next_cursor = await self.read_page(limit, cursor, current_user)
         
         return dtos.GetPostsResponseDto(
-            posts=return_dtos
+            posts=[to_post_dto(entry) for entry in domain_posts],
+            next_cursor=next_cursor
         )
     
-    async def read(self, id: str) -> dtos.GetPostResponseDto:
-        assert id is not None and not id.isspace()
+    # Newest posts first, optionally by one author; an author's first page is served from memory
+    async def read_page(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None, current_user: str | None = None, author: str | None = None) -> tuple[list[domain.Post], str | None]:
+        assert 0 < limit <= MAX_PAGE_SIZE
+        assert author is None or (author and not author.isspace())
+        
+        after = decode_cursor(cursor) if cursor else None
+        # Sticky reads skip the cache both ways, as a page cached from a replica may miss their writes
+        cacheable = after is None and author is not None and self.author_feeds is not None and not self.uow.reads_from_writer(current_user)
+        
+        async def query():
+            epoch = self.author_feeds.epoch if cacheable else None
+            async with self.uow.reading(current_user):
+                domain_posts = await self.uow.posts.read_page(limit + 1, after, author)
+            if cacheable:
+                self.author_feeds.set(author, limit + 1, domain_posts, epoch)
+            return domain_posts
         
-        with self.uow:
-            domain_post = await self.uow.posts.read(id)
-        
-        return dtos.GetPostResponseDto(
-            id=domain_post.id,
-            author=domain_post.author,
-            title=domain_post.title,
-            description=domain_post.description,
-            votes=domain_post.votes,
-            created_at=str(domain_post.created_at),
-            created_by=domain_post.created_by,
-            updated_at=str(domain_post.updated_at),
-            updated_by=domain_post.updated_by
+        domain_posts = self.author_feeds.get(author, limit) if cacheable else None
+        if domain_posts is None:
+            domain_posts = await self.shared_read(("page", limit, after, author), current_user, query)
+        
+        next_cursor = None
+        if len(domain_posts) > limit:
+            domain_posts = domain_posts[:limit]
+            next_cursor = encode_cursor(domain_posts[-1])
+        
+        return [self.with_pending_votes(entry) for entry in domain_posts], next_cursor
+    
+    # Same page as read_page, but only the projected columns are selected; entries are dicts
+    async def read_page_fields(self, limit: int, fields: tuple, cursor: str | None = None, current_user: str | None = None, author: str | None = None) -> tuple[list[dict], str | None]:
+        assert 0 < limit <= MAX_PAGE_SIZE
+        assert fields and set(fields).issubset(serialization.POST_FIELDS)
+        
+        after = decode_cursor(cursor) if cursor else None
+        
+        async def query():
+            async with self.uow.reading(current_user):
+                return await self.uow.posts.read_page_fields(limit + 1, fields, after, author)
+        
+        rows = await self.shared_read(("page_fields", limit, fields, after, author), current_user, query)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1])
+        
+        entries = []
+        for row in rows:
+            entry = row._asdict()
+            entry["votes"] += self.pending_votes(entry["id"])
+            entries.append(entry)
+        return entries, next_cursor
+    
+    # Validator for the page read_page would return, from a query that skips the post bodies
+    async def read_page_version(self, limit: int = DEFAULT_PAGE_SIZE, cursor: str | None = None, fields: tuple | None = None, current_user: str | None = None, author: str | None = None) -> conditional.Version:
+        assert 0 < limit <= MAX_PAGE_SIZE
+        
+        after = decode_cursor(cursor) if cursor else None
+        
+        async def query():
+            async with self.uow.reading(current_user):
+                return await self.uow.posts.read_page_versions(limit + 1, after, author)
+        
+        rows = await self.shared_read(("page_version", limit, after, author), current_user, query)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1])
+        
+        return self.version_of([(row.id, conditional.last_change(row.updated_at, row.voted_at), row.votes + self.pending_votes(row.id)) for row in rows], next_cursor, fields)
+    
+    # Streams every post as NDJSON, one chunk per database batch, so memory stays flat
+    async def export(self, batch_size: int = EXPORT_BATCH_SIZE, current_user: str | None = None):
+        assert batch_size > 0
+        
+        async with self.uow.reading(current_user):
+            async for domain_posts in self.uow.posts.stream_all(batch_size):
+                yield b"".join(serialization.encode_post(self.with_pending_votes(entry)) + b"\n" for entry in domain_posts)
+    
+    async def read_many(self, ids: list[str], current_user: str | None = None) -> dtos.GetPostsByIdsResponseDto:
+        domain_posts, missing_ids = await self.read_many_posts(ids, current_user)
+        
+        return dtos.GetPostsByIdsResponseDto(
+            posts=[to_post_dto(entry) for entry in domain_posts],
+            missing_ids=missing_ids
+        )
+    
+    # Resolves many ids with chunked IN queries; posts come back in request order
+    async def read_many_posts(self, ids: list[str], current_user: str | None = None) -> tuple[list[domain.Post], list[str]]:
+        assert ids and all(id is not None and not id.isspace() for id in ids)
+        
+        requested_ids = list(dict.fromkeys(ids))
+        assert len(requested_ids) <= MAX_READ_MANY_IDS
+        
+        async with self.uow.reading(current_user):
+            domain_posts = await self.uow.posts.read_many(requested_ids)
+        
+        posts_by_id = {post.id: post for post in domain_posts}
+        return (
+            [self.with_pending_votes(posts_by_id[id]) for id in requested_ids if id in posts_by_id],
+            [id for id in requested_ids if id not in posts_by_id]
+        )
+    
+    async def read_top(self, limit: int, current_user: str | None = None) -> dtos.GetPostsResponseDto:
+        return dtos.GetPostsResponseDto(
+            posts=[to_post_dto(entry) for entry in await self.read_top_posts(limit, current_user)]
         )
-        
\ No newline at end of file
+    
+    # Top-K by votes from the in-memory ranking, hydrated with one IN query
+    async def read_top_posts(self, limit: int, current_user: str | None = None) -> list[domain.Post]:
+        assert self.top_posts is not None
+        assert 0 < limit <= self.top_posts.capacity
+        
+        top_ids = self.top_posts.top(limit)
+        if not top_ids:
+            return []
+        
+        async with self.uow.reading(current_user):
+            domain_posts = await self.uow.posts.read_many(top_ids)
+        
+        posts_by_id = {post.id: post for post in domain_posts}
+        return [self.with_pending_votes(posts_by_id[id]) for id in top_ids if id in posts_by_id]
+    
+    async def rebuild_top_posts(self) -> int:
+        assert self.top_posts is not None
+        
+        async with self.uow.reading():
+            rows = await self.uow.posts.read_top_voted(self.top_posts.capacity)
+        
+        self.top_posts.rebuild(rows)
+        return len(rows)
+    
+    # Full-text search over title and description, best matches first
+    async def search_posts(self, query: str, limit: int = DEFAULT_PAGE_SIZE, offset: int = 0, current_user: str | None = None) -> tuple[list[domain.Post], int | None]:
+        assert query is not None and len(query) <= MAX_SEARCH_QUERY_LENGTH
+        assert 0 < limit <= MAX_PAGE_SIZE
+        assert 0 <= offset <= MAX_SEARCH_OFFSET
+        
+        match = infrastructure.to_match_query(query)
+        if match is None:
+            return [], None
+        
+        async with self.uow.reading(current_user):
+            with metrics.timed("search"):
+                domain_posts = await self.uow.posts.search(match, limit + 1, offset)
+        
+        next_offset = None
+        if len(domain_posts) > limit:
+            domain_posts = domain_posts[:limit]
+            if offset + limit <= MAX_SEARCH_OFFSET:
+                next_offset = offset + limit
+        
+        return [self.with_pending_votes(entry) for entry in domain_posts], next_offset
+    
+    # Outbox events after the since sequence, oldest first
+    async def read_changes(self, since: int = 0, limit: int = DEFAULT_PAGE_SIZE, current_user: str | None = None) -> list[domain.PostEvent]:
+        assert since >= 0
+        assert 0 < limit <= MAX_PAGE_SIZE
+        
+        async with self.uow.reading(current_user):
+            events = await self.uow.events.read_after(since, limit)
+            # since = 0 reads from the oldest retained event; any other cursor must still be retained
+            if since > 0 and (not events or events[0].sequence != since + 1):
+                oldest = await self.uow.events.oldest_sequence()
+                if oldest is not None and since + 1 < oldest:
+                    raise ChangesExpiredError(f"Events after {since} are no longer retained")
+        
+        return events
+    
+    # Long poll: returns as soon as there are events after since, or empty once timeout passes
+    async def wait_for_changes(self, since: int = 0, limit: int = DEFAULT_PAGE_SIZE, timeout: float = 0, current_user: str | None = None) -> tuple[list[domain.PostEvent], int]:
+        assert 0 <= timeout <= MAX_CHANGES_WAIT_SECONDS
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            events = await self.read_changes(since, limit, current_user)
+            remaining = deadline - loop.time()
+            if events or remaining <= 0:
+                return events, events[-1].sequence if events else since
+            wait_seconds = min(remaining, CHANGES_POLL_SECONDS)
+            if self.change_feed is not None:
+                await self.change_feed.wait(since, wait_seconds)
+            else:
+                await asyncio.sleep(wait_seconds)
+    
+    # Server-sent events from the since sequence on, with a comment line as heartbeat
+    async def stream_changes(self, since: int = 0, current_user: str | None = None):
+        while True:
+            try:
+                events, since = await self.wait_for_changes(since, MAX_PAGE_SIZE, min(CHANGES_HEARTBEAT_SECONDS, MAX_CHANGES_WAIT_SECONDS), current_user)
+            except ChangesExpiredError:
+                yield serialization.encode_sse_expired(since)
+                return
+            yield serialization.encode_sse_events(events) if events else b": keep-alive\n\n"
+    
+    async def vote(self, id: str, delta: int) -> dtos.VoteResponseDto:
+        assert id is not None and not id.isspace()
+        assert delta in (-1, 1)
+        assert self.vote_buffer is not None
+        
+        self.vote_buffer.add(id, delta)
+        return dtos.VoteResponseDto(id=id)
+    
+    async def read(self, id: str, current_user: str | None = None) -> dtos.GetPostResponseDto | None:
+        domain_post = await self.read_post(id, current_user)
+        
+        if domain_post is None:
+            return None
+        
+        return to_post_dto(domain_post)
+    
+    async def read_post(self, id: str, current_user: str | None = None) -> domain.Post | None:
+        assert id is not None and not id.isspace()
+        
+        async def query():
+            async with self.uow.reading(current_user):
+                return await self.uow.posts.read(id)
+        
+        domain_post = await self.shared_read(("post", id), current_user, query)
+        
+        return self.with_pending_votes(domain_post) if domain_post is not None else None
+    
+    async def read_post_version(self, id: str, current_user: str | None = None) -> conditional.Version | None:
+        assert id is not None and not id.isspace()
+        
+        async def query():
+            async with self.uow.reading(current_user):
+                return await self.uow.posts.read_version(id)
+        
+        row = await self.shared_read(("post_version", id), current_user, query)
+        
+        if row is None:
+            return None
+        
+        return self.version_of([(row.id, conditional.last_change(row.updated_at, row.voted_at), row.votes + self.pending_votes(row.id))])
+    
+    # Validator for posts returned by read_post/read_page, whose votes already include pending ones
+    def version_of_posts(self, posts: list[domain.Post], next_cursor: str | None = None) -> conditional.Version:
+        return self.version_of([(post.id, conditional.last_change(post.updated_at, post.voted_at), post.votes) for post in posts], next_cursor)
+    
+    # Validator for projected entries returned by read_page_fields
+    def version_of_entries(self, entries: list[dict], fields: tuple, next_cursor: str | None = None) -> conditional.Version:
+        return self.version_of([(entry["id"], conditional.last_change(entry["updated_at"], entry["voted_at"]), entry["votes"]) for entry in entries], next_cursor, fields)
+    
+    # Buffered votes are not reflected in voted_at yet, so they rule out Last-Modified
+    def version_of(self, entries: list[tuple], next_cursor: str | None = None, fields: tuple | None = None) -> conditional.Version:
+        exact_last_modified = not any(self.pending_votes(id) for id, _, _ in entries)
+        return conditional.make_version(entries, next_cursor or "", ",".join(fields or ()), exact_last_modified=exact_last_modified)
+    
+    # In-process state that follows committed posts
+    def after_create(self, domain_posts: list[domain.Post], current_user: str) -> None:
+        self.notify_outbox()
+        if self.top_posts is not None:
+            for post in domain_posts:
+                self.top_posts.upsert(post.id, post.votes, post.created_at)
+        if self.author_feeds is not None:
+            self.author_feeds.invalidate(current_user)
+        if self.read_flights is not None:
+            self.read_flights.invalidate()
+    
+    # Concurrent identical reads share one query. Reads that have to see the writer (read-your-writes)
+    # only share with each other, never with a query that went to a replica.
+    async def shared_read(self, key: tuple, current_user: str | None, query):
+        if self.read_flights is None:
+            return await query()
+        return await self.read_flights.do(key + (self.uow.reads_from_writer(current_user),), query)
+    
+    async def record_events(self, events: list[domain.PostEvent]) -> None:
+        if self.uow.events is not None:
+            await self.uow.events.append(events)
+    
+    def notify_outbox(self) -> None:
+        if self.outbox_dispatcher is not None:
+            self.outbox_dispatcher.notify()
+    
+    def pending_votes(self, id: str) -> int:
+        return self.vote_buffer.pending_delta(id) if self.vote_buffer is not None else 0
+    
+    # Reads include votes that are buffered but not yet flushed
+    def with_pending_votes(self, post: domain.Post) -> domain.Post:
+        pending = self.pending_votes(post.id)
+        if pending:
+            return dataclasses.replace(post, votes=post.votes + pending)
+        return post
+
+
+def new_post(dto: dtos.CreatePostRequestDto, current_user: str) -> domain.Post:
+    now = datetime.now(timezone.utc)
+    return domain.Post(
+        id=str(uuid4()),
+        author=current_user,
+        title=dto.title,
+        description=dto.description,
+        votes=0,
+        created_at=now,
+        created_by=current_user,
+        updated_at=now,
+        updated_by=current_user
+    )
+
+def to_post_dto(post: domain.Post) -> dtos.GetPostResponseDto:
+    return dtos.GetPostResponseDto(
+        id=post.id,
+        author=post.author,
+        title=post.title,
+        description=post.description,
+        votes=post.votes,
+        created_at=str(post.created_at),
+        created_by=post.created_by,
+        updated_at=str(post.updated_at),
+        updated_by=post.updated_by
+    )
+
+# Cursors are opaque to clients: the (created_at, id) keyset position of the last post on a page
+def encode_cursor(post: domain.Post) -> str:
+    position = json.dumps([post.created_at.isoformat(), post.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(id)
+    except Exception as error:
+        raise InvalidCursorError(cursor) from error
@@ -0,0 +1,182 @@
+import os
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+
+# What the lifespan does about the schema before serving: apply pending migrations, only fail
+# when some are pending (schema migrated out of band), or nothing at all
+SCHEMA_STARTUP_MODES = ("migrate", "check", "off")
+
+
+# Engine and pool tuning read from the environment. Pool settings apply to each engine
+# separately; the sqlite_* pragmas are run on every new SQLite connection.
+@dataclass(frozen=True)
+class EngineSettings:
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = -1
+    pool_pre_ping: bool = False
+    echo: bool = False
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    # Negative values are KiB, as in PRAGMA cache_size
+    sqlite_cache_size: int = -20000
+    sqlite_mmap_size: int = 268435456
+
+    @classmethod
+    def from_env(cls) -> "EngineSettings":
+        return cls(
+            pool_size=int(os.getenv("SQLALCHEMY_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("SQLALCHEMY_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("SQLALCHEMY_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("SQLALCHEMY_POOL_RECYCLE", "-1")),
+            pool_pre_ping=os.getenv("SQLALCHEMY_POOL_PRE_PING", "false").lower() == "true",
+            echo=os.getenv("SQLALCHEMY_ECHO", "false").lower() == "true",
+            sqlite_journal_mode=os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+            sqlite_synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+            sqlite_busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+            sqlite_cache_size=int(os.getenv("SQLITE_CACHE_SIZE", "-20000")),
+            sqlite_mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", "268435456")),
+        )
+
+
+# Every setting of the service, read from the environment (and .env) once per process by
+# get_settings(). Nothing here touches the database, which is only connected to once the app starts.
+@dataclass(frozen=True)
+class Settings:
+    # Database
+    database_url: str | None = None
+    async_database_url: str | None = None
+    reader_database_urls: tuple[str, ...] = ()
+    use_sync_session: bool = False
+    schema_startup_mode: str = "migrate"
+    read_your_writes_seconds: float = 5
+    engine: EngineSettings = field(default_factory=EngineSettings)
+
+    # Request limits
+    default_page_size: int = 50
+    max_page_size: int = 500
+    max_create_batch_size: int = 500
+    max_read_many_ids: int = 1000
+    export_batch_size: int = 1000
+    read_many_chunk_size: int = 500
+
+    # Search
+    max_search_query_length: int = 200
+    max_search_offset: int = 1000
+    search_title_weight: float = 10.0
+    search_description_weight: float = 1.0
+    search_max_candidates: int = 10000
+
+    # Change feed and outbox
+    max_changes_wait_seconds: float = 30
+    changes_poll_seconds: float = 1
+    changes_heartbeat_seconds: float = 15
+    outbox_batch_size: int = 500
+    outbox_poll_interval_seconds: float = 1
+    outbox_retention_seconds: float = 7 * 24 * 3600
+
+    # Votes and ranking
+    votes_flush_interval_seconds: float = 1
+    votes_max_buffered_deltas: int = 10000
+    top_posts_capacity: int = 1000
+    top_posts_rebuild_interval_seconds: float = 300
+
+    # In-process caches
+    post_cache_enabled: bool = True
+    post_cache_max_entries: int = 10000
+    post_cache_ttl_seconds: float = 30
+    post_cache_negative_ttl_seconds: float = 5
+    author_feed_cache_enabled: bool = True
+    author_feed_cache_max_authors: int = 10000
+    author_feed_cache_ttl_seconds: float = 30
+    read_coalescing_enabled: bool = True
+    idempotency_cache_max_entries: int = 10000
+    idempotency_key_ttl_seconds: float = 24 * 3600
+    idempotency_prune_interval_seconds: float = 3600
+
+    # Authentication
+    auth0_domain: str | None = None
+    algorithm: str | None = None
+    api_audience: str | None = None
+    jwks_ttl_seconds: float = 600
+    jwks_unknown_kid_cooldown_seconds: float = 30
+    token_cache_max_entries: int = 10000
+
+    # Responses and metrics
+    gzip_enabled: bool = True
+    gzip_minimum_size: int = 1000
+    gzip_compress_level: int = 6
+    metrics_profile_header: str = "x-profile"
+    metrics_profiling_enabled: bool = True
+
+    def __post_init__(self) -> None:
+        assert self.schema_startup_mode in SCHEMA_STARTUP_MODES
+
+    # .env values fill in whatever the environment leaves unset
+    @classmethod
+    def from_env(cls) -> "Settings":
+        load_dotenv()
+        return cls(
+            database_url=os.getenv("SQLALCHEMY_DATABASE_URL"),
+            async_database_url=os.getenv("SQLALCHEMY_ASYNC_DATABASE_URL"),
+            # Read replicas as comma-separated URLs; without any, reads stay on the writer
+            reader_database_urls=tuple(url.strip() for url in os.getenv("SQLALCHEMY_READER_DATABASE_URLS", "").split(",") if url.strip()),
+            use_sync_session=os.getenv("SQLALCHEMY_USE_SYNC_SESSION", "false").lower() == "true",
+            schema_startup_mode=os.getenv("SCHEMA_STARTUP_MODE", "migrate").lower(),
+            read_your_writes_seconds=float(os.getenv("READ_YOUR_WRITES_SECONDS", "5")),
+            engine=EngineSettings.from_env(),
+            default_page_size=int(os.getenv("POSTS_DEFAULT_PAGE_SIZE", "50")),
+            max_page_size=int(os.getenv("POSTS_MAX_PAGE_SIZE", "500")),
+            max_create_batch_size=int(os.getenv("POSTS_MAX_CREATE_BATCH_SIZE", "500")),
+            max_read_many_ids=int(os.getenv("POSTS_MAX_READ_MANY_IDS", "1000")),
+            export_batch_size=int(os.getenv("POSTS_EXPORT_BATCH_SIZE", "1000")),
+            read_many_chunk_size=int(os.getenv("POSTS_READ_MANY_CHUNK_SIZE", "500")),
+            max_search_query_length=int(os.getenv("POSTS_MAX_SEARCH_QUERY_LENGTH", "200")),
+            max_search_offset=int(os.getenv("POSTS_MAX_SEARCH_OFFSET", "1000")),
+            search_title_weight=float(os.getenv("POSTS_SEARCH_TITLE_WEIGHT", "10.0")),
+            search_description_weight=float(os.getenv("POSTS_SEARCH_DESCRIPTION_WEIGHT", "1.0")),
+            search_max_candidates=int(os.getenv("POSTS_SEARCH_MAX_CANDIDATES", "10000")),
+            max_changes_wait_seconds=float(os.getenv("POSTS_MAX_CHANGES_WAIT_SECONDS", "30")),
+            changes_poll_seconds=float(os.getenv("POSTS_CHANGES_POLL_SECONDS", "1")),
+            changes_heartbeat_seconds=float(os.getenv("POSTS_CHANGES_HEARTBEAT_SECONDS", "15")),
+            outbox_batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "500")),
+            outbox_poll_interval_seconds=float(os.getenv("OUTBOX_POLL_INTERVAL_SECONDS", "1")),
+            outbox_retention_seconds=float(os.getenv("OUTBOX_RETENTION_SECONDS", str(7 * 24 * 3600))),
+            votes_flush_interval_seconds=float(os.getenv("VOTES_FLUSH_INTERVAL_SECONDS", "1")),
+            votes_max_buffered_deltas=int(os.getenv("VOTES_MAX_BUFFERED_DELTAS", "10000")),
+            top_posts_capacity=int(os.getenv("TOP_POSTS_CAPACITY", "1000")),
+            top_posts_rebuild_interval_seconds=float(os.getenv("TOP_POSTS_REBUILD_INTERVAL_SECONDS", "300")),
+            post_cache_enabled=os.getenv("POST_CACHE_ENABLED", "true").lower() == "true",
+            post_cache_max_entries=int(os.getenv("POST_CACHE_MAX_ENTRIES", "10000")),
+            post_cache_ttl_seconds=float(os.getenv("POST_CACHE_TTL_SECONDS", "30")),
+            post_cache_negative_ttl_seconds=float(os.getenv("POST_CACHE_NEGATIVE_TTL_SECONDS", "5")),
+            author_feed_cache_enabled=os.getenv("AUTHOR_FEED_CACHE_ENABLED", "true").lower() == "true",
+            author_feed_cache_max_authors=int(os.getenv("AUTHOR_FEED_CACHE_MAX_AUTHORS", "10000")),
+            author_feed_cache_ttl_seconds=float(os.getenv("AUTHOR_FEED_CACHE_TTL_SECONDS", "30")),
+            read_coalescing_enabled=os.getenv("READ_COALESCING_ENABLED", "true").lower() == "true",
+            idempotency_cache_max_entries=int(os.getenv("IDEMPOTENCY_CACHE_MAX_ENTRIES", "10000")),
+            idempotency_key_ttl_seconds=float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600))),
+            idempotency_prune_interval_seconds=float(os.getenv("IDEMPOTENCY_PRUNE_INTERVAL_SECONDS", "3600")),
+            auth0_domain=os.getenv("AUTH0_DOMAIN"),
+            algorithm=os.getenv("ALGORITHM"),
+            api_audience=os.getenv("API_AUDIENCE"),
+            jwks_ttl_seconds=float(os.getenv("JWKS_TTL_SECONDS", "600")),
+            jwks_unknown_kid_cooldown_seconds=float(os.getenv("JWKS_UNKNOWN_KID_COOLDOWN_SECONDS", "30")),
+            token_cache_max_entries=int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000")),
+            gzip_enabled=os.getenv("GZIP_ENABLED", "true").lower() == "true",
+            gzip_minimum_size=int(os.getenv("GZIP_MINIMUM_SIZE", "1000")),
+            gzip_compress_level=int(os.getenv("GZIP_COMPRESS_LEVEL", "6")),
+            metrics_profile_header=os.getenv("METRICS_PROFILE_HEADER", "x-profile").lower(),
+            metrics_profiling_enabled=os.getenv("METRICS_PROFILING_ENABLED", "true").lower() == "true",
+        )
+
+
+current_settings: Settings | None = None
+
+def get_settings() -> Settings:
+    global current_settings
+    if current_settings is None:
+        current_settings = Settings.from_env()
+    return current_settings
@@ -0,0 +1,58 @@
+import asyncio
+from typing import Awaitable, Callable
+
+
+class Flight:
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+# Concurrent calls with the same key share one run of the operation and all get its result (or
+# its exception). Nothing is kept once the run finishes, so a call never sees a result older than
+# a run that was already in flight when it arrived. The run is a task of its own: a caller that
+# is cancelled leaves it to the others, and it is only cancelled once every caller is gone.
+class SingleFlight:
+    def __init__(self) -> None:
+        self.flights: dict = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key, operation: Callable[[], Awaitable]):
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self.flights[key] = Flight(asyncio.ensure_future(operation()))
+            flight.task.add_done_callback(lambda task: self.land(key, flight))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self.abandoned += 1
+                self.land(key, flight)
+
+    # Calls from now on start a new run, e.g. after a write that in-flight runs may have missed;
+    # callers already waiting still get the result of theirs
+    def invalidate(self) -> None:
+        self.flights.clear()
+
+    def land(self, key, flight: Flight) -> None:
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+
+    def stats(self) -> dict:
+        calls = self.executed + self.coalesced
+        return {
+            "in_flight": len(self.flights),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "coalesced_ratio": self.coalesced / calls if calls else 0.0,
+        }
@@ -0,0 +1,134 @@
+import unittest
+import unittest.async_case
+import cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class LruCacheTests(unittest.TestCase):
+    def test_get_expires_entries_after_ttl(self):
+        #arrange
+        clock = FakeClock()
+        lru_cache = cache.LruCache(10, ttl_seconds=5, clock=clock)
+        lru_cache.set("key", "value")
+
+        #act
+        before_expiry = lru_cache.get("key")
+        clock.now += 5
+        after_expiry = lru_cache.get("key")
+
+        #assert
+        self.assertEqual(before_expiry, "value")
+        self.assertIsNone(after_expiry)
+
+    def test_set_evicts_least_recently_used_entry(self):
+        #arrange
+        lru_cache = cache.LruCache(2)
+        lru_cache.set("a", 1)
+        lru_cache.set("b", 2)
+        lru_cache.get("a")
+
+        #act
+        lru_cache.set("c", 3)
+
+        #assert
+        self.assertIsNone(lru_cache.get("b"))
+        self.assertEqual(lru_cache.get("a"), 1)
+        self.assertEqual(lru_cache.stats()["evictions"], 1)
+
+
+class PostCacheTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def test_get_reports_hits_misses_and_negative_hits(self):
+        #arrange
+        post_cache = cache.PostCache(max_entries=10)
+        await post_cache.set("id", "post")
+        await post_cache.set_missing("missing")
+
+        #act
+        hit = await post_cache.get("id")
+        negative_hit = await post_cache.get("missing")
+        miss = await post_cache.get("other")
+
+        #assert
+        self.assertEqual(hit, "post")
+        self.assertEqual(negative_hit, cache.MISSING)
+        self.assertIsNone(miss)
+        self.assertEqual(post_cache.stats()["hit_ratio"], 2 / 3)
+
+    async def test_negative_entries_expire_before_positive_entries(self):
+        #arrange
+        clock = FakeClock()
+        post_cache = cache.PostCache(max_entries=10, ttl_seconds=30, negative_ttl_seconds=5, clock=clock)
+        await post_cache.set("id", "post")
+        await post_cache.set_missing("missing")
+
+        #act
+        clock.now += 5
+
+        #assert
+        self.assertEqual(await post_cache.get("id"), "post")
+        self.assertIsNone(await post_cache.get("missing"))
+
+    async def test_get_falls_back_to_shared_backend(self):
+        #arrange
+        backend = cache.InMemoryCacheBackend()
+        writer = cache.PostCache(max_entries=10, backend=backend)
+        reader = cache.PostCache(max_entries=10, backend=backend)
+        await writer.set("id", "post")
+
+        #act
+        result = await reader.get("id")
+
+        #assert
+        self.assertEqual(result, "post")
+        self.assertEqual(reader.stats()["backend_hits"], 1)
+
+    async def test_invalidate_removes_entry_from_all_tiers(self):
+        #arrange
+        backend = cache.InMemoryCacheBackend()
+        post_cache = cache.PostCache(max_entries=10, backend=backend)
+        await post_cache.set("id", "post")
+
+        #act
+        await post_cache.invalidate("id")
+
+        #assert
+        self.assertIsNone(await post_cache.get("id"))
+        self.assertIsNone(await backend.get("post:id"))
+
+
+class AuthorFeedCacheTests(unittest.TestCase):
+    def test_get_answers_smaller_limits_and_short_pages(self):
+        #arrange
+        author_feeds = cache.AuthorFeedCache()
+        author_feeds.set("busy", 11, list(range(11)), author_feeds.epoch)
+        author_feeds.set("quiet", 11, [1, 2], author_feeds.epoch)
+
+        #act
+        smaller = author_feeds.get("busy", 5)
+        larger = author_feeds.get("busy", 20)
+        short = author_feeds.get("quiet", 50)
+
+        #assert
+        self.assertEqual(smaller, [0, 1, 2, 3, 4, 5])
+        self.assertIsNone(larger)
+        self.assertEqual(short, [1, 2])
+
+    def test_set_drops_pages_read_before_an_invalidation(self):
+        #arrange
+        author_feeds = cache.AuthorFeedCache()
+        epoch = author_feeds.epoch
+        author_feeds.invalidate("user")
+
+        #act
+        author_feeds.set("user", 11, [1], epoch)
+
+        #assert
+        self.assertIsNone(author_feeds.get("user", 10))
+        self.assertEqual(author_feeds.stats()["stale_stores"], 1)
@@ -0,0 +1,79 @@
+import datetime
+import unittest
+import conditional
+
+
+def make_version(votes: int = 1) -> conditional.Version:
+    return conditional.make_version([("id", datetime.datetime(year=2024,month=1,day=1,microsecond=500), votes)])
+
+
+class ConditionalTests(unittest.TestCase):
+    def test_make_version_is_weak_and_stable(self):
+        #act
+        first = make_version()
+        second = make_version()
+
+        #assert
+        self.assertTrue(first.etag.startswith('W/"'))
+        self.assertEqual(first, second)
+
+    def test_make_version_changes_with_votes_and_extra_parts(self):
+        #arrange
+        entries = [("id", datetime.datetime(year=2024,month=1,day=1), 1)]
+
+        #act
+        result = {
+            conditional.make_version(entries).etag,
+            conditional.make_version([("id", datetime.datetime(year=2024,month=1,day=1), 2)]).etag,
+            conditional.make_version(entries, "cursor").etag,
+        }
+
+        #assert
+        self.assertEqual(len(result), 3)
+
+    def test_headers_format_last_modified_as_http_date(self):
+        #act
+        result = make_version().headers()
+
+        #assert
+        self.assertEqual(result["Last-Modified"], "Mon, 01 Jan 2024 00:00:00 GMT")
+
+    def test_headers_omit_last_modified_when_not_exact(self):
+        #arrange
+        version = conditional.make_version([("id", datetime.datetime(year=2024,month=1,day=1), 1)], exact_last_modified=False)
+
+        #act
+        result = version.headers()
+
+        #assert
+        self.assertEqual(list(result), ["ETag"])
+
+    def test_is_not_modified_matches_weak_and_listed_etags(self):
+        #arrange
+        version = make_version()
+        opaque = version.etag.removeprefix("W/")
+
+        #assert
+        self.assertTrue(conditional.is_not_modified(version, if_none_match=version.etag))
+        self.assertTrue(conditional.is_not_modified(version, if_none_match=f'"other", {opaque}'))
+        self.assertTrue(conditional.is_not_modified(version, if_none_match="*"))
+        self.assertFalse(conditional.is_not_modified(version, if_none_match=make_version(votes=2).etag))
+
+    def test_is_not_modified_compares_if_modified_since(self):
+        #arrange
+        version = make_version()
+
+        #assert
+        self.assertTrue(conditional.is_not_modified(version, if_modified_since="Mon, 01 Jan 2024 00:00:00 GMT"))
+        self.assertFalse(conditional.is_not_modified(version, if_modified_since="Sun, 31 Dec 2023 23:59:59 GMT"))
+        self.assertFalse(conditional.is_not_modified(version, if_modified_since="not a date"))
+
+    def test_is_not_modified_prefers_if_none_match(self):
+        #arrange
+        version = make_version()
+
+        #act
+        result = conditional.is_not_modified(version, if_none_match='"other"', if_modified_since="Mon, 01 Jan 2024 00:00:00 GMT")
+
+        #assert
+        self.assertFalse(result)
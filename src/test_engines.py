@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+import unittest.async_case
+from sqlalchemy import text
+import engines
+
+
+class EngineOptionsTests(unittest.TestCase):
+    def test_memory_sqlite_skips_pool_sizing(self):
+        #act
+        result = engines.engine_options("sqlite://", engines.EngineSettings())
+
+        #assert
+        self.assertNotIn("pool_size", result)
+        self.assertEqual(result["connect_args"], {"check_same_thread": False})
+
+    def test_file_sqlite_uses_pool_settings(self):
+        #arrange
+        settings = engines.EngineSettings(pool_size=3, max_overflow=7, pool_pre_ping=True)
+
+        #act
+        result = engines.engine_options("sqlite:///posts.db", settings)
+
+        #assert
+        self.assertEqual((result["pool_size"], result["max_overflow"], result["pool_pre_ping"]), (3, 7, True))
+
+    def test_other_databases_get_no_sqlite_connect_args(self):
+        #act
+        result = engines.engine_options("postgresql://user@host/posts", engines.EngineSettings())
+
+        #assert
+        self.assertNotIn("connect_args", result)
+
+
+class ConfiguredEngineTests(unittest.async_case.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.directory.name, 'posts.db')}"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_sqlite_connections_get_pragmas_and_pool_stats(self):
+        #arrange
+        engine = engines.create_configured_engine(self.url, engines.EngineSettings(pool_size=2, sqlite_busy_timeout_ms=1234), name="test-sync")
+        checkouts = engines.pool_events_total.value("test-sync", "checkout")
+
+        #act
+        with engine.connect() as connection:
+            journal_mode = connection.execute(text("PRAGMA journal_mode")).scalar()
+            busy_timeout = connection.execute(text("PRAGMA busy_timeout")).scalar()
+            synchronous = connection.execute(text("PRAGMA synchronous")).scalar()
+            stats = engines.pool_stats(engine)
+        engine.dispose()
+
+        #assert
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(busy_timeout, 1234)
+        self.assertEqual(synchronous, 1)
+        self.assertEqual((stats["size"], stats["checkedout"], stats["overflow"]), (2, 1, 0))
+        self.assertEqual(engines.pool_events_total.value("test-sync", "checkout"), checkouts + 1)
+
+    async def test_async_sqlite_connections_get_pragmas(self):
+        #arrange
+        engine = engines.create_configured_async_engine(engines.to_async_database_url(self.url), engines.EngineSettings(sqlite_cache_size=-4096))
+
+        #act
+        async with engine.connect() as connection:
+            journal_mode = (await connection.execute(text("PRAGMA journal_mode"))).scalar()
+            cache_size = (await connection.execute(text("PRAGMA cache_size"))).scalar()
+        await engine.dispose()
+
+        #assert
+        self.assertEqual(journal_mode, "wal")
+        self.assertEqual(cache_size, -4096)
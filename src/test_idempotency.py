@@ -0,0 +1,149 @@
+import asyncio
+import unittest
+import unittest.async_case
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+import dtos
+import idempotency
+import infrastructure
+import service
+import unit_of_work
+
+
+class IdempotencyStoreTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def test_run_replays_stored_response_for_same_request(self):
+        #arrange
+        store = idempotency.IdempotencyStore()
+        calls = []
+        async def operation():
+            calls.append(1)
+            return idempotency.StoredResponse("request", {"id": "first"})
+
+        #act
+        first = await store.run(("user", "key"), "request", operation)
+        second = await store.run(("user", "key"), "request", operation)
+
+        #assert
+        self.assertEqual(first, second)
+        self.assertEqual((len(calls), store.replays), (1, 1))
+
+    async def test_run_throws_when_key_is_reused_for_another_request(self):
+        #arrange
+        store = idempotency.IdempotencyStore()
+        async def operation():
+            return idempotency.StoredResponse("request", {"id": "first"})
+        await store.run(("user", "key"), "request", operation)
+
+        #act
+        with self.assertRaises(idempotency.IdempotencyKeyReusedError):
+            #assert
+            await store.run(("user", "key"), "other request", operation)
+
+    async def test_concurrent_runs_share_one_operation(self):
+        #arrange
+        store = idempotency.IdempotencyStore()
+        release = asyncio.Event()
+        calls = []
+        async def operation():
+            calls.append(1)
+            await release.wait()
+            return idempotency.StoredResponse("request", {"id": "first"})
+
+        #act
+        runs = [asyncio.create_task(store.run(("user", "key"), "request", operation)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*runs)
+
+        #assert
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(store.coalesced, 4)
+        self.assertTrue(all(result == results[0] for result in results))
+        self.assertEqual(store.in_flight, {})
+
+    async def test_follower_takes_over_when_leader_is_cancelled(self):
+        #arrange
+        store = idempotency.IdempotencyStore()
+        started = asyncio.Event()
+        async def slow_operation():
+            started.set()
+            await asyncio.sleep(60)
+        async def operation():
+            return idempotency.StoredResponse("request", {"id": "follower"})
+        leader = asyncio.create_task(store.run(("user", "key"), "request", slow_operation))
+        await started.wait()
+        follower = asyncio.create_task(store.run(("user", "key"), "request", operation))
+        await asyncio.sleep(0)
+
+        #act
+        leader.cancel()
+        result = await follower
+
+        #assert
+        self.assertEqual(result.response, {"id": "follower"})
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+
+
+class IdempotentCreateTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with self.engine.begin() as connection:
+            await connection.run_sync(infrastructure.Base.metadata.create_all)
+        self.session_factory = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    def make_service(self, store: idempotency.IdempotencyStore) -> service.PostsService:
+        return service.PostsService(unit_of_work.SqlAlchemyAsyncUnitOfWork(self.session_factory), idempotency_store=store)
+
+    async def count_posts(self) -> int:
+        async with self.session_factory() as session:
+            return await session.scalar(select(func.count()).select_from(infrastructure.PersistedPost))
+
+    async def test_create_with_same_key_inserts_once_across_workers(self):
+        #arrange
+        request = dtos.CreatePostRequestDto(title="title", description="desc")
+        first_worker = idempotency.IdempotencyStore()
+        second_worker = idempotency.IdempotencyStore()
+
+        #act
+        first = await self.make_service(first_worker).create(request, "user", "key")
+        retried = await self.make_service(second_worker).create(request, "user", "key")
+        other_user = await self.make_service(second_worker).create(request, "other", "key")
+
+        #assert
+        self.assertEqual(first, retried)
+        self.assertNotEqual(first, other_user)
+        self.assertEqual(await self.count_posts(), 2)
+
+    async def test_concurrent_creates_with_same_key_insert_once(self):
+        #arrange
+        request = dtos.CreatePostRequestDto(title="title", description="desc")
+        store = idempotency.IdempotencyStore()
+
+        #act
+        results = await asyncio.gather(*(self.make_service(store).create(request, "user", "key") for _ in range(5)))
+
+        #assert
+        self.assertEqual(len(set(result.id for result in results)), 1)
+        self.assertEqual(await self.count_posts(), 1)
+
+    async def test_add_reports_key_committed_by_another_transaction(self):
+        #arrange
+        stored = idempotency.StoredResponse("request", {"id": "first"})
+        not_before = infrastructure.datetime(2000, 1, 1)
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(self.session_factory) as uow:
+            await uow.idempotency_keys.add("user", "key", stored, not_before)
+            await uow.commit()
+
+        #act
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(self.session_factory) as uow:
+            added = await uow.idempotency_keys.add("user", "key", idempotency.StoredResponse("request", {"id": "second"}), not_before)
+            existing = await uow.idempotency_keys.read("user", "key", not_before)
+
+        #assert
+        self.assertFalse(added)
+        self.assertEqual(existing, stored)
@@ -1,10 +1,17 @@
 import datetime
 import unittest.mock
+from sqlalchemy import delete, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
 import unittest
 import infrastructure
 import unittest.async_case
 import domain
+import cache
+import migrations
+import settings
+import unit_of_work
 
 
 class PostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
@@ -14,7 +21,7 @@ class PostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
         session_instance = session()
         session_instance.add = unittest.mock.MagicMock()
         session_instance.commit = unittest.mock.MagicMock()
-        posts_repository = infrastructure.PostsRepository(db=session_instance)
+        posts_repository = infrastructure.PostsRepository(session_instance)
         
         #act
         with self.assertRaises(AssertionError):
@@ -27,7 +34,7 @@ class PostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
         session_instance = session()
         session_instance.add = unittest.mock.MagicMock()
         session_instance.commit = unittest.mock.MagicMock()
-        posts_repository = infrastructure.PostsRepository(db=session_instance)
+        posts_repository = infrastructure.PostsRepository(session_instance)
         
         #act
         await posts_repository.create(domain.Post(
@@ -44,28 +51,18 @@ class PostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
         
         #assert
         session_instance.add.assert_called_once() 
-        session_instance.add.call_args[0][0].id == "id"
-        session_instance.commit.assert_called_once()
+        self.assertEqual(session_instance.add.call_args[0][0].id, "id")
+        session_instance.commit.assert_not_called()
     
     async def test_read_all_successful(self):
         #arrange
         session = sessionmaker()
         session_instance = session()
-        session_instance.query = unittest.mock.MagicMock()
-        session_instance.query.return_value = [
-            infrastructure.PersistedPost(
-                id="id",
-                author="user",
-                title="title",
-                description="desc",
-                votes=1,
-                created_at=datetime.datetime(year=2024,month=1,day=1),
-                updated_at=datetime.datetime(year=2024,month=1,day=1),
-                updated_by="user",
-                created_by="user"
-            )
-        ]
-        posts_repository = infrastructure.PostsRepository(db=session_instance)
+        session_instance.connection = unittest.mock.MagicMock()
+        session_instance.execute = unittest.mock.MagicMock(return_value=[
+            ("id", "user", "title", "desc", 1, datetime.datetime(year=2024,month=1,day=1), "user", datetime.datetime(year=2024,month=1,day=1), "user")
+        ])
+        posts_repository = infrastructure.PostsRepository(session_instance)
         
         #act
         result: list[domain.Post] = await posts_repository.read_all()
@@ -84,13 +81,13 @@ class PostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
                 created_by="user"
             )
         ])
-        session_instance.query.assert_called_once()
+        session_instance.execute.assert_called_once()
     
     async def test_read_throws_when_id_is_none(self):
         #arrange
         session = sessionmaker()
         session_instance = session()
-        posts_repository = infrastructure.PostsRepository(db=session_instance)
+        posts_repository = infrastructure.PostsRepository(session_instance)
         
         #act
         with self.assertRaises(AssertionError):
@@ -101,7 +98,7 @@ class PostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
         #arrange
         session = sessionmaker()
         session_instance = session()
-        posts_repository = infrastructure.PostsRepository(db=session_instance)
+        posts_repository = infrastructure.PostsRepository(session_instance)
         
         #act
         with self.assertRaises(AssertionError):
@@ -112,8 +109,75 @@ class PostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
         #arrange
         session = sessionmaker()
         session_instance = session()
-        session_instance.query = unittest.mock.MagicMock()
-        session_instance.query.return_value.filter.return_value.first.return_value = infrastructure.PersistedPost(
+        session_instance.connection = unittest.mock.MagicMock()
+        session_instance.execute = unittest.mock.MagicMock()
+        session_instance.execute.return_value.first.return_value = ("id", "user", "title", "desc", 1, datetime.datetime(year=2024,month=1,day=1), "user", datetime.datetime(year=2024,month=1,day=1), "user")
+        
+        posts_repository = infrastructure.PostsRepository(session_instance)
+        
+        #act
+        result: domain.Post = await posts_repository.read(id="id")
+        
+        #assert
+        self.assertEqual(result, domain.Post(
+            id="id",
+            author="user",
+            title="title",
+            description="desc",
+            votes=1,
+            created_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_by="user",
+            created_by="user"
+        ))
+        session_instance.execute.assert_called_once()
+
+class AsyncPostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def test_create_throws_when_model_is_none(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(unittest.mock.MagicMock())
+        
+        #act
+        with self.assertRaises(AssertionError):
+            #assert
+            await posts_repository.create(None)
+    
+    async def test_read_all_successful(self):
+        #arrange
+        session_instance = unittest.mock.MagicMock()
+        session_instance.execute = unittest.mock.AsyncMock(return_value=[
+            ("id", "user", "title", "desc", 1, datetime.datetime(year=2024,month=1,day=1), "user", datetime.datetime(year=2024,month=1,day=1), "user")
+        ])
+        posts_repository = infrastructure.AsyncPostsRepository(session_instance)
+        
+        #act
+        result: list[domain.Post] = await posts_repository.read_all()
+        
+        #assert
+        self.assertEqual([post.id for post in result], ["id"])
+        session_instance.execute.assert_awaited_once()
+    
+    async def test_read_returns_none_when_post_is_missing(self):
+        #arrange
+        session_instance = unittest.mock.MagicMock()
+        result = unittest.mock.MagicMock()
+        result.first.return_value = None
+        session_instance.execute = unittest.mock.AsyncMock(return_value=result)
+        posts_repository = infrastructure.AsyncPostsRepository(session_instance)
+        
+        #act
+        result = await posts_repository.read("missing")
+        
+        #assert
+        self.assertIsNone(result)
+    
+    async def test_create_and_read_round_trip_through_unit_of_work(self):
+        #arrange
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(infrastructure.Base.metadata.create_all)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        post = domain.Post(
             id="id",
             author="user",
             title="title",
@@ -125,13 +189,305 @@ class PostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
             created_by="user"
         )
         
-        posts_repository = infrastructure.PostsRepository(db=session_instance)
+        #act
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            await uow.posts.create(post)
+            await uow.commit()
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            result = await uow.posts.read("id")
+        await engine.dispose()
+        
+        #assert
+        self.assertEqual(result, post)
+
+    
+    async def test_read_page_walks_keyset_pages_newest_first(self):
+        #arrange
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(infrastructure.Base.metadata.create_all)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            for id in ["a", "b", "c", "d"]:
+                await uow.posts.create(domain.Post(
+                    id=id,
+                    author="user",
+                    title="title",
+                    description="desc",
+                    votes=1,
+                    created_at=datetime.datetime(year=2024,month=1,day=2 if id == "d" else 1),
+                    updated_at=datetime.datetime(year=2024,month=1,day=1),
+                    updated_by="user",
+                    created_by="user"
+                ))
+            await uow.commit()
         
         #act
-        result: domain.Post = await posts_repository.read(id="id")
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            first_page = await uow.posts.read_page(2)
+            second_page = await uow.posts.read_page(2, (first_page[-1].created_at, first_page[-1].id))
+        await engine.dispose()
         
         #assert
-        self.assertEqual(result, domain.Post(
+        self.assertEqual([post.id for post in first_page], ["d", "c"])
+        self.assertEqual([post.id for post in second_page], ["b", "a"])
+
+    
+    async def test_stream_all_yields_posts_in_batches(self):
+        #arrange
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(infrastructure.Base.metadata.create_all)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            for day in range(1, 6):
+                await uow.posts.create(domain.Post(
+                    id=f"id-{day}",
+                    author="user",
+                    title="title",
+                    description="desc",
+                    votes=1,
+                    created_at=datetime.datetime(year=2024,month=1,day=day),
+                    updated_at=datetime.datetime(year=2024,month=1,day=day),
+                    updated_by="user",
+                    created_by="user"
+                ))
+            await uow.commit()
+        
+        #act
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            batches = [[post.id for post in batch] async for batch in uow.posts.stream_all(2)]
+        await engine.dispose()
+        
+        #assert
+        self.assertEqual(batches, [["id-5", "id-4"], ["id-3", "id-2"], ["id-1"]])
+
+    
+    async def test_create_many_inserts_all_rows(self):
+        #arrange
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(infrastructure.Base.metadata.create_all)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        posts = [
+            domain.Post(
+                id=f"id-{day}",
+                author="user",
+                title="title",
+                description="desc",
+                votes=0,
+                created_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_by="user",
+                created_by="user"
+            )
+            for day in range(1, 4)
+        ]
+        
+        #act
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            await uow.posts.create_many(posts)
+            await uow.commit()
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            result = await uow.posts.read_page(10)
+        await engine.dispose()
+        
+        #assert
+        self.assertEqual(result, list(reversed(posts)))
+
+    
+    async def test_read_all_hydrates_rows_without_identity_map(self):
+        #arrange
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(infrastructure.Base.metadata.create_all)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            await uow.posts.create_many([
+                domain.Post(
+                    id=f"id-{day}",
+                    author="user",
+                    title="title",
+                    description="desc",
+                    votes=0,
+                    created_at=datetime.datetime(year=2024,month=1,day=day),
+                    updated_at=datetime.datetime(year=2024,month=1,day=day),
+                    updated_by="user",
+                    created_by="user"
+                )
+                for day in range(1, 4)
+            ])
+            await uow.commit()
+        
+        #act
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            result = await uow.posts.read_all()
+            identity_map_size = len(uow.session.identity_map)
+        await engine.dispose()
+        
+        #assert
+        self.assertEqual(sorted(post.id for post in result), ["id-1", "id-2", "id-3"])
+        self.assertEqual(identity_map_size, 0)
+        with self.assertRaises(AttributeError):
+            result[0].votes = 1
+
+    
+    async def test_search_is_unavailable_without_sqlite(self):
+        #arrange
+        session_instance = unittest.mock.MagicMock()
+        session_instance.get_bind.return_value.dialect.name = "postgresql"
+        session_instance.execute = unittest.mock.AsyncMock()
+        posts_repository = infrastructure.AsyncPostsRepository(session_instance)
+
+        #act
+        with self.assertRaises(infrastructure.SearchUnavailableError):
+            await posts_repository.search('"database"', 10)
+
+        #assert
+        session_instance.execute.assert_not_awaited()
+
+    async def test_search_ranks_title_matches_first_and_follows_writes(self):
+        #arrange
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(migrations.apply_migrations)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            await uow.posts.create_many([
+                domain.Post(
+                    id=id,
+                    author="user",
+                    title=title,
+                    description=description,
+                    votes=0,
+                    created_at=datetime.datetime(year=2024,month=1,day=1),
+                    updated_at=datetime.datetime(year=2024,month=1,day=1),
+                    updated_by="user",
+                    created_by="user"
+                )
+                for id, title, description in [("body", "Notes", "a database is fast"), ("title", "Databases", "notes"), ("other", "Cars", "fast cars")]
+            ])
+            await uow.commit()
+        
+        #act
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            ranked = await uow.posts.search(infrastructure.to_match_query("database"), 10)
+            second_page = await uow.posts.search(infrastructure.to_match_query("database"), 10, 1)
+            await uow.posts.apply_vote_deltas({"title": 1})
+            await uow.session.execute(delete(infrastructure.PersistedPost).where(infrastructure.PersistedPost.id == "body"))
+            await uow.commit()
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            after_writes = await uow.posts.search(infrastructure.to_match_query("database"), 10)
+        await engine.dispose()
+        
+        #assert
+        self.assertEqual([post.id for post in ranked], ["title", "body"])
+        self.assertEqual([post.id for post in second_page], ["body"])
+        self.assertEqual([(post.id, post.votes) for post in after_writes], [("title", 1)])
+    
+    async def test_search_finds_the_right_posts_after_posts_rowids_change(self):
+        #arrange
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(migrations.apply_migrations)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            await uow.posts.create_many([
+                domain.Post(
+                    id=id,
+                    author="user",
+                    title=title,
+                    description="desc",
+                    votes=0,
+                    created_at=datetime.datetime(year=2024,month=1,day=1),
+                    updated_at=datetime.datetime(year=2024,month=1,day=1),
+                    updated_by="user",
+                    created_by="user"
+                )
+                for id, title in [("a", "Bananas"), ("b", "Cherries")]
+            ])
+            await uow.commit()
+
+        #act
+        # Stands in for a VACUUM, which may renumber the implicit rowids of a table with a TEXT primary key
+        async with engine.begin() as connection:
+            await connection.exec_driver_sql('UPDATE "Posts" SET rowid = -rowid')
+            await connection.exec_driver_sql('UPDATE "Posts" SET rowid = 3 + rowid')
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            bananas = await uow.posts.search(infrastructure.to_match_query("bananas"), 10)
+            cherries = await uow.posts.search(infrastructure.to_match_query("cherries"), 10)
+        await engine.dispose()
+
+        #assert
+        self.assertEqual([post.id for post in bananas], ["a"])
+        self.assertEqual([post.id for post in cherries], ["b"])
+
+    async def test_read_page_fields_selects_only_projected_columns(self):
+        #arrange
+        session_instance = unittest.mock.MagicMock()
+        session_instance.execute = unittest.mock.AsyncMock(return_value=unittest.mock.MagicMock())
+        posts_repository = infrastructure.AsyncPostsRepository(session_instance)
+        
+        #act
+        await posts_repository.read_page_fields(10, ("id", "title"))
+        
+        #assert
+        statement = session_instance.execute.await_args.args[0]
+        self.assertEqual([column.key for column in statement.selected_columns], ["id", "title", "votes", "created_at", "updated_at", "voted_at"])
+    
+    async def test_read_many_queries_ids_in_chunks(self):
+        #arrange
+        session_instance = unittest.mock.MagicMock()
+        session_instance.execute = unittest.mock.AsyncMock(return_value=[])
+        posts_repository = infrastructure.AsyncPostsRepository(session_instance)
+        
+        #act
+        with unittest.mock.patch.object(infrastructure, "READ_MANY_CHUNK_SIZE", 2):
+            await posts_repository.read_many(["a", "b", "c", "d", "e"])
+        
+        #assert
+        self.assertEqual(session_instance.execute.await_count, 3)
+
+    
+    async def test_apply_vote_deltas_increments_votes_atomically(self):
+        #arrange
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(infrastructure.Base.metadata.create_all)
+        session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            await uow.posts.create(domain.Post(
+                id="id",
+                author="user",
+                title="title",
+                description="desc",
+                votes=1,
+                created_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_by="user",
+                created_by="user"
+            ))
+            await uow.commit()
+        
+        #act
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            rows = await uow.posts.apply_vote_deltas({"id": 5, "missing": 1})
+            await uow.commit()
+        async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+            result = await uow.posts.read("id")
+        await engine.dispose()
+        
+        #assert
+        self.assertEqual([(row.id, row.votes) for row in rows], [("id", 6)])
+        self.assertEqual(result.votes, 6)
+        self.assertGreater(result.voted_at, datetime.datetime(year=2024,month=1,day=1))
+        # A vote is not an edit: updated_at and updated_by keep naming the last editor
+        self.assertEqual((result.updated_at, result.updated_by), (datetime.datetime(year=2024,month=1,day=1), "user"))
+
+
+class CachedPostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
+    def make_post(self):
+        return domain.Post(
             id="id",
             author="user",
             title="title",
@@ -141,5 +497,109 @@ class PostsRepositoryTests(unittest.async_case.IsolatedAsyncioTestCase):
             updated_at=datetime.datetime(year=2024,month=1,day=1),
             updated_by="user",
             created_by="user"
-        ))
-        session_instance.query.assert_called_once()
\ No newline at end of file
+        )
+    
+    async def test_read_serves_repeated_reads_from_cache(self):
+        #arrange
+        inner = infrastructure.AsyncPostsRepository(None)
+        inner.read = unittest.mock.AsyncMock(return_value=self.make_post())
+        posts_repository = infrastructure.CachedPostsRepository(inner, cache.PostCache(max_entries=10))
+        
+        #act
+        first = await posts_repository.read("id")
+        second = await posts_repository.read("id")
+        
+        #assert
+        self.assertEqual(first, second)
+        inner.read.assert_awaited_once_with("id")
+    
+    async def test_read_caches_missing_posts(self):
+        #arrange
+        inner = infrastructure.AsyncPostsRepository(None)
+        inner.read = unittest.mock.AsyncMock(return_value=None)
+        posts_repository = infrastructure.CachedPostsRepository(inner, cache.PostCache(max_entries=10))
+        
+        #act
+        first = await posts_repository.read("missing")
+        second = await posts_repository.read("missing")
+        
+        #assert
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        inner.read.assert_awaited_once_with("missing")
+    
+    async def test_read_version_uses_cached_post(self):
+        #arrange
+        inner = infrastructure.AsyncPostsRepository(None)
+        inner.read = unittest.mock.AsyncMock(return_value=self.make_post())
+        inner.read_version = unittest.mock.AsyncMock()
+        posts_repository = infrastructure.CachedPostsRepository(inner, cache.PostCache(max_entries=10))
+        await posts_repository.read("id")
+        
+        #act
+        result = await posts_repository.read_version("id")
+        
+        #assert
+        self.assertEqual((result.id, result.updated_at, result.votes), ("id", datetime.datetime(year=2024,month=1,day=1), 1))
+        inner.read_version.assert_not_awaited()
+    
+    async def test_create_invalidates_cached_id(self):
+        #arrange
+        inner = infrastructure.AsyncPostsRepository(None)
+        inner.create = unittest.mock.AsyncMock()
+        inner.read = unittest.mock.AsyncMock(return_value=None)
+        posts_repository = infrastructure.CachedPostsRepository(inner, cache.PostCache(max_entries=10))
+        await posts_repository.read("id")
+        inner.read.return_value = self.make_post()
+        
+        #act
+        await posts_repository.create(self.make_post())
+        result = await posts_repository.read("id")
+        
+        #assert
+        self.assertEqual(result, self.make_post())
+        self.assertEqual(posts_repository.pending_invalidations, {"id"})
+    
+    async def test_read_many_only_queries_uncached_ids(self):
+        #arrange
+        inner = infrastructure.AsyncPostsRepository(None)
+        inner.read_many = unittest.mock.AsyncMock(return_value=[])
+        post_cache = cache.PostCache(max_entries=10)
+        await post_cache.set("id", self.make_post())
+        await post_cache.set_missing("gone")
+        posts_repository = infrastructure.CachedPostsRepository(inner, post_cache)
+        
+        #act
+        result = await posts_repository.read_many(["id", "gone", "other"])
+        
+        #assert
+        self.assertEqual(result, [self.make_post()])
+        inner.read_many.assert_awaited_once_with(["other"])
+        self.assertEqual(await post_cache.get("other"), cache.MISSING)
+
+
+class DatabaseTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def test_engines_are_created_on_first_use(self):
+        #arrange
+        database = infrastructure.Database(settings.Settings(database_url="sqlite://"))
+
+        #act
+        before = database.created_engines()
+        async with database.async_session_factory() as session:
+            result = await session.scalar(text("SELECT 1"))
+        after = database.created_engines()
+        await database.dispose()
+
+        #assert
+        self.assertEqual(before, {})
+        self.assertEqual(result, 1)
+        self.assertEqual(list(after), ["async"])
+
+    def test_engine_needs_a_database_url(self):
+        #arrange
+        database = infrastructure.Database(settings.Settings())
+
+        #act
+        with self.assertRaises(AssertionError):
+            #assert
+            database.engine
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+import unittest.async_case
+import unittest.mock
+import uuid
+import httpx
+import infrastructure
+import main
+import security
+import settings
+
+
+# Route-level tests through the ASGI app against a throwaway SQLite file; authentication is
+# replaced by a fixed user
+class MainTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        infrastructure.database = infrastructure.Database(settings.Settings(database_url=f"sqlite:///{os.path.join(self.directory.name, 'posts.db')}"))
+        main.replica_router = None
+        if main.author_feeds is not None:
+            main.author_feeds.local.clear()
+        main.app.dependency_overrides[security.verify_jwt] = lambda: "alice"
+        self.lifespan = main.lifespan(main.app)
+        await self.lifespan.__aenter__()
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await self.lifespan.__aexit__(None, None, None)
+        main.app.dependency_overrides.clear()
+        infrastructure.database = None
+        main.replica_router = None
+        self.directory.cleanup()
+
+    async def create_post(self, title: str = "title") -> str:
+        response = await self.client.post("/posts/", json={"title": title, "description": "desc"})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["id"]
+
+    async def test_get_posts_by_ids_strips_whitespace_around_ids(self):
+        #arrange
+        id = await self.create_post()
+
+        #act
+        response = await self.client.get("/posts/", params={"ids": f"{id},zzz, {id}"})
+
+        #assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post["id"] for post in response.json()["posts"]], [id])
+        self.assertEqual(response.json()["missing_ids"], ["zzz"])
+
+    async def test_get_post_answers_matching_if_none_match_with_not_modified(self):
+        #arrange
+        id = await self.create_post()
+        first = await self.client.get(f"/posts/{id}")
+
+        #act
+        response = await self.client.get(f"/posts/{id}", headers={"If-None-Match": first.headers["ETag"]})
+
+        #assert
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], first.headers["ETag"])
+        self.assertEqual(response.content, b"")
+
+    async def test_get_post_answers_unchanged_if_modified_since_with_not_modified(self):
+        #arrange
+        id = await self.create_post()
+        first = await self.client.get(f"/posts/{id}")
+
+        #act
+        response = await self.client.get(f"/posts/{id}", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+
+        #assert
+        self.assertEqual(response.status_code, 304)
+
+    async def test_get_posts_rejects_unknown_fields(self):
+        #act
+        response = await self.client.get("/posts/", params={"fields": "title,secret"})
+
+        #assert
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("secret", response.json()["detail"])
+
+    async def test_create_post_replays_the_response_for_a_repeated_idempotency_key(self):
+        #arrange
+        headers = {"Idempotency-Key": str(uuid.uuid4())}
+        first = await self.client.post("/posts/", json={"title": "title", "description": "desc"}, headers=headers)
+
+        #act
+        replayed = await self.client.post("/posts/", json={"title": "title", "description": "desc"}, headers=headers)
+        reused = await self.client.post("/posts/", json={"title": "other", "description": "desc"}, headers=headers)
+        listed = await self.client.get("/posts/")
+
+        #assert
+        self.assertEqual((first.status_code, replayed.status_code, reused.status_code), (200, 200, 422))
+        self.assertEqual(replayed.json(), first.json())
+        self.assertEqual([post["id"] for post in listed.json()["posts"]], [first.json()["id"]])
+
+    async def test_search_answers_not_implemented_without_a_search_index(self):
+        #arrange
+        posts_service = unittest.mock.MagicMock()
+        posts_service.search_posts = unittest.mock.AsyncMock(side_effect=infrastructure.SearchUnavailableError("Full-text search is not available on postgresql"))
+        main.app.dependency_overrides[main.get_post_service] = lambda: posts_service
+
+        #act
+        response = await self.client.get("/posts/search", params={"q": "database"})
+
+        #assert
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(response.json()["detail"], "Full-text search is not available on postgresql")
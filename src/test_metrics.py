@@ -0,0 +1,103 @@
+import unittest
+import unittest.async_case
+import metrics
+
+
+class HistogramTests(unittest.TestCase):
+    def test_render_emits_cumulative_buckets_sum_and_count(self):
+        #arrange
+        registry = metrics.Registry()
+        histogram = registry.register(metrics.Histogram("latency_seconds", "Latency", ("layer",), buckets=(0.1, 1.0)))
+        histogram.observe(0.05, "query")
+        histogram.observe(0.1, "query")
+        histogram.observe(2.0, "query")
+
+        #act
+        result = registry.render()
+
+        #assert
+        self.assertIn('latency_seconds_bucket{layer="query",le="0.1"} 2', result)
+        self.assertIn('latency_seconds_bucket{layer="query",le="1.0"} 2', result)
+        self.assertIn('latency_seconds_bucket{layer="query",le="+Inf"} 3', result)
+        self.assertIn('latency_seconds_count{layer="query"} 3', result)
+        self.assertIn("# TYPE latency_seconds histogram", result)
+
+class CounterTests(unittest.TestCase):
+    def test_render_escapes_label_values(self):
+        #arrange
+        registry = metrics.Registry()
+        counter = registry.register(metrics.Counter("requests_total", "Requests", ("route",)))
+        counter.inc('/a"b')
+        counter.inc('/a"b', amount=2)
+
+        #act
+        result = registry.render()
+
+        #assert
+        self.assertIn('requests_total{route="/a\\"b"} 3', result)
+
+    def test_callback_metric_reads_values_at_render_time(self):
+        #arrange
+        registry = metrics.Registry()
+        stats = {"hits": 1}
+        registry.register(metrics.CallbackMetric("cache_events_total", "Cache events", lambda: stats, type="counter", label_name="event"))
+        stats["hits"] = 5
+
+        #act
+        result = registry.render()
+
+        #assert
+        self.assertIn('cache_events_total{event="hits"} 5', result)
+
+class TimedTests(unittest.TestCase):
+    def test_timed_records_layer_and_profile(self):
+        #arrange
+        before = metrics.layer_seconds.count("test_layer")
+        profile = {}
+        token = metrics.current_profile.set(profile)
+
+        #act
+        try:
+            with metrics.timed("test_layer"):
+                pass
+        finally:
+            metrics.current_profile.reset(token)
+
+        #assert
+        self.assertEqual(metrics.layer_seconds.count("test_layer"), before + 1)
+        self.assertIn("test_layer", profile)
+
+class MetricsMiddlewareTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def call(self, headers: list) -> list:
+        async def app(scope, receive, send):
+            with metrics.timed("query"):
+                pass
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+        messages = []
+        async def send(message):
+            messages.append(message)
+
+        await metrics.MetricsMiddleware(app)({"type": "http", "method": "GET", "headers": headers}, None, send)
+        return messages
+
+    async def test_adds_server_timing_when_profile_header_is_sent(self):
+        #act
+        messages = await self.call([(b"x-profile", b"1")])
+
+        #assert
+        headers = dict(messages[0]["headers"])
+        self.assertIn(b"query;dur=", headers[b"server-timing"])
+        self.assertIn(b"total;dur=", headers[b"server-timing"])
+
+    async def test_counts_requests_without_profiling_by_default(self):
+        #arrange
+        before = metrics.requests_total.value("GET", "unmatched", 200)
+
+        #act
+        messages = await self.call([])
+
+        #assert
+        self.assertEqual(messages[0]["headers"], [])
+        self.assertEqual(metrics.requests_total.value("GET", "unmatched", 200), before + 1)
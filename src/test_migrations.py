@@ -0,0 +1,157 @@
+import asyncio
+import datetime
+import os
+import tempfile
+import unittest
+import unittest.async_case
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+import infrastructure
+import migrations
+
+
+class MigrationsTests(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool)
+
+    def tearDown(self):
+        self.engine.dispose()
+
+    def query_plan(self, statement) -> str:
+        compiled = statement.compile(self.engine, compile_kwargs={"literal_binds": True})
+        with self.engine.connect() as connection:
+            rows = connection.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+        return "\n".join(row[-1] for row in rows)
+
+    def test_upgrade_applies_all_migrations_once(self):
+        #act
+        first = migrations.upgrade(self.engine)
+        second = migrations.upgrade(self.engine)
+
+        #assert
+        self.assertEqual(first, [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(second, [])
+        with self.engine.connect() as connection:
+            self.assertEqual(migrations.current_version(connection), 7)
+
+    def test_check_fails_until_migrations_are_applied(self):
+        #act
+        with self.assertRaises(migrations.SchemaOutdatedError):
+            migrations.check(self.engine)
+        migrations.upgrade(self.engine)
+
+        #assert
+        migrations.check(self.engine)
+
+    def test_failed_upgrade_leaves_nothing_behind_and_can_be_rerun(self):
+        #arrange
+        def fail(connection):
+            raise RuntimeError("migration failed")
+        failing = [migrations.MIGRATIONS[0], migrations.MIGRATIONS[1], migrations.Migration(3, "Fails", fail)]
+
+        #act
+        with self.assertRaises(RuntimeError):
+            migrations.upgrade(self.engine, failing)
+        tables_after_failure = inspect(self.engine).get_table_names()
+        applied = migrations.upgrade(self.engine)
+
+        #assert
+        self.assertEqual(tables_after_failure, [])
+        self.assertEqual(applied, [1, 2, 3, 4, 5, 6, 7])
+
+    def test_search_index_keyed_on_id_covers_existing_posts(self):
+        #arrange
+        migrations.upgrade(self.engine, migrations.MIGRATIONS[:5])
+        with self.engine.begin() as connection:
+            connection.execute(text('INSERT INTO "Posts" (id, title, description) VALUES (\'a\', \'Databases\', \'notes\')'))
+
+        #act
+        applied = migrations.upgrade(self.engine)
+
+        #assert
+        self.assertEqual(applied, [6, 7])
+        with self.engine.connect() as connection:
+            rows = connection.execute(infrastructure.select_posts_search(infrastructure.to_match_query("databases"), 10)).all()
+        self.assertEqual([row.id for row in rows], ["a"])
+
+    def test_upgrade_adopts_database_created_by_create_all(self):
+        #arrange
+        infrastructure.Base.metadata.create_all(bind=self.engine)
+
+        #act
+        applied = migrations.upgrade(self.engine)
+
+        #assert
+        self.assertEqual(applied, [1, 2, 3, 4, 5, 6, 7])
+        index_names = {index["name"] for index in inspect(self.engine).get_indexes("Posts")}
+        self.assertTrue({"ix_posts_created_at_id", "ix_posts_author_created_at", "ix_posts_votes_created_at"} <= index_names)
+
+    def test_recency_page_uses_index(self):
+        #arrange
+        migrations.upgrade(self.engine)
+
+        #act
+        plan = self.query_plan(infrastructure.select_posts_page(50, (datetime.datetime(year=2024,month=1,day=1), "id")))
+
+        #assert
+        self.assertIn("USING INDEX ix_posts_created_at_id", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_author_listing_uses_index(self):
+        #arrange
+        migrations.upgrade(self.engine)
+        statement = select(infrastructure.PersistedPost).where(infrastructure.PersistedPost.author == "user").order_by(infrastructure.PersistedPost.created_at.desc(), infrastructure.PersistedPost.id.desc()).limit(50)
+
+        #act
+        plan = self.query_plan(statement)
+
+        #assert
+        self.assertIn("USING INDEX ix_posts_author_created_at", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_author_page_uses_index(self):
+        #arrange
+        migrations.upgrade(self.engine)
+
+        #act
+        plan = self.query_plan(infrastructure.select_posts_page(50, (datetime.datetime(year=2024,month=1,day=1), "id"), author="user"))
+
+        #assert
+        self.assertIn("USING INDEX ix_posts_author_created_at", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_vote_ranking_uses_index(self):
+        #arrange
+        migrations.upgrade(self.engine)
+        statement = select(infrastructure.PersistedPost).order_by(infrastructure.PersistedPost.votes.desc(), infrastructure.PersistedPost.created_at.desc(), infrastructure.PersistedPost.id.desc()).limit(10)
+
+        #act
+        plan = self.query_plan(statement)
+
+        #assert
+        self.assertIn("ix_posts_votes_created_at", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class ConcurrentMigrationsTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        # One engine per worker process starting at the same time
+        url = f"sqlite+aiosqlite:///{os.path.join(self.directory.name, 'posts.db')}"
+        self.engines = [create_async_engine(url) for _ in range(4)]
+
+    async def asyncTearDown(self):
+        for engine in self.engines:
+            await engine.dispose()
+        self.directory.cleanup()
+
+    async def test_concurrent_upgrades_apply_each_migration_once(self):
+        #act
+        results = await asyncio.gather(*(migrations.upgrade_async(engine) for engine in self.engines))
+
+        #assert
+        self.assertEqual(sorted(results), [[], [], [], [1, 2, 3, 4, 5, 6, 7]])
+        async with self.engines[0].connect() as connection:
+            versions = (await connection.execute(select(migrations.schema_version.c.version))).scalars().all()
+        self.assertEqual(versions, [1, 2, 3, 4, 5, 6, 7])
@@ -0,0 +1,164 @@
+import asyncio
+import dataclasses
+import datetime
+import unittest
+import unittest.async_case
+import orjson
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import StaticPool
+import domain
+import infrastructure
+import outbox
+import serialization
+import unit_of_work
+
+
+def new_post(id: str) -> domain.Post:
+    return domain.Post(
+        id=id,
+        author="user",
+        title="title",
+        description="desc",
+        votes=0,
+        created_at=datetime.datetime(year=2024,month=1,day=1),
+        updated_at=datetime.datetime(year=2024,month=1,day=1),
+        updated_by="user",
+        created_by="user"
+    )
+
+
+class OutboxDispatcherTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with self.engine.begin() as connection:
+            await connection.run_sync(infrastructure.Base.metadata.create_all)
+        self.session_factory = async_sessionmaker(bind=self.engine, expire_on_commit=False)
+        async with self.make_unit_of_work() as uow:
+            await uow.posts.create_many([new_post("a"), new_post("b"), new_post("c")])
+            await uow.events.append([outbox.post_created(new_post(id)) for id in ("a", "b", "c")])
+            await uow.commit()
+
+    async def asyncTearDown(self):
+        await self.engine.dispose()
+
+    def make_unit_of_work(self):
+        return unit_of_work.SqlAlchemyAsyncUnitOfWork(self.session_factory)
+
+    async def test_post_created_payload_matches_the_post_read_back(self):
+        #arrange
+        # Created the way the service does, with aware UTC timestamps
+        created_at = datetime.datetime(year=2024,month=1,day=2,hour=3,tzinfo=datetime.timezone.utc)
+        post = dataclasses.replace(new_post("d"), created_at=created_at, updated_at=created_at)
+        async with self.make_unit_of_work() as uow:
+            await uow.posts.create(post)
+            await uow.commit()
+
+        #act
+        event = outbox.post_created(post)
+        async with self.make_unit_of_work() as uow:
+            stored = await uow.posts.read("d")
+
+        #assert
+        self.assertEqual(event.payload, orjson.loads(serialization.encode_post(stored)))
+        self.assertEqual(event.payload["created_at"], "2024-01-02 03:00:00")
+
+    async def test_drain_sends_batches_in_sequence_order_once(self):
+        #arrange
+        dispatcher = outbox.OutboxDispatcher(self.make_unit_of_work, batch_size=2)
+        batches = []
+        dispatcher.add_listener(lambda events: batches.append([(event.sequence, event.post_id) for event in events]))
+
+        #act
+        dispatched = await dispatcher.drain()
+        again = await dispatcher.drain()
+
+        #assert
+        self.assertEqual((dispatched, again), (3, 0))
+        self.assertEqual(batches, [[(1, "a"), (2, "b")], [(3, "c")]])
+
+    async def test_failing_listener_leaves_events_pending(self):
+        #arrange
+        dispatcher = outbox.OutboxDispatcher(self.make_unit_of_work)
+        def fail(events):
+            raise RuntimeError("broker unavailable")
+        dispatcher.add_listener(fail)
+
+        #act
+        with self.assertRaises(RuntimeError):
+            await dispatcher.dispatch()
+        dispatcher.listeners.clear()
+        retried = await dispatcher.dispatch()
+
+        #assert
+        self.assertEqual(retried, 3)
+        self.assertEqual(dispatcher.dispatch_errors, 1)
+
+    async def test_prune_keeps_undispatched_and_newest_events(self):
+        #arrange
+        async with self.make_unit_of_work() as uow:
+            await uow.events.mark_dispatched([1, 2, 3])
+            await uow.events.append([outbox.post_voted("a", 1)])
+            await uow.commit()
+
+        #act
+        async with self.make_unit_of_work() as uow:
+            pruned = await uow.events.prune(datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=1))
+            await uow.commit()
+        async with self.make_unit_of_work() as uow:
+            remaining = await uow.events.read_after(0, 10)
+
+        #assert
+        self.assertEqual(pruned, 3)
+        self.assertEqual([(event.sequence, event.type, event.payload) for event in remaining], [(4, outbox.POST_VOTED, {"votes": 1})])
+
+
+class ChangeFeedTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def test_wait_returns_when_newer_events_are_published(self):
+        #arrange
+        change_feed = outbox.ChangeFeed()
+        waiter = asyncio.create_task(change_feed.wait(0, timeout=5))
+        await asyncio.sleep(0)
+
+        #act
+        change_feed.publish([domain.PostEvent(outbox.POST_CREATED, "a", {}, datetime.datetime(year=2024,month=1,day=1), 1)])
+
+        #assert
+        self.assertTrue(await waiter)
+        self.assertFalse(await change_feed.wait(1, timeout=0.01))
+
+
+class FakeEventsRepository:
+    async def read_pending(self, limit):
+        return []
+
+
+class FakeUnitOfWork:
+    def __init__(self, events):
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def commit(self):
+        pass
+
+
+class OutboxDispatcherRestartTests(unittest.TestCase):
+    def test_dispatcher_restarts_on_a_new_event_loop(self):
+        #arrange
+        dispatcher = outbox.OutboxDispatcher(lambda: FakeUnitOfWork(FakeEventsRepository()), poll_interval_seconds=60)
+        async def serve():
+            dispatcher.start()
+            dispatcher.notify()
+            await asyncio.sleep(0.01)
+            await dispatcher.stop()
+
+        #act
+        asyncio.run(serve())
+        asyncio.run(serve())
+
+        #assert
+        self.assertEqual(dispatcher.dispatch_errors, 0)
@@ -0,0 +1,75 @@
+import datetime
+import unittest
+from collections import namedtuple
+import ranking
+
+Row = namedtuple("Row", ["id", "votes", "created_at"])
+
+
+class TopPostsIndexTests(unittest.TestCase):
+    def test_top_orders_by_votes_then_recency(self):
+        #arrange
+        top_posts = ranking.TopPostsIndex(capacity=10)
+        top_posts.upsert("old", 5, datetime.datetime(year=2024,month=1,day=1))
+        top_posts.upsert("new", 5, datetime.datetime(year=2024,month=1,day=2))
+        top_posts.upsert("best", 9, datetime.datetime(year=2024,month=1,day=1))
+
+        #act
+        result = top_posts.top(3)
+
+        #assert
+        self.assertEqual(result, ["best", "new", "old"])
+
+    def test_upsert_moves_existing_post(self):
+        #arrange
+        top_posts = ranking.TopPostsIndex(capacity=10)
+        top_posts.upsert("a", 1, datetime.datetime(year=2024,month=1,day=1))
+        top_posts.upsert("b", 2, datetime.datetime(year=2024,month=1,day=1))
+
+        #act
+        top_posts.upsert("a", 3, datetime.datetime(year=2024,month=1,day=1))
+
+        #assert
+        self.assertEqual(top_posts.top(2), ["a", "b"])
+        self.assertEqual(len(top_posts), 2)
+
+    def test_upsert_evicts_lowest_ranked_post_at_capacity(self):
+        #arrange
+        top_posts = ranking.TopPostsIndex(capacity=2)
+        top_posts.upsert("a", 1, datetime.datetime(year=2024,month=1,day=1))
+        top_posts.upsert("b", 2, datetime.datetime(year=2024,month=1,day=1))
+
+        #act
+        top_posts.upsert("c", 3, datetime.datetime(year=2024,month=1,day=1))
+        top_posts.upsert("d", 0, datetime.datetime(year=2024,month=1,day=1))
+
+        #assert
+        self.assertEqual(top_posts.top(10), ["c", "b"])
+        self.assertNotIn("a", top_posts.keys_by_id)
+
+    def test_rebuild_replaces_contents(self):
+        #arrange
+        top_posts = ranking.TopPostsIndex(capacity=2)
+        top_posts.upsert("stale", 100, datetime.datetime(year=2024,month=1,day=1))
+
+        #act
+        top_posts.rebuild([
+            Row("a", 1, datetime.datetime(year=2024,month=1,day=1)),
+            Row("b", 3, datetime.datetime(year=2024,month=1,day=1)),
+            Row("c", 2, datetime.datetime(year=2024,month=1,day=1))
+        ])
+
+        #assert
+        self.assertEqual(top_posts.top(10), ["b", "c"])
+
+    def test_naive_and_aware_datetimes_rank_consistently(self):
+        #arrange
+        top_posts = ranking.TopPostsIndex(capacity=10)
+        top_posts.upsert("naive", 1, datetime.datetime(year=2024,month=1,day=1))
+        top_posts.upsert("aware", 1, datetime.datetime(year=2024,month=1,day=2,tzinfo=datetime.timezone.utc))
+
+        #act
+        result = top_posts.top(2)
+
+        #assert
+        self.assertEqual(result, ["aware", "naive"])
@@ -0,0 +1,150 @@
+import datetime
+import os
+import tempfile
+import unittest
+import unittest.async_case
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import cache
+import domain
+import dtos
+import infrastructure
+import routing
+import service
+import unit_of_work
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ReplicaRouterTests(unittest.TestCase):
+    def test_reads_rotate_across_readers(self):
+        #arrange
+        router = routing.ReplicaRouter("writer", ["reader-1", "reader-2"])
+
+        #act
+        result = [router.route(write=False)[0] for _ in range(4)]
+
+        #assert
+        self.assertEqual(result, ["reader-1", "reader-2", "reader-1", "reader-2"])
+
+    def test_writes_go_to_writer(self):
+        #arrange
+        router = routing.ReplicaRouter("writer", ["reader-1"])
+
+        #act
+        result = router.route(write=True, current_user="alice")
+
+        #assert
+        self.assertEqual(result, ("writer", True))
+
+    def test_reads_stick_to_writer_after_a_write_until_window_passes(self):
+        #arrange
+        clock = FakeClock()
+        router = routing.ReplicaRouter("writer", ["reader-1"], stickiness_seconds=5, clock=clock)
+        router.record_write("alice")
+
+        #act
+        sticky = router.route(write=False, current_user="alice")
+        other_user = router.route(write=False, current_user="bob")
+        clock.now = 5
+        expired = router.route(write=False, current_user="alice")
+
+        #assert
+        self.assertEqual(sticky, ("writer", True))
+        self.assertEqual(other_user, ("reader-1", False))
+        self.assertEqual(expired, ("reader-1", False))
+        self.assertEqual(router.stats()["writer_reads"], 1)
+
+    def test_without_readers_reads_use_writer(self):
+        #arrange
+        router = routing.ReplicaRouter("writer")
+        router.record_write("alice")
+
+        #act
+        result = [router.route(write=False), router.route(write=False, current_user="alice")]
+
+        #assert
+        self.assertEqual(result, [("writer", True), ("writer", True)])
+        self.assertEqual(router.stats(), {"writer_reads": 2, "replica_reads": 0, "sticky_users": 0})
+
+
+class ReplicaRoutingUnitOfWorkTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engines = []
+        self.session_factories = []
+        for name in ("writer", "reader-1", "reader-2"):
+            engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(self.directory.name, name + '.db')}")
+            async with engine.begin() as connection:
+                await connection.run_sync(infrastructure.Base.metadata.create_all)
+            self.engines.append(engine)
+            self.session_factories.append(async_sessionmaker(bind=engine, expire_on_commit=False))
+        # Each replica holds one post named after it, standing in for replication lag
+        for name, session_factory in zip(("reader-1", "reader-2"), self.session_factories[1:]):
+            async with unit_of_work.SqlAlchemyAsyncUnitOfWork(session_factory) as uow:
+                await uow.posts.create(self.make_post(name))
+                await uow.commit()
+        self.router = routing.ReplicaRouter(self.session_factories[0], self.session_factories[1:], stickiness_seconds=60)
+
+    async def asyncTearDown(self):
+        for engine in self.engines:
+            await engine.dispose()
+        self.directory.cleanup()
+
+    def make_post(self, id: str) -> domain.Post:
+        return domain.Post(
+            id=id,
+            author="user",
+            title="title",
+            description="desc",
+            votes=0,
+            created_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_by="user",
+            created_by="user"
+        )
+
+    async def test_service_reads_round_robin_and_writes_hit_writer(self):
+        #arrange
+        posts_service = service.PostsService(unit_of_work.SqlAlchemyAsyncUnitOfWork(router=self.router))
+
+        #act
+        first, _ = await posts_service.read_page(10, current_user="bob")
+        second, _ = await posts_service.read_page(10, current_user="bob")
+
+        #assert
+        self.assertEqual([post.id for post in first], ["reader-1"])
+        self.assertEqual([post.id for post in second], ["reader-2"])
+
+    async def test_user_reads_own_write_from_writer(self):
+        #arrange
+        posts_service = service.PostsService(unit_of_work.SqlAlchemyAsyncUnitOfWork(router=self.router))
+        created = await posts_service.create(dtos.CreatePostRequestDto(title="title", description="desc"), "alice")
+
+        #act
+        own = await posts_service.read_post(created.id, current_user="alice")
+        other = await posts_service.read_post(created.id, current_user="bob")
+
+        #assert
+        self.assertEqual(own.id, created.id)
+        self.assertIsNone(other)
+
+    async def test_without_readers_reads_stay_on_writer_and_use_the_post_cache(self):
+        #arrange
+        router = routing.ReplicaRouter(self.session_factories[0], stickiness_seconds=60)
+        posts_service = service.PostsService(unit_of_work.SqlAlchemyAsyncUnitOfWork(post_cache=cache.PostCache(), router=router))
+        created = await posts_service.create(dtos.CreatePostRequestDto(title="title", description="desc"), "alice")
+
+        #act
+        first = await posts_service.read_post(created.id, current_user="alice")
+        second = await posts_service.read_post(created.id, current_user="alice")
+
+        #assert
+        self.assertEqual((first.id, second.id), (created.id, created.id))
+        self.assertEqual(router.stats(), {"writer_reads": 2, "replica_reads": 0, "sticky_users": 0})
+        self.assertEqual(posts_service.uow.post_cache.hits, 1)
@@ -0,0 +1,248 @@
+import json
+import threading
+import unittest
+import unittest.async_case
+import unittest.mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, SecurityScopes
+import security
+
+
+class StubJwksServer:
+    def __init__(self, kids):
+        self.kids = kids
+        self.requests = 0
+        self.fail = False
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                if stub.fail:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                body = json.dumps({"keys": [{"kty": "RSA", "kid": kid, "use": "sig", "n": "n", "e": "AQAB"} for kid in stub.kids]}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/.well-known/jwks.json"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class JwksKeyStoreTests(unittest.async_case.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.stub = StubJwksServer(["kid-1"])
+        self.clock = FakeClock()
+        self.store = security.JwksKeyStore(self.stub.url, ttl_seconds=60, unknown_kid_cooldown_seconds=10, clock=self.clock)
+
+    def tearDown(self):
+        self.stub.close()
+
+    async def test_get_key_serves_cached_keys_within_ttl(self):
+        #act
+        first = await self.store.get_key("kid-1")
+        second = await self.store.get_key("kid-1")
+
+        #assert
+        self.assertEqual(first["kid"], "kid-1")
+        self.assertEqual(second, first)
+        self.assertEqual(self.stub.requests, 1)
+
+    async def test_get_key_refreshes_in_background_after_ttl(self):
+        #arrange
+        await self.store.get_key("kid-1")
+        self.stub.kids = ["kid-1", "kid-2"]
+        self.clock.now += 61
+
+        #act
+        stale = await self.store.get_key("kid-1")
+        await self.store.refresh_task
+
+        #assert
+        self.assertEqual(stale["kid"], "kid-1")
+        self.assertIn("kid-2", self.store.keys)
+        self.assertEqual(self.stub.requests, 2)
+
+    async def test_unknown_kid_forces_single_refetch_per_cooldown(self):
+        #arrange
+        await self.store.get_key("kid-1")
+        self.clock.now += 11
+
+        #act
+        first = await self.store.get_key("unknown")
+        second = await self.store.get_key("unknown")
+
+        #assert
+        self.assertIsNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(self.stub.requests, 2)
+
+    async def test_unknown_kid_picks_up_rotated_key(self):
+        #arrange
+        await self.store.get_key("kid-1")
+        self.stub.kids = ["kid-2"]
+        self.clock.now += 11
+
+        #act
+        result = await self.store.get_key("kid-2")
+
+        #assert
+        self.assertEqual(result["kid"], "kid-2")
+
+    async def test_get_key_serves_stale_keys_when_refresh_fails(self):
+        #arrange
+        await self.store.get_key("kid-1")
+        self.stub.fail = True
+        self.clock.now += 61
+
+        #act
+        await self.store.get_key("kid-1")
+        await self.store.refresh_task
+        result = await self.store.get_key("kid-1")
+
+        #assert
+        self.assertEqual(result["kid"], "kid-1")
+        self.assertEqual(self.store.fetch_errors, 1)
+
+    async def test_failing_refresh_is_retried_once_per_cooldown(self):
+        #arrange
+        await self.store.get_key("kid-1")
+        self.stub.fail = True
+        self.clock.now += 61
+
+        #act
+        for _ in range(200):
+            result = await self.store.get_key("kid-1")
+            if self.store.refresh_task is not None:
+                await self.store.refresh_task
+        self.clock.now += 11
+        await self.store.get_key("kid-1")
+        await self.store.refresh_task
+
+        #assert
+        self.assertEqual(result["kid"], "kid-1")
+        self.assertEqual(self.stub.requests, 3)
+        self.assertEqual(self.store.fetch_errors, 2)
+
+    async def test_first_fetch_is_retried_once_per_cooldown(self):
+        #arrange
+        self.stub.fail = True
+
+        #act
+        for _ in range(20):
+            with self.assertRaises(LookupError):
+                await self.store.get_key("kid-1")
+        self.stub.fail = False
+        self.clock.now += 11
+        result = await self.store.get_key("kid-1")
+
+        #assert
+        self.assertEqual(result["kid"], "kid-1")
+        self.assertEqual(self.stub.requests, 2)
+
+    async def test_get_key_throws_when_jwks_never_fetched(self):
+        #arrange
+        self.stub.fail = True
+
+        #act
+        with self.assertRaises(LookupError):
+            #assert
+            await self.store.get_key("kid-1")
+
+
+class VerifiedTokenCacheTests(unittest.TestCase):
+    def test_get_returns_entry_until_token_expires(self):
+        #arrange
+        clock = FakeClock()
+        token_cache = security.VerifiedTokenCache(max_entries=10, clock=clock)
+        verified_token = security.VerifiedToken(claims={"sub": "user", "exp": clock.now + 5}, permissions=frozenset(["read-post"]))
+        token_cache.add("token", verified_token)
+
+        #act
+        before_expiry = token_cache.get("token")
+        clock.now += 5
+        after_expiry = token_cache.get("token")
+
+        #assert
+        self.assertEqual(before_expiry, verified_token)
+        self.assertIsNone(after_expiry)
+        self.assertEqual(token_cache.stats()["hits"], 1)
+        self.assertEqual(token_cache.stats()["expirations"], 1)
+
+    def test_add_skips_tokens_without_exp(self):
+        #arrange
+        token_cache = security.VerifiedTokenCache(max_entries=10)
+
+        #act
+        token_cache.add("token", security.VerifiedToken(claims={"sub": "user"}, permissions=frozenset()))
+
+        #assert
+        self.assertIsNone(token_cache.get("token"))
+
+    def test_add_evicts_least_recently_used_token(self):
+        #arrange
+        clock = FakeClock()
+        token_cache = security.VerifiedTokenCache(max_entries=1, clock=clock)
+        claims = {"sub": "user", "exp": clock.now + 60}
+
+        #act
+        token_cache.add("first", security.VerifiedToken(claims=claims, permissions=frozenset()))
+        token_cache.add("second", security.VerifiedToken(claims=claims, permissions=frozenset()))
+
+        #assert
+        self.assertIsNone(token_cache.get("first"))
+        self.assertIsNotNone(token_cache.get("second"))
+        self.assertEqual(token_cache.stats()["evictions"], 1)
+
+
+class VerifyJwtTests(unittest.async_case.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.original_cache = security.token_cache
+        security.token_cache = security.VerifiedTokenCache(max_entries=10)
+        security.token_cache.add("cached-token", security.VerifiedToken(claims={"sub": "user", "exp": 2**40}, permissions=frozenset(["read-post"])))
+
+    def tearDown(self):
+        security.token_cache = self.original_cache
+
+    async def test_verify_jwt_skips_signature_verification_for_cached_token(self):
+        #arrange
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="cached-token")
+        with unittest.mock.patch.object(security, "get_rsa_key") as get_rsa_key:
+            #act
+            result = await security.verify_jwt(credentials, SecurityScopes(scopes=["read-post"]))
+
+        #assert
+        self.assertEqual(result, "user")
+        get_rsa_key.assert_not_called()
+
+    async def test_verify_jwt_throws_when_cached_token_lacks_scope(self):
+        #arrange
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="cached-token")
+
+        #act
+        with self.assertRaises(HTTPException) as context:
+            await security.verify_jwt(credentials, SecurityScopes(scopes=["create-post"]))
+
+        #assert
+        self.assertEqual(context.exception.status_code, 403)
@@ -0,0 +1,117 @@
+import datetime
+import unittest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import domain
+import dtos
+import serialization
+import service
+
+
+def make_post(id: str, title: str = "Title") -> domain.Post:
+    return domain.Post(
+        id=id,
+        author="user",
+        title=title,
+        description="Description",
+        votes=3,
+        created_at=datetime.datetime(year=2024,month=1,day=1,hour=12,microsecond=5),
+        created_by="user",
+        updated_at=datetime.datetime(year=2024,month=1,day=2,tzinfo=datetime.timezone.utc),
+        updated_by="user"
+    )
+
+def render(dto) -> bytes:
+    return JSONResponse(content=jsonable_encoder(dto)).body
+
+
+class SerializationTests(unittest.TestCase):
+    def test_encode_post_matches_dto_response(self):
+        #arrange
+        post = make_post("1")
+
+        #act
+        result = serialization.encode_post(post)
+
+        #assert
+        self.assertEqual(result, render(service.to_post_dto(post)))
+
+    def test_encode_post_matches_dto_response_for_unicode_and_control_characters(self):
+        #arrange
+        post = make_post("1", title="Zürich \"quoted\" \\ \n\t\x01   😀 <script>")
+
+        #act
+        result = serialization.encode_post(post)
+
+        #assert
+        self.assertEqual(result, render(service.to_post_dto(post)))
+
+    def test_encode_posts_page_matches_dto_response(self):
+        #arrange
+        posts = [make_post("1"), make_post("2")]
+        dto = dtos.GetPostsResponseDto(posts=[service.to_post_dto(post) for post in posts], next_cursor="abc")
+
+        #act
+        result = serialization.encode_posts_page(posts, "abc")
+
+        #assert
+        self.assertEqual(result, render(dto))
+
+    def test_encode_posts_page_without_cursor_matches_dto_response(self):
+        #arrange
+        dto = dtos.GetPostsResponseDto(posts=[])
+
+        #act
+        result = serialization.encode_posts_page([])
+
+        #assert
+        self.assertEqual(result, render(dto))
+
+    def test_encode_posts_by_ids_matches_dto_response(self):
+        #arrange
+        posts = [make_post("1")]
+        dto = dtos.GetPostsByIdsResponseDto(posts=[service.to_post_dto(post) for post in posts], missing_ids=["2"])
+
+        #act
+        result = serialization.encode_posts_by_ids(posts, ["2"])
+
+        #assert
+        self.assertEqual(result, render(dto))
+
+    def test_project_fields_orders_fields_and_always_includes_id(self):
+        #act
+        result = serialization.project_fields(["votes", "title"])
+
+        #assert
+        self.assertEqual(result, ("id", "title", "votes"))
+
+    def test_project_fields_throws_on_unknown_field(self):
+        #act
+        with self.assertRaises(ValueError):
+            #assert
+            serialization.project_fields(["title", "password"])
+
+    def test_encode_posts_page_fields_matches_full_encoding_for_selected_fields(self):
+        #arrange
+        post = make_post("1")
+        fields = serialization.project_fields(["title", "created_at"])
+        entry = {field: getattr(post, field) for field in serialization.POST_FIELDS}
+
+        #act
+        result = serialization.encode_posts_page_fields([entry], fields)
+
+        #assert
+        self.assertEqual(result, b'{"posts":[{"id":"1","title":"Title","created_at":"2024-01-01 12:00:00.000005"}],"next_cursor":null}')
+
+    def test_datetimes_normalize_to_utc(self):
+        #arrange
+        naive = datetime.datetime(year=2024,month=1,day=1,hour=12)
+        aware = datetime.datetime(year=2024,month=1,day=1,hour=14,tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+
+        #act
+        result = [serialization.to_utc(naive), serialization.to_utc(aware), serialization.to_stored_utc(naive), serialization.to_stored_utc(aware)]
+
+        #assert
+        utc = datetime.datetime(year=2024,month=1,day=1,hour=12,tzinfo=datetime.timezone.utc)
+        self.assertEqual(result, [utc, utc, naive, naive])
+        self.assertEqual([value.tzinfo for value in result], [datetime.timezone.utc, datetime.timezone.utc, None, None])
@@ -1,17 +1,37 @@
+import asyncio
+import collections
 import unittest
 import unittest.async_case
 import unittest.mock
+import cache
 import infrastructure
+import outbox
 import service
+import singleflight
 import dtos
 import domain
 import datetime
+import ranking
+import unit_of_work
+import votes
+
+class FakeUnitOfWork(unit_of_work.AsyncUnitOfWork):
+    def __init__(self, posts, events=None):
+        self.posts = posts
+        self.events = events
+        self.committed = False
+    
+    async def commit(self):
+        self.committed = True
+    
+    async def rollback(self):
+        pass
 
 class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
     async def test_create_throws_when_dto_is_none(self):
         #arrange
-        posts_repository = infrastructure.PostsRepository(db=None)
-        posts_service = service.PostsService(posts_repository=posts_repository)
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
         
         #act
         with self.assertRaises(AssertionError):
@@ -20,8 +40,8 @@ class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
     
     async def test_create_throws_when_user_is_none(self):
         #arrange
-        posts_repository = infrastructure.PostsRepository(db=None)
-        posts_service = service.PostsService(posts_repository=posts_repository)
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
         
         #act
         with self.assertRaises(AssertionError):
@@ -30,8 +50,8 @@ class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
     
     async def test_create_throws_when_user_is_empty(self):
         #arrange
-        posts_repository = infrastructure.PostsRepository(db=None)
-        posts_service = service.PostsService(posts_repository=posts_repository)
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
         
         #act
         with self.assertRaises(AssertionError):
@@ -40,21 +60,102 @@ class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
     
     async def test_create_successful(self):
         #arrange
-        posts_repository = infrastructure.PostsRepository(db=None)
+        posts_repository = infrastructure.AsyncPostsRepository(None)
         posts_repository.create = unittest.mock.AsyncMock()
-        posts_service = service.PostsService(posts_repository=posts_repository)
+        uow = FakeUnitOfWork(posts_repository)
+        posts_service = service.PostsService(uow)
         
         #act
         await posts_service.create(dtos.CreatePostRequestDto(title="title", description="desc"), "user")
         
         #assert
         posts_repository.create.assert_called_once()
+        self.assertTrue(uow.committed)
+    
+    async def test_create_many_inserts_batch_in_one_transaction(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.create_many = unittest.mock.AsyncMock()
+        uow = FakeUnitOfWork(posts_repository)
+        posts_service = service.PostsService(uow)
+        batch = dtos.CreatePostsRequestDto(posts=[
+            dtos.CreatePostRequestDto(title="first", description="desc"),
+            dtos.CreatePostRequestDto(title="second", description="desc")
+        ])
+        
+        #act
+        result: dtos.CreatePostsResponseDto = await posts_service.create_many(batch, "user")
+        
+        #assert
+        created = posts_repository.create_many.call_args[0][0]
+        self.assertEqual(result.ids, [post.id for post in created])
+        self.assertEqual([post.title for post in created], ["first", "second"])
+        self.assertTrue(uow.committed)
+    
+    async def test_create_many_throws_when_batch_is_too_large(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        batch = dtos.CreatePostsRequestDto(posts=[dtos.CreatePostRequestDto(title="title", description="desc")] * (service.MAX_CREATE_BATCH_SIZE + 1))
+        
+        #act
+        with self.assertRaises(AssertionError):
+            #assert
+            await posts_service.create_many(batch, "user")
+    
+    async def test_create_writes_created_event_before_commit(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.create = unittest.mock.AsyncMock()
+        events_repository = unittest.mock.AsyncMock()
+        uow = FakeUnitOfWork(posts_repository, events_repository)
+        events_repository.append.side_effect = lambda events: self.assertFalse(uow.committed)
+        outbox_dispatcher = unittest.mock.MagicMock()
+        posts_service = service.PostsService(uow, outbox_dispatcher=outbox_dispatcher)
+        
+        #act
+        result = await posts_service.create(dtos.CreatePostRequestDto(title="title", description="desc"), "user")
+        
+        #assert
+        [events] = events_repository.append.await_args.args
+        self.assertEqual([(event.type, event.post_id, event.payload["title"]) for event in events], [(outbox.POST_CREATED, result.id, "title")])
+        self.assertTrue(uow.committed)
+        outbox_dispatcher.notify.assert_called_once_with()
+    
+    async def test_read_changes_throws_when_cursor_events_were_pruned(self):
+        #arrange
+        events_repository = unittest.mock.AsyncMock()
+        events_repository.read_after.return_value = []
+        events_repository.oldest_sequence.return_value = 10
+        posts_service = service.PostsService(FakeUnitOfWork(None, events_repository))
+        
+        #act
+        with self.assertRaises(service.ChangesExpiredError):
+            #assert
+            await posts_service.read_changes(5)
+    
+    async def test_wait_for_changes_returns_events_published_while_waiting(self):
+        #arrange
+        event = domain.PostEvent(outbox.POST_CREATED, "id", {}, datetime.datetime(year=2024,month=1,day=1), 8)
+        events_repository = unittest.mock.AsyncMock()
+        events_repository.read_after.side_effect = [[], [event]]
+        events_repository.oldest_sequence.return_value = 1
+        change_feed = outbox.ChangeFeed()
+        posts_service = service.PostsService(FakeUnitOfWork(None, events_repository), change_feed=change_feed)
+        asyncio.get_running_loop().call_later(0.01, change_feed.publish, [event])
+        
+        #act
+        with unittest.mock.patch.object(service, "CHANGES_POLL_SECONDS", 5):
+            events, next_since = await posts_service.wait_for_changes(7, 10, timeout=5)
+        
+        #assert
+        self.assertEqual((events, next_since), ([event], 8))
     
     async def test_read_all_successful(self):
         #arrange
-        posts_repository = infrastructure.PostsRepository(db=None)
-        posts_repository.read_all = unittest.mock.AsyncMock()
-        posts_repository.read_all.return_value = [
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_page = unittest.mock.AsyncMock()
+        posts_repository.read_page.return_value = [
             domain.Post(
                 id="id",
                 author="user",
@@ -67,7 +168,7 @@ class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
                 created_by="user"
             )
         ]
-        posts_service = service.PostsService(posts_repository=posts_repository)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
         
         #act
         result: dtos.GetPostsResponseDto = await posts_service.read_all()
@@ -86,12 +187,428 @@ class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
                 created_by="user"
             )
         ]))
-        posts_repository.read_all.assert_called_once()
+        posts_repository.read_page.assert_awaited_once_with(service.DEFAULT_PAGE_SIZE + 1, None, None)
+    
+    async def test_read_all_returns_next_cursor_when_more_posts_exist(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_page = unittest.mock.AsyncMock()
+        posts_repository.read_page.return_value = [
+            domain.Post(
+                id=f"id-{day}",
+                author="user",
+                title="title",
+                description="desc",
+                votes=1,
+                created_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_by="user",
+                created_by="user"
+            )
+            for day in (3, 2, 1)
+        ]
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        
+        #act
+        result: dtos.GetPostsResponseDto = await posts_service.read_all(limit=2)
+        
+        #assert
+        self.assertEqual([post.id for post in result.posts], ["id-3", "id-2"])
+        self.assertEqual(service.decode_cursor(result.next_cursor), (datetime.datetime(year=2024,month=1,day=2), "id-2"))
+        posts_repository.read_page.assert_awaited_once_with(3, None, None)
+    
+    async def test_read_page_serves_author_first_page_from_cache_until_author_posts(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_page = unittest.mock.AsyncMock(return_value=[
+            domain.Post(
+                id=f"id-{day}",
+                author="user",
+                title="title",
+                description="desc",
+                votes=1,
+                created_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_by="user",
+                created_by="user"
+            )
+            for day in (3, 2, 1)
+        ])
+        posts_repository.create = unittest.mock.AsyncMock()
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository), author_feeds=cache.AuthorFeedCache())
+        
+        #act
+        first, first_cursor = await posts_service.read_page(2, author="user")
+        cached, cached_cursor = await posts_service.read_page(2, author="user")
+        await posts_service.create(dtos.CreatePostRequestDto(title="title", description="desc"), "user")
+        await posts_service.read_page(2, author="user")
+        
+        #assert
+        self.assertEqual([post.id for post in first], ["id-3", "id-2"])
+        self.assertEqual((cached, cached_cursor), (first, first_cursor))
+        self.assertEqual(posts_repository.read_page.await_args_list, [unittest.mock.call(3, None, "user")] * 2)
+    
+    async def test_read_page_skips_author_cache_for_reads_pinned_to_writer(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_page = unittest.mock.AsyncMock(return_value=[])
+        uow = FakeUnitOfWork(posts_repository)
+        uow.reads_from_writer = lambda current_user: current_user == "alice"
+        author_feeds = cache.AuthorFeedCache()
+        posts_service = service.PostsService(uow, author_feeds=author_feeds)
+        
+        #act
+        await posts_service.read_page(10, current_user="alice", author="alice")
+        await posts_service.read_page(10, current_user="bob", author="alice")
+        await posts_service.read_page(10, current_user="bob", author="alice")
+        await posts_service.read_page(10, current_user="alice", author="alice")
+        
+        #assert
+        self.assertEqual(posts_repository.read_page.await_count, 3)
+        self.assertEqual((author_feeds.hits, author_feeds.misses), (1, 1))
+    
+    async def test_read_page_refreshes_author_first_page_after_vote_flush(self):
+        #arrange
+        def post(votes):
+            return domain.Post(
+                id="id",
+                author="user",
+                title="title",
+                description="desc",
+                votes=votes,
+                created_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_by="user",
+                created_by="user"
+            )
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_page = unittest.mock.AsyncMock(side_effect=[[post(0)], [post(1)]])
+        posts_repository.apply_vote_deltas = unittest.mock.AsyncMock(return_value=[collections.namedtuple("Row", "id author votes created_at")("id", "user", 1, datetime.datetime(year=2024,month=1,day=1))])
+        author_feeds = cache.AuthorFeedCache()
+        vote_buffer = votes.VoteBuffer(lambda: FakeUnitOfWork(posts_repository))
+        vote_buffer.add_listener(author_feeds.apply_rows)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository), vote_buffer=vote_buffer, author_feeds=author_feeds)
+        await posts_service.read_page(10, author="user")
+        await posts_service.vote("id", 1)
+        
+        #act
+        buffered, _ = await posts_service.read_page(10, author="user")
+        await vote_buffer.flush()
+        flushed, _ = await posts_service.read_page(10, author="user")
+        
+        #assert
+        self.assertEqual(buffered[0].votes, 1)
+        self.assertEqual(flushed[0].votes, 1)
+        self.assertEqual(posts_repository.read_page.await_count, 2)
+    
+    async def test_concurrent_read_post_shares_one_query_apart_from_writer_reads(self):
+        #arrange
+        release = asyncio.Event()
+        async def read(id):
+            await release.wait()
+            return domain.Post(
+                id=id,
+                author="user",
+                title="title",
+                description="desc",
+                votes=1,
+                created_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_by="user",
+                created_by="user"
+            )
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read = unittest.mock.AsyncMock(side_effect=read)
+        uow = FakeUnitOfWork(posts_repository)
+        uow.reads_from_writer = lambda current_user: current_user == "writer"
+        posts_service = service.PostsService(uow, read_flights=singleflight.SingleFlight())
+        
+        #act
+        readers = [asyncio.create_task(posts_service.read_post("id", current_user)) for current_user in ("a", "b", "c", "writer")]
+        await asyncio.sleep(0)
+        release.set()
+        posts = await asyncio.gather(*readers)
+        
+        #assert
+        self.assertEqual([post.id for post in posts], ["id"] * 4)
+        self.assertEqual(posts_repository.read.await_count, 2)
+        self.assertEqual(posts_service.read_flights.coalesced, 2)
+    
+    async def test_read_all_throws_when_cursor_is_invalid(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        
+        #act
+        with self.assertRaises(service.InvalidCursorError):
+            #assert
+            await posts_service.read_all(cursor="not-a-cursor")
+    
+    async def test_export_streams_one_ndjson_chunk_per_batch(self):
+        #arrange
+        post = domain.Post(
+            id="id",
+            author="user",
+            title="title",
+            description="desc",
+            votes=1,
+            created_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_by="user",
+            created_by="user"
+        )
+        async def stream_all(batch_size):
+            yield [post, post]
+            yield [post]
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.stream_all = stream_all
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        
+        #act
+        chunks = [chunk async for chunk in posts_service.export(batch_size=2)]
+        
+        #assert
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[1], service.to_post_dto(post).model_dump_json().encode() + b"\n")
+        self.assertEqual(chunks[0].count(b"\n"), 2)
+    
+    async def test_read_many_preserves_request_order_and_reports_missing_ids(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_many = unittest.mock.AsyncMock(return_value=[
+            domain.Post(
+                id=id,
+                author="user",
+                title="title",
+                description="desc",
+                votes=1,
+                created_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_by="user",
+                created_by="user"
+            )
+            for id in ("a", "c")
+        ])
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        
+        #act
+        result: dtos.GetPostsByIdsResponseDto = await posts_service.read_many(["c", "b", "a", "c"])
+        
+        #assert
+        self.assertEqual([post.id for post in result.posts], ["c", "a"])
+        self.assertEqual(result.missing_ids, ["b"])
+        posts_repository.read_many.assert_awaited_once_with(["c", "b", "a"])
+    
+    async def test_read_merges_unflushed_votes(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read = unittest.mock.AsyncMock(return_value=domain.Post(
+            id="id",
+            author="user",
+            title="title",
+            description="desc",
+            votes=1,
+            created_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_by="user",
+            created_by="user"
+        ))
+        vote_buffer = votes.VoteBuffer(unittest.mock.MagicMock())
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository), vote_buffer=vote_buffer)
+        await posts_service.vote("id", 1)
+        await posts_service.vote("id", 1)
+        
+        #act
+        result: dtos.GetPostResponseDto = await posts_service.read("id")
+        
+        #assert
+        self.assertEqual(result.votes, 3)
+    
+    async def test_read_page_version_matches_version_of_loaded_page(self):
+        #arrange
+        posts = [
+            domain.Post(
+                id=f"id-{day}",
+                author="user",
+                title="title",
+                description="desc",
+                votes=1,
+                created_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_by="user",
+                created_by="user"
+            )
+            for day in (3, 2, 1)
+        ]
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_page = unittest.mock.AsyncMock(return_value=posts)
+        posts_repository.read_page_versions = unittest.mock.AsyncMock(return_value=posts)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        domain_posts, next_cursor = await posts_service.read_page(limit=2)
+        
+        #act
+        result = await posts_service.read_page_version(limit=2)
+        
+        #assert
+        self.assertEqual(result, posts_service.version_of_posts(domain_posts, next_cursor))
+        self.assertEqual(result.last_modified, datetime.datetime(year=2024,month=1,day=3,tzinfo=datetime.timezone.utc))
+        posts_repository.read_page_versions.assert_awaited_once_with(3, None, None)
+    
+    async def test_read_post_version_changes_with_unflushed_votes(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_version = unittest.mock.AsyncMock(return_value=domain.Post(
+            id="id",
+            author="user",
+            title="title",
+            description="desc",
+            votes=1,
+            created_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_by="user",
+            created_by="user"
+        ))
+        vote_buffer = votes.VoteBuffer(unittest.mock.MagicMock())
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository), vote_buffer=vote_buffer)
+        before = await posts_service.read_post_version("id")
+        
+        #act
+        await posts_service.vote("id", 1)
+        result = await posts_service.read_post_version("id")
+        
+        #assert
+        self.assertNotEqual(result.etag, before.etag)
+        self.assertIsNotNone(before.last_modified)
+        self.assertIsNone(result.last_modified)
+    
+    async def test_read_post_version_is_last_modified_at_the_latest_vote(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_version = unittest.mock.AsyncMock(return_value=domain.Post(
+            id="id",
+            author="user",
+            title="title",
+            description="desc",
+            votes=1,
+            created_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_at=datetime.datetime(year=2024,month=1,day=1),
+            updated_by="user",
+            created_by="user",
+            voted_at=datetime.datetime(year=2024,month=1,day=2)
+        ))
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        
+        #act
+        result = await posts_service.read_post_version("id")
+        
+        #assert
+        self.assertEqual(result.last_modified, datetime.datetime(year=2024,month=1,day=2,tzinfo=datetime.timezone.utc))
+    
+    async def test_read_post_version_returns_none_when_post_is_missing(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_version = unittest.mock.AsyncMock(return_value=None)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        
+        #act
+        result = await posts_service.read_post_version("missing")
+        
+        #assert
+        self.assertIsNone(result)
+    
+    async def test_read_page_fields_merges_unflushed_votes_into_entries(self):
+        #arrange
+        Row = collections.namedtuple("Row", ["id", "title", "votes", "created_at", "updated_at"])
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_page_fields = unittest.mock.AsyncMock(return_value=[
+            Row(f"id-{day}", "title", 1, datetime.datetime(year=2024,month=1,day=day), datetime.datetime(year=2024,month=1,day=day))
+            for day in (3, 2, 1)
+        ])
+        vote_buffer = votes.VoteBuffer(unittest.mock.MagicMock())
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository), vote_buffer=vote_buffer)
+        await posts_service.vote("id-3", 1)
+        
+        #act
+        entries, next_cursor = await posts_service.read_page_fields(2, ("id", "title", "votes"))
+        
+        #assert
+        self.assertEqual([(entry["id"], entry["votes"]) for entry in entries], [("id-3", 2), ("id-2", 1)])
+        self.assertEqual(service.decode_cursor(next_cursor), (datetime.datetime(year=2024,month=1,day=2), "id-2"))
+        posts_repository.read_page_fields.assert_awaited_once_with(3, ("id", "title", "votes"), None, None)
+    
+    async def test_search_posts_quotes_words_and_pages_by_offset(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.search = unittest.mock.AsyncMock(return_value=[
+            domain.Post(
+                id=f"id-{day}",
+                author="user",
+                title="title",
+                description="desc",
+                votes=0,
+                created_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_at=datetime.datetime(year=2024,month=1,day=day),
+                updated_by="user",
+                created_by="user"
+            )
+            for day in (1, 2, 3)
+        ])
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        
+        #act
+        domain_posts, next_offset = await posts_service.search_posts('fast "cars OR', 2, 4)
+        
+        #assert
+        self.assertEqual([post.id for post in domain_posts], ["id-1", "id-2"])
+        self.assertEqual(next_offset, 6)
+        posts_repository.search.assert_awaited_once_with('"fast" "cars" "OR"*', 3, 4)
+    
+    async def test_search_posts_without_words_skips_the_repository(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.search = unittest.mock.AsyncMock()
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        
+        #act
+        result = await posts_service.search_posts(' "*- ')
+        
+        #assert
+        self.assertEqual(result, ([], None))
+        posts_repository.search.assert_not_awaited()
+    
+    async def test_read_top_returns_posts_in_ranking_order(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read_many = unittest.mock.AsyncMock(return_value=[
+            domain.Post(
+                id=id,
+                author="user",
+                title="title",
+                description="desc",
+                votes=votes,
+                created_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_at=datetime.datetime(year=2024,month=1,day=1),
+                updated_by="user",
+                created_by="user"
+            )
+            for id, votes in (("low", 1), ("high", 9))
+        ])
+        top_posts = ranking.TopPostsIndex(capacity=10)
+        top_posts.upsert("low", 1, datetime.datetime(year=2024,month=1,day=1))
+        top_posts.upsert("high", 9, datetime.datetime(year=2024,month=1,day=1))
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository), top_posts=top_posts)
+        
+        #act
+        result: dtos.GetPostsResponseDto = await posts_service.read_top(2)
+        
+        #assert
+        self.assertEqual([post.id for post in result.posts], ["high", "low"])
+        posts_repository.read_many.assert_awaited_once_with(["high", "low"])
     
     async def test_read_throws_when_id_is_none(self):
         #arrange
-        posts_repository = infrastructure.PostsRepository(db=None)
-        posts_service = service.PostsService(posts_repository=posts_repository)
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
         
         #act
         with self.assertRaises(AssertionError):
@@ -100,8 +617,8 @@ class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
     
     async def test_read_throws_when_id_is_whitespace(self):
         #arrange
-        posts_repository = infrastructure.PostsRepository(db=None)
-        posts_service = service.PostsService(posts_repository=posts_repository)
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
         
         #act
         with self.assertRaises(AssertionError):
@@ -110,7 +627,7 @@ class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
         
     async def test_read_successful(self):
         #arrange
-        posts_repository = infrastructure.PostsRepository(db=None)
+        posts_repository = infrastructure.AsyncPostsRepository(None)
         posts_repository.read = unittest.mock.AsyncMock()
         posts_repository.read.return_value = domain.Post(
             id="id",
@@ -123,7 +640,7 @@ class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
             updated_by="user",
             created_by="user"
         )
-        posts_service = service.PostsService(posts_repository=posts_repository)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
         
         #act
         result: dtos.GetPostResponseDto = await posts_service.read("id")
@@ -140,4 +657,16 @@ class PostsServiceTests(unittest.async_case.IsolatedAsyncioTestCase):
             updated_by="user",
             created_by="user"
         ))
-        posts_repository.read.assert_awaited_once_with("id")
\ No newline at end of file
+        posts_repository.read.assert_awaited_once_with("id")
+    
+    async def test_read_returns_none_when_post_is_missing(self):
+        #arrange
+        posts_repository = infrastructure.AsyncPostsRepository(None)
+        posts_repository.read = unittest.mock.AsyncMock(return_value=None)
+        posts_service = service.PostsService(FakeUnitOfWork(posts_repository))
+        
+        #act
+        result = await posts_service.read("id")
+        
+        #assert
+        self.assertIsNone(result)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import os
+import unittest
+import unittest.mock
+import settings
+
+
+class SettingsTests(unittest.TestCase):
+    def test_from_env_reads_database_and_startup_settings(self):
+        #arrange
+        environment = {
+            "SQLALCHEMY_DATABASE_URL": "sqlite:///posts.db",
+            "SQLALCHEMY_READER_DATABASE_URLS": "sqlite:///a.db, ,sqlite:///b.db",
+            "SQLALCHEMY_USE_SYNC_SESSION": "TRUE",
+            "SCHEMA_STARTUP_MODE": "Check",
+        }
+
+        #act
+        with unittest.mock.patch.dict(os.environ, environment, clear=True):
+            result = settings.Settings.from_env()
+
+        #assert
+        self.assertEqual(result, settings.Settings(
+            database_url="sqlite:///posts.db",
+            reader_database_urls=("sqlite:///a.db", "sqlite:///b.db"),
+            use_sync_session=True,
+            schema_startup_mode="check",
+        ))
+
+    def test_unknown_schema_startup_mode_is_rejected(self):
+        #act
+        with self.assertRaises(AssertionError):
+            #assert
+            settings.Settings(schema_startup_mode="create_all")
+
+    def test_from_env_reads_service_cache_and_auth_settings(self):
+        #arrange
+        environment = {
+            "POSTS_MAX_PAGE_SIZE": "100",
+            "SQLALCHEMY_POOL_SIZE": "20",
+            "POST_CACHE_ENABLED": "false",
+            "VOTES_FLUSH_INTERVAL_SECONDS": "0.5",
+            "JWKS_TTL_SECONDS": "60",
+            "METRICS_PROFILE_HEADER": "X-Trace",
+        }
+
+        #act
+        with unittest.mock.patch.dict(os.environ, environment, clear=True):
+            result = settings.Settings.from_env()
+
+        #assert
+        self.assertEqual(result.max_page_size, 100)
+        self.assertEqual(result.engine.pool_size, 20)
+        self.assertFalse(result.post_cache_enabled)
+        self.assertEqual(result.votes_flush_interval_seconds, 0.5)
+        self.assertEqual(result.jwks_ttl_seconds, 60)
+        self.assertEqual(result.metrics_profile_header, "x-trace")
@@ -0,0 +1,115 @@
+import asyncio
+import unittest
+import unittest.async_case
+import singleflight
+
+
+class SingleFlightTests(unittest.async_case.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_run(self):
+        #arrange
+        flights = singleflight.SingleFlight()
+        release = asyncio.Event()
+        runs = 0
+        async def operation():
+            nonlocal runs
+            runs += 1
+            await release.wait()
+            return runs
+
+        #act
+        callers = [asyncio.create_task(flights.do("key", operation)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers)
+        again = await flights.do("key", operation)
+
+        #assert
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(again, 2)
+        self.assertEqual(flights.stats(), {"in_flight": 0, "executed": 2, "coalesced": 4, "abandoned": 0, "coalesced_ratio": 4 / 6})
+
+    async def test_failure_reaches_every_caller(self):
+        #arrange
+        flights = singleflight.SingleFlight()
+        release = asyncio.Event()
+        async def operation():
+            await release.wait()
+            raise RuntimeError("database unavailable")
+
+        #act
+        callers = [asyncio.create_task(flights.do("key", operation)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+
+        #assert
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(flights.stats()["in_flight"], 0)
+
+    async def test_cancelled_caller_leaves_the_run_to_the_others(self):
+        #arrange
+        flights = singleflight.SingleFlight()
+        release = asyncio.Event()
+        async def operation():
+            await release.wait()
+            return "post"
+        first = asyncio.create_task(flights.do("key", operation))
+        second = asyncio.create_task(flights.do("key", operation))
+        await asyncio.sleep(0)
+
+        #act
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        #assert
+        self.assertEqual(await second, "post")
+        self.assertTrue(first.cancelled())
+        self.assertEqual(flights.abandoned, 0)
+
+    async def test_run_is_cancelled_when_every_caller_is(self):
+        #arrange
+        flights = singleflight.SingleFlight()
+        started, cancelled = asyncio.Event(), asyncio.Event()
+        async def operation():
+            started.set()
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        caller = asyncio.create_task(flights.do("key", operation))
+        await started.wait()
+
+        #act
+        caller.cancel()
+        await asyncio.sleep(0)
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+        #assert
+        self.assertEqual(flights.stats()["in_flight"], 0)
+        self.assertEqual(flights.abandoned, 1)
+
+    async def test_calls_after_invalidate_start_a_new_run(self):
+        #arrange
+        flights = singleflight.SingleFlight()
+        release = asyncio.Event()
+        runs = 0
+        async def operation():
+            nonlocal runs
+            runs += 1
+            run = runs
+            await release.wait()
+            return run
+        before = asyncio.create_task(flights.do("key", operation))
+        await asyncio.sleep(0)
+
+        #act
+        flights.invalidate()
+        after = asyncio.create_task(flights.do("key", operation))
+        await asyncio.sleep(0)
+        release.set()
+
+        #assert
+        self.assertEqual((await before, await after), (1, 2))
+        self.assertEqual(flights.stats()["in_flight"], 0)
@@ -0,0 +1,145 @@
+import asyncio
+import unittest
+import unittest.async_case
+import unittest.mock
+import votes
+
+
+class FakePostsRepository:
+    def __init__(self):
+        self.applied: list[dict] = []
+        self.fail = False
+        self.release: asyncio.Event | None = None
+
+    async def apply_vote_deltas(self, deltas):
+        if self.release is not None:
+            await self.release.wait()
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        self.applied.append(dict(deltas))
+        return [(id, "user", delta, None) for id, delta in deltas.items()]
+
+
+class FakeUnitOfWork:
+    def __init__(self, posts, events=None):
+        self.posts = posts
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def commit(self):
+        pass
+
+
+class VoteBufferTests(unittest.async_case.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.posts = FakePostsRepository()
+        self.vote_buffer = votes.VoteBuffer(lambda: FakeUnitOfWork(self.posts), flush_interval_seconds=60, max_buffered_deltas=1000)
+
+    async def test_flush_aggregates_votes_per_post(self):
+        #arrange
+        for _ in range(3):
+            self.vote_buffer.add("a", 1)
+        self.vote_buffer.add("a", -1)
+        self.vote_buffer.add("b", -1)
+        self.vote_buffer.add("c", 1)
+        self.vote_buffer.add("c", -1)
+
+        #act
+        flushed = await self.vote_buffer.flush()
+
+        #assert
+        self.assertEqual(flushed, 2)
+        self.assertEqual(self.posts.applied, [{"a": 2, "b": -1}])
+        self.assertEqual(self.vote_buffer.pending_delta("a"), 0)
+
+    async def test_pending_delta_includes_in_flight_votes(self):
+        #arrange
+        self.posts.release = asyncio.Event()
+        self.vote_buffer.add("a", 1)
+        flush = asyncio.create_task(self.vote_buffer.flush())
+        await asyncio.sleep(0)
+
+        #act
+        self.vote_buffer.add("a", 1)
+        during_flush = self.vote_buffer.pending_delta("a")
+        self.posts.release.set()
+        await flush
+
+        #assert
+        self.assertEqual(during_flush, 2)
+        self.assertEqual(self.vote_buffer.pending_delta("a"), 1)
+
+    async def test_flush_keeps_votes_when_database_fails(self):
+        #arrange
+        self.vote_buffer.add("a", 1)
+        self.posts.fail = True
+
+        #act
+        with self.assertRaises(RuntimeError):
+            await self.vote_buffer.flush()
+
+        #assert
+        self.assertEqual(self.vote_buffer.pending_delta("a"), 1)
+        self.assertEqual(self.vote_buffer.flush_errors, 1)
+
+    async def test_flush_notifies_listeners(self):
+        #arrange
+        listener = unittest.mock.MagicMock()
+        self.vote_buffer.add_listener(listener)
+        self.vote_buffer.add("a", 1)
+
+        #act
+        await self.vote_buffer.flush()
+
+        #assert
+        listener.assert_called_once_with([("a", "user", 1, None)])
+
+    async def test_reaching_max_buffered_deltas_triggers_flush(self):
+        #arrange
+        vote_buffer = votes.VoteBuffer(lambda: FakeUnitOfWork(self.posts), flush_interval_seconds=60, max_buffered_deltas=2)
+        vote_buffer.start()
+
+        #act
+        vote_buffer.add("a", 1)
+        vote_buffer.add("a", 1)
+        await asyncio.sleep(0.01)
+
+        #assert
+        self.assertEqual(self.posts.applied, [{"a": 2}])
+        await vote_buffer.stop()
+
+    async def test_stop_flushes_pending_votes(self):
+        #arrange
+        self.vote_buffer.start()
+        self.vote_buffer.add("a", 1)
+
+        #act
+        await self.vote_buffer.stop()
+
+        #assert
+        self.assertEqual(self.posts.applied, [{"a": 1}])
+
+
+class VoteBufferRestartTests(unittest.TestCase):
+    def test_flusher_restarts_on_a_new_event_loop(self):
+        #arrange
+        posts = FakePostsRepository()
+        vote_buffer = votes.VoteBuffer(lambda: FakeUnitOfWork(posts), flush_interval_seconds=60, max_buffered_deltas=2)
+        async def serve():
+            vote_buffer.start()
+            vote_buffer.add("a", 1)
+            vote_buffer.add("a", 1)
+            await asyncio.sleep(0.01)
+            await vote_buffer.stop()
+
+        #act
+        asyncio.run(serve())
+        asyncio.run(serve())
+
+        #assert
+        self.assertEqual(posts.applied, [{"a": 2}, {"a": 2}])
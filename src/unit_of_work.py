@@ -1,36 +1,166 @@
 import abc
+import cache
 import infrastructure
+import metrics
+import routing
 
 
 class UnitOfWork(abc.ABC):
     posts: infrastructure.ICrudRepository
+    events: infrastructure.IPostEventsRepository
+    idempotency_keys: infrastructure.IIdempotencyKeysRepository
 
     def __exit__(self, *args):
         self.rollback()
-    
+
     @abc.abstractmethod
     def commit(self):
         pass
-    
+
     @abc.abstractmethod
     def rollback(self):
         pass
 
 
 class SqlAlchemyUnitOfWork(UnitOfWork):
-    def __init__(self, session_factory=infrastructure.SessionLocal):
+    # Without a session factory, sessions come from infrastructure.get_database()
+    def __init__(self, session_factory=None):
         self.session_factory = session_factory
-    
+
     def __enter__(self):
-        self.session = self.session_factory()
+        session_factory = self.session_factory if self.session_factory is not None else infrastructure.get_database().session_factory
+        self.session = session_factory()
         self.posts = infrastructure.PostsRepository(self.session)
-        
+        self.events = infrastructure.PostEventsRepository(self.posts)
+        self.idempotency_keys = infrastructure.IdempotencyKeysRepository(self.posts)
+
     def __exit__(self, *args):
         super().__exit__(*args)
         self.session.close()
-    
+
     def commit(self):
-        self.session.commit()
-    
+        with metrics.timed("commit"):
+            self.session.commit()
+
     def rollback(self):
-        self.session.rollback()
\ No newline at end of file
+        self.session.rollback()
+
+
+class AsyncUnitOfWork(abc.ABC):
+    posts: infrastructure.ICrudRepository
+    # Outbox written in the same transaction as posts; None where there is no outbox
+    events: infrastructure.IPostEventsRepository | None = None
+    idempotency_keys: infrastructure.IIdempotencyKeysRepository | None = None
+    post_cache: cache.PostCache | None = None
+
+    # Declare what the next "async with" is for; units of work without replicas ignore it
+    def reading(self, current_user: str | None = None):
+        return self
+
+    def writing(self, current_user: str | None = None):
+        return self
+
+    # Whether current_user's reads are pinned to the writer so they see their own writes
+    # (read-your-writes); shared in-process state may hold what a lagging replica returned
+    def reads_from_writer(self, current_user: str | None = None) -> bool:
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.rollback()
+
+    @abc.abstractmethod
+    async def commit(self):
+        pass
+
+    @abc.abstractmethod
+    async def rollback(self):
+        pass
+
+    def with_cache(self, posts: infrastructure.ICrudRepository) -> infrastructure.ICrudRepository:
+        if self.post_cache is None:
+            return posts
+        return infrastructure.CachedPostsRepository(posts, self.post_cache)
+
+    async def invalidate_cache(self):
+        if isinstance(self.posts, infrastructure.CachedPostsRepository):
+            await self.posts.invalidate_pending()
+
+
+class SqlAlchemyAsyncUnitOfWork(AsyncUnitOfWork):
+    # Without a session factory or router, sessions come from infrastructure.get_database()
+    def __init__(self, session_factory=None, post_cache: cache.PostCache | None = None, router: routing.ReplicaRouter | None = None):
+        self.session_factory = session_factory
+        self.post_cache = post_cache
+        self.router = router
+        self.write = True
+        self.current_user = None
+
+    def reading(self, current_user: str | None = None):
+        self.write, self.current_user = False, current_user
+        return self
+
+    def writing(self, current_user: str | None = None):
+        self.write, self.current_user = True, current_user
+        return self
+
+    def reads_from_writer(self, current_user: str | None = None) -> bool:
+        return self.router is not None and self.router.is_sticky(current_user)
+
+    async def __aenter__(self):
+        session_factory, sticky = self.session_factory, False
+        if self.router is not None:
+            session_factory, on_writer = self.router.route(self.write, self.current_user)
+            # Only reads pinned away from the replicas are sticky; without replicas all reads use the writer
+            sticky = on_writer and not self.write and self.router.has_replicas
+        elif session_factory is None:
+            session_factory = infrastructure.get_database().async_session_factory
+        self.session = session_factory()
+        posts = infrastructure.AsyncPostsRepository(self.session)
+        self.events = infrastructure.AsyncPostEventsRepository(posts)
+        self.idempotency_keys = infrastructure.AsyncIdempotencyKeysRepository(posts)
+        # Sticky reads skip the shared cache, which replica reads may have filled with stale posts
+        self.posts = posts if sticky else self.with_cache(posts)
+        return self
+
+    async def __aexit__(self, *args):
+        await super().__aexit__(*args)
+        await self.session.close()
+        # Undeclared units of work default to the writer
+        self.write, self.current_user = True, None
+
+    async def commit(self):
+        with metrics.timed("commit"):
+            await self.session.commit()
+        await self.invalidate_cache()
+        if self.router is not None:
+            self.router.record_write(self.current_user)
+
+    async def rollback(self):
+        await self.session.rollback()
+
+
+# Exposes a blocking UnitOfWork through the async interface (sync fallback path)
+class SyncUnitOfWorkAdapter(AsyncUnitOfWork):
+    def __init__(self, uow: UnitOfWork | None = None, post_cache: cache.PostCache | None = None):
+        self.uow = uow if uow is not None else SqlAlchemyUnitOfWork()
+        self.post_cache = post_cache
+
+    async def __aenter__(self):
+        self.uow.__enter__()
+        self.posts = self.with_cache(self.uow.posts)
+        self.events = self.uow.events
+        self.idempotency_keys = self.uow.idempotency_keys
+        return self
+
+    async def __aexit__(self, *args):
+        self.uow.__exit__(*args)
+
+    async def commit(self):
+        self.uow.commit()
+        await self.invalidate_cache()
+
+    async def rollback(self):
+        self.uow.rollback()
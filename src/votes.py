@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from typing import Callable
+import outbox
+
+logger = logging.getLogger(__name__)
+
+
+# Write-behind vote counter. Votes are aggregated per post in memory and periodically flushed as
+# one atomic "votes = votes + delta" UPDATE per post, so hot posts never take a read-modify-write
+# lock per vote. Everything runs on the event loop, so add() needs no lock; flushes are serialized.
+class VoteBuffer:
+    def __init__(self, uow_factory: Callable, flush_interval_seconds: float = 1.0, max_buffered_deltas: int = 10000) -> None:
+        assert flush_interval_seconds > 0 and max_buffered_deltas > 0
+
+        self.uow_factory = uow_factory
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_buffered_deltas = max_buffered_deltas
+        self.pending: dict[str, int] = {}
+        self.in_flight: dict[str, int] = {}
+        self.buffered = 0
+        self.listeners: list[Callable] = []
+        self.flush_lock = asyncio.Lock()
+        self.flush_requested = asyncio.Event()
+        self.task: asyncio.Task | None = None
+        self.flushed_votes = 0
+        self.flush_errors = 0
+
+    def add(self, post_id: str, delta: int) -> None:
+        assert post_id is not None and not post_id.isspace()
+
+        self.pending[post_id] = self.pending.get(post_id, 0) + delta
+        self.buffered += 1
+        if self.buffered >= self.max_buffered_deltas:
+            self.flush_requested.set()
+
+    # Votes accepted but not yet committed, including a flush that is still running
+    def pending_delta(self, post_id: str) -> int:
+        return self.pending.get(post_id, 0) + self.in_flight.get(post_id, 0)
+
+    # Listeners receive the (id, author, votes, created_at) rows of every committed flush
+    def add_listener(self, listener: Callable) -> None:
+        self.listeners.append(listener)
+
+    async def flush(self) -> int:
+        async with self.flush_lock:
+            deltas = {post_id: delta for post_id, delta in self.pending.items() if delta != 0}
+            buffered = self.buffered
+            self.pending, self.buffered = {}, 0
+            if not deltas:
+                return 0
+
+            self.in_flight = deltas
+            try:
+                async with self.uow_factory() as uow:
+                    rows = await uow.posts.apply_vote_deltas(deltas)
+                    if uow.events is not None:
+                        await uow.events.append([outbox.post_voted(id, votes) for id, _, votes, _ in rows])
+                    await uow.commit()
+            except BaseException:
+                # Put the deltas back (also on cancellation) so the next flush retries them
+                for post_id, delta in deltas.items():
+                    self.pending[post_id] = self.pending.get(post_id, 0) + delta
+                self.buffered += buffered
+                self.flush_errors += 1
+                raise
+            finally:
+                self.in_flight = {}
+
+            self.flushed_votes += buffered
+            for listener in self.listeners:
+                listener(rows)
+            return len(deltas)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_requested.wait(), timeout=self.flush_interval_seconds)
+            except TimeoutError:
+                pass
+            self.flush_requested.clear()
+
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush buffered votes")
+
+    def start(self) -> None:
+        if self.task is None:
+            # An Event binds to the loop that first waits on it, and a later lifespan may run on another loop
+            requested, self.flush_requested = self.flush_requested.is_set(), asyncio.Event()
+            if requested:
+                self.flush_requested.set()
+            self.task = asyncio.create_task(self.run())
+
+    # Stops the background flusher and writes out whatever is still buffered
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()